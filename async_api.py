@@ -0,0 +1,187 @@
+# async_api.py
+"""
+asyncio facade over the matrix pipeline for event-loop applications. File
+reads and writes run on threads and the CPU stages on an executor, so the loop
+never blocks and many images can be converted at once with asyncio.gather.
+Every call works on the values it is given (each executor thread or process
+has its own ImageProcessorLogic), so concurrent calls never share state.
+
+    async with AsyncMatrixPipeline() as pipeline:
+        outputs = await asyncio.gather(*(pipeline.convert(path, 80, f"{path}.png") for path in paths))
+"""
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from char_matrix import CharMatrix
+from image_logic import ImageProcessorLogic, DECODE_MIN_SIZE, DEFAULT_BLOCK_SIZE
+from matrix_export import EXPORT_FORMATS, export_matrix
+from thresholding import DEFAULT_THRESHOLD_MODE
+
+_local = threading.local()
+
+
+# --- Executor Side ---
+def _thread_logic():
+    """The calling thread's ImageProcessorLogic, without an image cache (each image passes through once)."""
+    logic = getattr(_local, "logic", None)
+    if logic is None:
+        logic = _local.logic = ImageProcessorLogic(cache_bytes=0)
+    return logic
+
+
+def _load(source, decode_min_size):
+    logic = _thread_logic()
+    logic.decode_min_size = decode_min_size
+    try:
+        return logic.decode_image(source if isinstance(source, (bytes, bytearray)) else os.fspath(source))
+    finally:
+        logic.current_image = None
+
+
+def _generate(image, dimension, options):
+    logic = _thread_logic()
+    logic.use_image(image)
+    try:
+        resized_image = logic.process_and_resize(dimension, block_size=options["block_size"])
+        return logic.generate_character_matrix(resized_image, compact=True, **options)
+    finally:
+        logic.current_image = None
+
+
+def _render(matrix):
+    return _thread_logic().create_matrix_image(matrix)
+
+
+def _encode(target, format, scale):
+    """Encodes an image (Pillow format name) or a matrix (an EXPORT_FORMATS name) to bytes."""
+    if isinstance(target, (CharMatrix, list)):
+        if format == "rle":
+            buffer = io.StringIO()
+            export_matrix(target, buffer, "rle")
+            return buffer.getvalue().encode("ascii")
+        buffer = io.BytesIO()
+        export_matrix(target, buffer, format, scale)
+        return buffer.getvalue()
+
+    buffer = io.BytesIO()
+    target.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def _write_file(path, data):
+    with open(path, "wb") as destination_file:
+        destination_file.write(data)
+
+
+def _pillow_format(name):
+    """Pillow format name for a Pillow name ("JPEG") or an extension-style one ("jpg", ".jpg")."""
+    extensions = Image.registered_extensions() # Also loads every plugin, so Image.SAVE is complete
+    format = name.upper() if name.upper() in Image.SAVE else extensions.get("." + name.lower().lstrip("."))
+    if format not in Image.SAVE:
+        raise ValueError(f"Pillow cannot write images as {name!r}.")
+    return format
+
+
+def _image_format(destination):
+    """Pillow format name for a destination's extension."""
+    extension = os.path.splitext(os.fspath(destination))[1].lower()
+    if extension not in Image.registered_extensions():
+        raise ValueError(f"Cannot tell the image format of {destination!r}; pass format=.")
+    return _pillow_format(extension)
+
+
+class AsyncMatrixPipeline:
+    """
+    Async load / generate / render / save. CPU work runs on `executor` (by default a
+    thread pool: Pillow and NumPy release the GIL for the heavy parts; a
+    ProcessPoolExecutor also works). convert() runs the whole pipeline for one image
+    and admits at most max_concurrency images at a time, so gathering thousands of
+    paths does not decode them all before the first is written.
+    """
+    def __init__(self, executor=None, max_concurrency=None, decode_min_size=DECODE_MIN_SIZE):
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(thread_name_prefix="matrix")
+        workers = getattr(self._executor, "_max_workers", None) or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or workers * 2
+        self.decode_min_size = decode_min_size
+        self._admission = asyncio.Semaphore(self.max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shuts down the executor if the pipeline created it."""
+        if self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def load(self, source, decode_min_size=None):
+        """
+        Decodes a path (opened and read on the executor) or the bytes of an encoded image
+        to a grayscale image, reduced like load_image (never below decode_min_size per axis).
+        """
+        size = self.decode_min_size if decode_min_size is None else decode_min_size
+        return await self._run(_load, source, size)
+
+    async def generate(self, image, dimension, block_size=DEFAULT_BLOCK_SIZE, block_threshold=None,
+                       threshold_mode=DEFAULT_THRESHOLD_MODE, window=None):
+        """Resizes, thresholds and compresses a loaded image. Returns (CharMatrix, text)."""
+        options = {
+            "block_size": tuple(block_size),
+            "block_threshold": block_threshold,
+            "threshold_mode": threshold_mode,
+            "window": window,
+        }
+        return await self._run(_generate, image, dimension, options)
+
+    async def render(self, matrix):
+        """The glyph image of a matrix (see ImageProcessorLogic.create_matrix_image)."""
+        return await self._run(_render, matrix)
+
+    async def save(self, target, destination, format=None, scale=1):
+        """
+        Writes a matrix text (str), an image or a matrix to a path without blocking the loop.
+        Images are encoded in format, a Pillow name or an extension such as "jpg" (default:
+        from the destination's extension); matrices need one of EXPORT_FORMATS
+        (scale = pixels per cell for png1/pbm). Returns destination.
+        """
+        if isinstance(target, str):
+            data = target.encode("ascii")
+        else:
+            if isinstance(target, (CharMatrix, list)):
+                if format not in EXPORT_FORMATS:
+                    raise ValueError(f"Matrices are saved as one of {', '.join(EXPORT_FORMATS)}, got {format!r}.")
+            else:
+                format = _image_format(destination) if format is None else _pillow_format(format)
+            data = await self._run(_encode, target, format, scale)
+        await asyncio.to_thread(_write_file, destination, data)
+        return destination
+
+    async def convert(self, source, dimension, destination=None, format=None, scale=1, **options):
+        """
+        load + generate (+ render and save when destination is given) for one image:
+        a text destination (.txt) gets the text, an EXPORT_FORMATS format the direct
+        export, anything else the rendered glyph image. options go to generate().
+        Returns (matrix, text).
+        """
+        async with self._admission:
+            image = await self.load(source)
+            matrix, text = await self.generate(image, dimension, **options)
+            if destination is not None:
+                if format in EXPORT_FORMATS:
+                    await self.save(matrix, destination, format, scale)
+                elif format == "txt" or (format is None and os.fspath(destination).lower().endswith(".txt")):
+                    await self.save(text, destination)
+                else:
+                    await self.save(await self.render(matrix), destination, format)
+        return matrix, text
@@ -0,0 +1,240 @@
+# band_decode.py
+"""
+Memory-bounded decoding for very large scans. Instead of decoding the whole
+image and reducing it afterwards, the image is decoded one band of rows at a
+time and each band is reduced before the next one is read, so only one
+full-resolution band is ever in memory. TIFFs are split along their own
+strips or tiles (each band becomes a small stand-alone TIFF for the usual
+decoder); uncompressed raw files (BMP, PPM/PGM) are split by row offset.
+"""
+import io
+import struct
+import threading
+from contextlib import contextmanager
+
+from PIL import Image, TiffImagePlugin, TiffTags
+
+# --- Constants ---
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024 # Full-resolution pixel bytes decoded at once in memory-bounded mode
+TRUSTED_MAX_IMAGE_PIXELS = 4_000_000_000 # Pixel limit for trusted inputs (Pillow refuses about 179 MP and up)
+
+# --- TIFF Tags ---
+BITS_PER_SAMPLE = 258
+COMPRESSION = 259
+STRIP_OFFSETS = 273
+SAMPLES_PER_PIXEL = 277
+ROWS_PER_STRIP = 278
+STRIP_BYTE_COUNTS = 279
+PLANAR_CONFIGURATION = 284
+TILE_WIDTH = 322
+TILE_LENGTH = 323
+TILE_OFFSETS = 324
+TILE_BYTE_COUNTS = 325
+# Tags a stand-alone band needs to decode exactly like the same rows of the full image
+BAND_TAGS = (
+    256, 257, BITS_PER_SAMPLE, COMPRESSION, 262, 266, SAMPLES_PER_PIXEL, ROWS_PER_STRIP, PLANAR_CONFIGURATION,
+    317, 320, TILE_WIDTH, TILE_LENGTH, 338, 339, 347, 529, 530, 531, 532
+)
+
+# --- Raw Layouts ---
+RAW_BAND_MODES = ("1", "L", "LA", "RGB", "RGBA", "RGBX", "CMYK", "I;16", "I;16B", "I;16L", "I", "F")
+RAW_BITS_PER_PIXEL = { # Packed bits per pixel of the raw modes that may come without an explicit stride
+    "1": 1, "1;I": 1, "1;R": 1, "L": 8, "L;I": 8, "LA": 16, "RGB": 24, "BGR": 24, "RGBA": 32, "RGBX": 32,
+    "BGRA": 32, "BGRX": 32, "CMYK": 32, "I;16": 16, "I;16B": 16, "I;16L": 16, "I": 32, "F": 32,
+}
+
+_pixel_limit_lock = threading.Lock()
+
+
+def pixel_bytes(mode):
+    """Bytes per pixel in Pillow's in-memory layout for an image mode."""
+    if mode in ("1", "L", "P"):
+        return 1
+    return 2 if mode.startswith("I;16") else 4
+
+
+@contextmanager
+def pixel_limit(max_pixels):
+    """
+    Lets Pillow open and decode images larger than its decompression-bomb limit inside the
+    block, for trusted inputs: Image.MAX_IMAGE_PIXELS is lifted (Pillow checks it again when
+    pixels are allocated, not just on open) and restored on exit. The limit is process-wide,
+    so lifts are serialized by a lock. Open files with open_image(fp, max_pixels) inside
+    the block to enforce max_pixels instead. None leaves Pillow's limit in place.
+    """
+    if max_pixels is None:
+        yield
+        return
+
+    with _pixel_limit_lock:
+        previous = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = None
+        try:
+            yield
+        finally:
+            Image.MAX_IMAGE_PIXELS = previous
+
+
+def open_image(fp, max_pixels=None):
+    """
+    Image.open for a path or file object that also refuses images over max_pixels
+    (used inside pixel_limit, where Pillow's own check is lifted).
+    """
+    image = Image.open(fp)
+    if max_pixels is not None and image.width * image.height > max_pixels:
+        image.close()
+        raise Image.DecompressionBombError(
+            f"Image size ({image.width * image.height} pixels) exceeds the limit of {max_pixels} pixels."
+        )
+    return image
+
+
+def band_reader(image, max_pixels=None):
+    """
+    Returns (unit_rows, read_band) when an opened, not yet loaded image can be decoded in
+    row bands, else None. read_band(top, bottom) decodes rows [top, bottom) as an image of
+    their own; top must be a multiple of unit_rows, and so must bottom unless it is the height.
+    """
+    if not getattr(image, "filename", None):
+        return None
+    if image.format == "TIFF":
+        return _tiff_band_reader(image, max_pixels)
+    if len(image.tile) == 1 and image.tile[0][0] == "raw":
+        return _raw_band_reader(image)
+    return None
+
+
+def band_rows(image, memory_budget, align=1):
+    """Rows per band: a multiple of align (e.g. the strip height) whose decoded pixels fit in memory_budget (at least align)."""
+    row_bytes = image.width * pixel_bytes(image.mode)
+    return max(1, memory_budget // (row_bytes * align)) * align
+
+
+def _read_chunks(path, spans):
+    """Reads (offset, length) spans of a file."""
+    chunks = []
+    with open(path, "rb") as fp:
+        for offset, length in spans:
+            fp.seek(offset)
+            chunks.append(fp.read(length))
+    return chunks
+
+
+def _tiff_band_reader(image, max_pixels):
+    tags = image.tag_v2
+    width, height = image.size
+    planes = tags.get(SAMPLES_PER_PIXEL, 1) if tags.get(PLANAR_CONFIGURATION, 1) == 2 else 1
+
+    if TILE_OFFSETS in tags:
+        unit_rows = tags[TILE_LENGTH]
+        per_row = -(-width // tags[TILE_WIDTH])
+        offsets_tag, counts_tag = TILE_OFFSETS, TILE_BYTE_COUNTS
+    elif STRIP_OFFSETS in tags:
+        unit_rows = min(tags.get(ROWS_PER_STRIP, height), height)
+        per_row = 1
+        offsets_tag, counts_tag = STRIP_OFFSETS, STRIP_BYTE_COUNTS
+    else:
+        return None
+
+    offsets, counts = tags[offsets_tag], tags[counts_tag]
+    units_down = -(-height // unit_rows)
+    per_plane = units_down * per_row
+    if not isinstance(offsets, tuple) or len(offsets) < per_plane * planes or len(counts) < per_plane * planes:
+        return None
+
+    if tags.get(COMPRESSION, 1) == 1 and offsets_tag == STRIP_OFFSETS:
+        # Uncompressed strips split at any row: rows are byte-aligned and stored one after another
+        bits = tags.get(BITS_PER_SAMPLE, (1,))
+        bits = bits if isinstance(bits, tuple) else (bits,)
+        row_bytes = (width * (bits[0] if planes > 1 else sum(bits)) + 7) // 8
+
+        def read_band(top, bottom):
+            spans = []
+            for plane in range(planes):
+                for strip in range(top // unit_rows, -(-bottom // unit_rows)):
+                    start, end = max(top, strip * unit_rows), min(bottom, (strip + 1) * unit_rows)
+                    offset = offsets[plane * per_plane + strip] + (start - strip * unit_rows) * row_bytes
+                    spans.append((offset, (end - start) * row_bytes))
+            chunks = _read_chunks(image.filename, spans)
+            # One strip per plane holding all the band's rows
+            strip_count = len(chunks) // planes
+            strips = [b"".join(chunks[plane * strip_count:(plane + 1) * strip_count]) for plane in range(planes)]
+            return _open_band_tiff(tags, bottom - top, STRIP_OFFSETS, STRIP_BYTE_COUNTS, strips, max_pixels,
+                                   rows_per_strip=bottom - top)
+
+        return 1, read_band
+
+    if unit_rows >= height:
+        return None # One compressed strip: nothing to split
+
+    def read_band(top, bottom):
+        indexes = [
+            plane * per_plane + unit * per_row + column
+            for plane in range(planes)
+            for unit in range(top // unit_rows, -(-bottom // unit_rows))
+            for column in range(per_row)
+        ]
+        chunks = _read_chunks(image.filename, [(offsets[index], counts[index]) for index in indexes])
+        return _open_band_tiff(tags, bottom - top, offsets_tag, counts_tag, chunks, max_pixels, rows_per_strip=unit_rows)
+
+    return unit_rows, read_band
+
+
+def _open_band_tiff(source_tags, length, offsets_tag, counts_tag, chunks, max_pixels, rows_per_strip=None):
+    """
+    Builds an in-memory TIFF holding only the given strips (rows_per_strip rows each) or
+    tiles, with the source's byte order and decoding tags but ImageLength = length, and opens it.
+    """
+    ifd = TiffImagePlugin.ImageFileDirectory_v2(prefix=source_tags.prefix)
+    for tag in BAND_TAGS:
+        if tag in source_tags:
+            # Classic TIFF has no 8-byte integers (BigTIFF sources)
+            ifd.tagtype[tag] = TiffTags.LONG if source_tags.tagtype[tag] == TiffTags.LONG8 else source_tags.tagtype[tag]
+            ifd[tag] = source_tags[tag]
+    ifd.tagtype[257] = TiffTags.LONG
+    ifd[257] = length
+    if offsets_tag == STRIP_OFFSETS:
+        ifd.tagtype[ROWS_PER_STRIP] = TiffTags.LONG
+        ifd[ROWS_PER_STRIP] = rows_per_strip
+
+    relative, position = [], 0
+    for chunk in chunks:
+        relative.append(position)
+        position += len(chunk)
+    ifd.tagtype[offsets_tag] = ifd.tagtype[counts_tag] = TiffTags.LONG
+    ifd[counts_tag] = tuple(len(chunk) for chunk in chunks)
+    ifd[offsets_tag] = tuple(relative)
+
+    endian = "<" if source_tags.prefix == b"II" else ">"
+    header = source_tags.prefix + struct.pack(endian + "HL", 42, 8)
+    directory = ifd.tobytes(len(header))
+    if offsets_tag != STRIP_OFFSETS:
+        # tobytes() relocates strip offsets past the directory itself, but not tile offsets
+        data_start = len(header) + len(directory)
+        ifd[offsets_tag] = tuple(data_start + offset for offset in relative)
+        directory = ifd.tobytes(len(header))
+
+    return open_image(io.BytesIO(header + directory + b"".join(chunks)), max_pixels)
+
+
+def _raw_band_reader(image):
+    _, extents, offset, args = image.tile[0]
+    width, height = image.size
+    if tuple(extents) != (0, 0, width, height) or image.mode not in RAW_BAND_MODES:
+        return None
+
+    rawmode, stride, orientation = (args, 0, 1) if isinstance(args, str) else (tuple(args) + (0, 1))[:3]
+    if not stride:
+        bits = RAW_BITS_PER_PIXEL.get(rawmode)
+        if bits is None:
+            return None
+        stride = (width * bits + 7) // 8
+
+    def read_band(top, bottom):
+        # Bottom-up files (orientation -1, e.g. BMP) store the last row first
+        first_row = top if orientation >= 0 else height - bottom
+        (data,) = _read_chunks(image.filename, [(offset + first_row * stride, (bottom - top) * stride)])
+        # frombytes, not frombuffer: a mapped buffer would take the raw mode (e.g. I;16B) as the image mode
+        return Image.frombytes(image.mode, (width, bottom - top), data, "raw", rawmode, stride, orientation)
+
+    return 1, read_band
@@ -0,0 +1,543 @@
+# batch_cli.py
+"""
+Headless command-line entry point for converting many images at once.
+
+Usage:
+    python -m image_logic batch <dir-or-glob> [...] -o <output dir> [options]
+    python -m image_logic batch huge.tif -o out --max-memory 64 --trusted
+    python -m image_logic frames <animation | dir-or-glob of frames> -o <output dir> [options]
+    python -m image_logic serve [--port 8765] (see http_service)
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from image_logic import ImageProcessorLogic, DECODE_MIN_SIZE, DEFAULT_BLOCK_SIZE
+from thresholding import THRESHOLD_MODES, DEFAULT_THRESHOLD_MODE
+from frame_stream import natural_sort_key, write_frame_stream
+from instrumentation import peak_rss_bytes, write_jsonl
+from matrix_export import EXPORT_FORMATS, export_matrix
+from result_cache import DEFAULT_CACHE_MAX_MB, ResultCache
+
+# --- Constants ---
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp")
+OUTPUT_FORMATS = ("png", "jpg", "txt") + tuple(EXPORT_FORMATS) # Glyph images, text, then the direct exports
+FRAME_FORMATS = ("txt", "gif", "png", "webp") # Frame text stream, or an animation (png = APNG)
+DEFAULT_DIMENSION = 50
+DEFAULT_CHUNK_SIZE = 4
+
+# One logic object (and result cache) per worker process, created on first use
+_worker_logic = None
+_worker_cache = None
+
+
+def collect_image_paths(inputs, recursive=False):
+    """Expands directories and glob patterns into a sorted, de-duplicated list of image files."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*") if recursive else os.path.join(item, "*")
+            candidates = glob.glob(pattern, recursive=recursive)
+        else:
+            candidates = glob.glob(item, recursive=recursive)
+
+        for path in candidates:
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.abspath(path))
+
+    return sorted(set(paths))
+
+
+def output_stems(paths):
+    """
+    Output base name per path, unique across paths: the file name without its extension,
+    plus the extension (photo_png) where that name is shared, plus _2, _3... (in path
+    order) where even that is shared, so same-named inputs never overwrite each other.
+    """
+    def split(path):
+        return os.path.splitext(os.path.basename(path))
+
+    plain = Counter(split(path)[0] for path in paths)
+    stems = [name if plain[name] == 1 else f"{name}_{extension.lstrip('.').lower()}"
+             for name, extension in map(split, paths)]
+    taken = set(stems)
+    unique, seen = [], set()
+    for stem in stems:
+        name, number = stem, 1
+        while name in seen or (name != stem and name in taken):
+            number += 1
+            name = f"{stem}_{number}"
+        seen.add(name)
+        unique.append(name)
+    return unique
+
+
+def get_worker_logic():
+    """The worker process's ImageProcessorLogic (one per process, reused across jobs)."""
+    global _worker_logic
+    if _worker_logic is None:
+        _worker_logic = ImageProcessorLogic()
+    return _worker_logic
+
+
+def get_worker_cache(directory, max_bytes):
+    """The worker process's ResultCache for directory (one per process, reused across jobs)."""
+    global _worker_cache
+    if _worker_cache is None or (_worker_cache.directory, _worker_cache.max_bytes) != (directory, max_bytes):
+        _worker_cache = ResultCache(directory, max_bytes)
+    return _worker_cache
+
+
+def convert_image(job):
+    """
+    Runs the full pipeline for one image inside a worker process:
+    load -> process_and_resize -> generate_character_matrix -> create_matrix_image.
+    Returns a small result dict (never raises) so one bad file does not stop the batch.
+    With profiling on, result["metrics"] holds the per-stage run record. result["decode"]
+    describes the decode (see ImageProcessorLogic.last_decode) and result["peak_rss"] is the
+    worker's peak resident memory so far (a high-water mark across its jobs).
+    With a result cache, result["cached"] tells whether the matrix came from it and
+    result["cache_stored"] whether it is in the cache now (a failed write is not an error).
+    """
+    source, stem, output_dir, dimension, formats, scale, stream, profile, options, qr, limits, cache_settings = job
+    logic = get_worker_logic()
+    cache = get_worker_cache(*cache_settings) if cache_settings else None
+    logic.enable_profiling(profile)
+    logic.memory_budget, logic.max_image_pixels = limits
+    logic.last_decode = None
+
+    with logic.profile_run("batch", source=source, dimension=dimension) as record:
+        result = _convert_image(logic, source, stem, output_dir, dimension, formats, scale, stream, options, qr, cache)
+    if record is not None:
+        record["decode"] = logic.last_decode
+    result["metrics"] = record
+    result["decode"] = logic.last_decode
+    result["peak_rss"] = peak_rss_bytes()
+    return result
+
+
+def compute_matrix(logic, source, dimension, options, qr=False):
+    """
+    Loads source (a path, or the bytes of an encoded image) and builds its compact matrix:
+    one cell per QR module with qr=True, otherwise block compression at dimension with
+    the given block/threshold options.
+    Returns (image the matrix was built from, matrix, text, QRGrid or None).
+    """
+    # Decode at reduced resolution, but never below what the requested dimension needs
+    logic.decode_min_size = max(DECODE_MIN_SIZE, dimension)
+    if isinstance(source, (bytes, bytearray)):
+        logic.decode_image(source) # Uploads pass through once: no preview, pyramid or cache
+    else:
+        logic.load_image(source)
+
+    if qr:
+        # One cell per QR module; block options do not apply
+        matrix, full_text_output, grid = logic.sample_qr_matrix(
+            compact=True, threshold_mode=options["threshold_mode"], window=options["window"]
+        )
+        return logic.current_image, matrix, full_text_output, grid
+
+    resized_image = logic.process_and_resize(dimension, block_size=options["block_size"])
+    matrix, full_text_output = logic.generate_character_matrix(resized_image, compact=True, **options)
+    return resized_image, matrix, full_text_output, None
+
+
+def compute_cached_matrix(logic, cache, source, dimension, options, qr=False):
+    """
+    compute_matrix through a ResultCache, keyed by the source bytes and every parameter
+    that shapes the matrix. Returns (matrix, text, QR version or None, whether it was a hit,
+    whether it is now in the cache). A result the cache cannot store is still returned.
+    """
+    params = dict(
+        options, block_size=list(options["block_size"]), dimension=dimension, qr=qr,
+        decode_min_size=max(DECODE_MIN_SIZE, dimension)
+    )
+    key = cache.key_for(source, **params)
+    entry = cache.get(key)
+    if entry is not None:
+        matrix, full_text_output, meta = entry
+        return matrix, full_text_output, meta.get("qr_version"), True, True
+
+    _, matrix, full_text_output, grid = compute_matrix(logic, source, dimension, options, qr)
+    qr_version = grid.version if grid is not None else None
+    stored = cache.put(key, matrix, full_text_output, qr_version=qr_version)
+    return matrix, full_text_output, qr_version, False, stored
+
+
+def write_matrix_outputs(logic, output_dir, source, matrix, full_text_output, formats, qr=False, scale=1, stem=None):
+    """
+    Writes {stem}_matrix_{cols}x{rows} (or {stem}_qr_...) in each of formats
+    (see OUTPUT_FORMATS) to output_dir. stem defaults to the source's file name without
+    its extension; batches pass the names from output_stems. The direct exports (see
+    matrix_export) are written from the matrix itself, scale pixels per cell for bitmaps.
+    Returns the paths written.
+    """
+    if stem is None:
+        stem = os.path.splitext(os.path.basename(source))[0]
+    base_path = os.path.join(output_dir, f"{stem}_{'qr' if qr else 'matrix'}_{matrix.cols}x{matrix.rows}")
+    outputs = []
+
+    if "txt" in formats:
+        with open(base_path + ".txt", "w", encoding="ascii") as text_file:
+            text_file.write(full_text_output)
+        outputs.append(base_path + ".txt")
+
+    image_formats = [fmt for fmt in formats if fmt in ("png", "jpg")]
+    if image_formats:
+        matrix_image = logic.create_matrix_image(matrix)
+        for fmt in image_formats:
+            logic.encode_image(matrix_image, f"{base_path}.{fmt}")
+            outputs.append(f"{base_path}.{fmt}")
+
+    for fmt in formats:
+        if fmt in EXPORT_FORMATS:
+            export_matrix(matrix, base_path + EXPORT_FORMATS[fmt], fmt, scale, logic)
+            outputs.append(base_path + EXPORT_FORMATS[fmt])
+    return outputs
+
+
+def _convert_image(logic, source, stem, output_dir, dimension, formats, scale, stream, options, qr, cache=None):
+    started = time.perf_counter()
+    result = {"source": source, "outputs": [], "error": None}
+
+    try:
+        if stream:
+            # Text only, written band by band: memory stays bounded for huge dimensions
+            logic.decode_min_size = max(DECODE_MIN_SIZE, dimension)
+            logic.load_image(source)
+            block_width, block_height = options["block_size"]
+            final_dim = logic.fit_dimension(dimension, options["block_size"])
+            cols, rows = final_dim // block_width, final_dim // block_height
+            text_path = os.path.join(output_dir, f"{stem}_matrix_{cols}x{rows}.txt")
+            logic.write_matrix_stream(dimension, text_path, **options)
+            result["outputs"].append(text_path)
+            result["seconds"] = time.perf_counter() - started
+            return result
+
+        if cache is not None:
+            matrix, full_text_output, qr_version, result["cached"], result["cache_stored"] = compute_cached_matrix(
+                logic, cache, source, dimension, options, qr
+            )
+        else:
+            _, matrix, full_text_output, grid = compute_matrix(logic, source, dimension, options, qr)
+            qr_version = grid.version if grid is not None else None
+        if qr_version is not None:
+            result["qr_version"] = qr_version
+        result["outputs"] = write_matrix_outputs(
+            logic, output_dir, source, matrix, full_text_output, formats, qr, scale, stem
+        )
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def run_batch(paths, output_dir, dimension=DEFAULT_DIMENSION, formats=("png", "txt"),
+              workers=None, chunk_size=DEFAULT_CHUNK_SIZE, stream=False, profile=False,
+              block_size=DEFAULT_BLOCK_SIZE, block_threshold=None, threshold_mode=DEFAULT_THRESHOLD_MODE,
+              window=None, qr=False, memory_budget=None, max_image_pixels=None, scale=1,
+              cache_dir=None, cache_max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+    """
+    Converts every path on a process pool and yields one result dict per path, in input order.
+    Outputs are named after output_stems(paths), so same-named inputs do not collide.
+    memory_budget (bytes) decodes TIFF and raw files band by band (see band_decode);
+    max_image_pixels replaces Pillow's decompression-bomb limit for trusted inputs.
+    block_size/block_threshold select the compression (see ImageProcessorLogic.compress_blocks),
+    threshold_mode/window which pixels count as bright (see ImageProcessorLogic.apply_threshold).
+    With qr=True each image is sampled once per QR module instead (see ImageProcessorLogic.sample_qr_matrix).
+    With stream=True only text is written, band by band (see ImageProcessorLogic.write_matrix_stream).
+    With profile=True each result carries its per-stage metrics record.
+    scale is the pixels per cell of the 1-bit bitmap formats (png1, pbm).
+    With cache_dir, matrices are reused from (and stored in) a ResultCache there (not with stream).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    options = {
+        "block_size": tuple(block_size),
+        "block_threshold": block_threshold,
+        "threshold_mode": threshold_mode,
+        "window": window,
+    }
+    limits = (memory_budget, max_image_pixels)
+    cache_settings = (cache_dir, cache_max_bytes) if cache_dir else None
+    jobs = [
+        (path, stem, output_dir, dimension, tuple(formats), scale, stream, profile, options, qr, limits, cache_settings)
+        for path, stem in zip(paths, output_stems(paths))
+    ]
+
+    if workers == 1:
+        # Run in-process: handy for debugging and avoids pool start-up for tiny batches
+        for job in jobs:
+            yield convert_image(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(convert_image, jobs, chunksize=max(1, chunk_size))
+
+
+def convert_frames(source, output_dir, stem, dimension=DEFAULT_DIMENSION, formats=("txt", "gif"), **options):
+    """
+    Converts an animation (path) or a sequence of stills (list of paths) in one lazy pass:
+    the txt format gets every frame's text, each image format one animation.
+    Only changed cells are recomputed per frame (see frame_stream.FrameMatrixStream).
+    Returns a result dict like convert_image, plus frame and recomputed-cell counts.
+    """
+    started = time.perf_counter()
+    result = {"source": source if isinstance(source, str) else f"{len(source)} frames", "outputs": [], "error": None}
+    os.makedirs(output_dir, exist_ok=True)
+
+    logic = ImageProcessorLogic(decode_min_size=max(DECODE_MIN_SIZE, dimension))
+    final_dim = logic.fit_dimension(dimension, options.get("block_size", DEFAULT_BLOCK_SIZE))
+    block_width, block_height = options.get("block_size", DEFAULT_BLOCK_SIZE)
+    base_path = os.path.join(output_dir, f"{stem}_frames_{final_dim // block_width}x{final_dim // block_height}")
+
+    text_path = base_path + ".txt" if "txt" in formats else None
+    animations = [(f"{base_path}.{fmt}", None) for fmt in formats if fmt != "txt"]
+    result["frames"] = result["recomputed"] = 0
+    try:
+        result["frames"], result["recomputed"] = write_frame_stream(
+            logic, source, text_path, dimension, animations, **options
+        )
+        result["outputs"] = ([text_path] if text_path else []) + [animation for animation, _ in animations]
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def _parse_format_list(value, choices):
+    formats = [fmt.strip().lower() for fmt in value.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in choices]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(
+            f"unknown format(s) {', '.join(unknown) or '(none)'}; choose from {', '.join(choices)}"
+        )
+    return formats
+
+
+def _parse_formats(value):
+    return _parse_format_list(value, OUTPUT_FORMATS)
+
+
+def _parse_frame_formats(value):
+    return _parse_format_list(value, FRAME_FORMATS)
+
+
+def _parse_block_size(value):
+    """Parses 'N' (square) or 'WxH' into a (width, height) block size."""
+    parts = value.lower().split("x")
+    if len(parts) == 1:
+        parts *= 2
+    if len(parts) != 2 or not all(part.isdigit() and int(part) >= 1 for part in parts):
+        raise argparse.ArgumentTypeError(f"invalid block size {value!r}; use N or WxH, e.g. 3 or 4x2")
+    return int(parts[0]), int(parts[1])
+
+
+def build_parser():
+    from band_decode import TRUSTED_MAX_IMAGE_PIXELS # Not at module level: workers import this module too
+
+    parser = argparse.ArgumentParser(prog="python -m image_logic", description="Headless matrix generator.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser("batch", help="Convert a directory or glob of images.")
+    _add_matrix_arguments(batch)
+    batch.add_argument("-f", "--formats", type=_parse_formats, default=["png", "txt"],
+                       help=f"Comma-separated output formats: {', '.join(OUTPUT_FORMATS)} (default png,txt). "
+                            "png1/pbm are 1-bit bitmaps, rle run-length text and bits a packed binary, "
+                            "all written straight from the matrix.")
+    batch.add_argument("--scale", type=int, default=1, metavar="PIXELS",
+                       help="Pixels per cell for the png1 and pbm formats (NEAREST upscale, default 1).")
+    batch.add_argument("-w", "--workers", type=int, default=None,
+                       help="Worker processes (default: CPU count; 1 runs in-process).")
+    batch.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                       help=f"Images handed to a worker at a time (default {DEFAULT_CHUNK_SIZE}).")
+    batch.add_argument("--stream", action="store_true",
+                       help="Stream text output band by band with bounded memory (txt only; "
+                            "allows dimensions far beyond the GUI's limit).")
+    batch.add_argument("--metrics-jsonl", metavar="PATH",
+                       help="Record per-stage wall/CPU time and peak memory; write one JSON line per image.")
+    batch.add_argument("--max-memory", type=int, default=None, metavar="MB",
+                       help="Decode TIFF and uncompressed BMP/PPM files in bands of about this many MB of "
+                            "full-resolution pixels, keeping only the reduced copy (for gigapixel scans).")
+    batch.add_argument("--trusted", dest="max_image_pixels", action="store_const", const=TRUSTED_MAX_IMAGE_PIXELS,
+                       help=f"Inputs are trusted: allow images up to {TRUSTED_MAX_IMAGE_PIXELS:,} pixels "
+                            "instead of Pillow's decompression-bomb limit.")
+    batch.add_argument("--cache", metavar="DIR",
+                       help="Reuse matrices from a persistent result cache in DIR, keyed by the image "
+                            "bytes and the settings; new results are added to it.")
+    batch.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_MAX_MB, metavar="MB",
+                       help=f"Size budget of the result cache; least recently used entries are evicted "
+                            f"beyond it (default {DEFAULT_CACHE_MAX_MB} MB).")
+    batch.add_argument("--qr", action="store_true",
+                       help="Locate a QR code by its finder patterns and write one cell per module "
+                            "(block options are ignored; -d still sets the minimum decoded size).")
+    batch.add_argument("-r", "--recursive", action="store_true", help="Recurse into directories.")
+    batch.add_argument("-q", "--quiet", action="store_true", help="Only print the summary and errors.")
+
+    frames = subparsers.add_parser(
+        "frames", help="Convert an animated GIF/APNG/WebP, or a numbered image sequence, frame by frame."
+    )
+    _add_matrix_arguments(frames)
+    frames.add_argument("-f", "--formats", type=_parse_frame_formats, default=["txt", "gif"],
+                        help=f"Comma-separated outputs: {', '.join(FRAME_FORMATS)} "
+                             "(txt = per-frame text stream, png = APNG; default txt,gif).")
+    frames.add_argument("-r", "--recursive", action="store_true", help="Recurse into directories.")
+
+    from http_service import add_serve_arguments # http_service imports this module
+    serve = subparsers.add_parser("serve", help="Run a local HTTP service that converts uploaded images.")
+    add_serve_arguments(serve)
+    return parser
+
+
+def _add_matrix_arguments(subparser):
+    """Inputs, output directory, dimension, block and threshold options shared by the subcommands."""
+    subparser.add_argument("inputs", nargs="+", help="Image files, directories or glob patterns.")
+    subparser.add_argument("-o", "--output-dir", required=True, help="Directory for the generated files.")
+    subparser.add_argument("-d", "--dimension", type=int, default=DEFAULT_DIMENSION,
+                           help=f"Resize dimension in pixels before block compression (default {DEFAULT_DIMENSION}).")
+    subparser.add_argument("-b", "--block", type=_parse_block_size, default=DEFAULT_BLOCK_SIZE, metavar="N|WxH",
+                           help="Pixel block compressed into one cell (default 2x2).")
+    subparser.add_argument("--block-threshold", type=int, default=None, metavar="COUNT",
+                           help="Bright pixels a block needs to count as bright (default: half the block, rounded up).")
+    subparser.add_argument("-t", "--threshold", choices=THRESHOLD_MODES, default=DEFAULT_THRESHOLD_MODE,
+                           help="Which pixels count as bright: fixed 128 cutoff (global), Otsu, "
+                                "or local mean/Sauvola for unevenly lit scans (default global).")
+    subparser.add_argument("--window", type=int, default=None, metavar="PIXELS",
+                           help="Window side for the local threshold modes, rounded up to odd "
+                                "(default: about 1/8 of the dimension).")
+
+
+def _sequence_stem(paths):
+    """Output name for a sequence: the first frame's name without its frame number."""
+    stem = os.path.splitext(os.path.basename(paths[0]))[0]
+    return re.sub(r"[\W_]*\d+$", "", stem) or "sequence"
+
+
+def frames_main(args):
+    paths = collect_image_paths(args.inputs, recursive=args.recursive)
+    if not paths:
+        print("No images found.", file=sys.stderr)
+        return 1
+
+    # One file is an animation; several are the frames of one sequence
+    if len(paths) == 1:
+        source, stem = paths[0], os.path.splitext(os.path.basename(paths[0]))[0]
+    else:
+        source = sorted(paths, key=natural_sort_key)
+        stem = _sequence_stem(source)
+
+    result = convert_frames(
+        source, args.output_dir, stem, args.dimension, args.formats, block_size=args.block,
+        block_threshold=args.block_threshold, threshold_mode=args.threshold, window=args.window
+    )
+    if result["error"]:
+        print(f"FAILED {result['source']}: {result['error']}", file=sys.stderr)
+        return 1
+    for output in result["outputs"]:
+        print(f"ok     {output}")
+    print(f"Converted {result['frames']} frames in {result['seconds']:.2f}s "
+          f"({result['recomputed']} matrix cells recomputed).")
+    return 0
+
+
+def _format_decode(decode):
+    """', 7 bands, peak 60 MB' style suffix for an ok line (empty for cached decodes)."""
+    if not decode:
+        return ""
+    bands = f", {decode['bands']} band{'s' if decode['bands'] != 1 else ''}" if decode["strategy"] == "bands" else f", {decode['strategy']} decode"
+    return f"{bands}, peak {decode['peak_pixel_bytes'] / 2**20:.0f} MB"
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    # batch and serve share these; frames has neither
+    if getattr(args, "workers", None) is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if getattr(args, "chunk_size", 1) < 1:
+        parser.error("--chunk-size must be at least 1")
+    if args.command == "serve":
+        if args.max_pending < 0 or args.max_upload < 1:
+            parser.error("--max-pending must be at least 0 and --max-upload at least 1")
+        from http_service import serve_main
+        return serve_main(args)
+
+    block_area = args.block[0] * args.block[1]
+    if args.block_threshold is not None and not 0 <= args.block_threshold <= block_area:
+        parser.error(f"--block-threshold must be between 0 and {block_area} for {args.block[0]}x{args.block[1]} blocks")
+    if args.window is not None and args.window < 1:
+        parser.error("--window must be at least 1")
+    if args.command == "frames":
+        return frames_main(args)
+
+    if args.stream and set(args.formats) - {"txt"}:
+        parser.error("--stream only writes text; use --formats txt")
+    if args.stream and args.qr:
+        parser.error("--qr cannot be combined with --stream")
+    if args.stream and args.cache:
+        parser.error("--cache cannot be combined with --stream")
+    if args.cache_size < 1:
+        parser.error("--cache-size must be at least 1 MB")
+    if args.scale < 1:
+        parser.error("--scale must be at least 1")
+    if args.max_memory is not None and args.max_memory < 1:
+        parser.error("--max-memory must be at least 1 MB")
+
+    paths = collect_image_paths(args.inputs, recursive=args.recursive)
+    if not paths:
+        print("No images found.", file=sys.stderr)
+        return 1
+
+    metrics_file = open(args.metrics_jsonl, "w", encoding="utf-8") if args.metrics_jsonl else None
+
+    memory_budget = args.max_memory * 1024 * 1024 if args.max_memory is not None else None
+
+    started = time.perf_counter()
+    failures = 0
+    peak_rss = 0
+    cache_hits = cache_unstored = 0
+    for result in run_batch(paths, args.output_dir, args.dimension, args.formats,
+                            args.workers, args.chunk_size, args.stream, profile=metrics_file is not None,
+                            block_size=args.block, block_threshold=args.block_threshold,
+                            threshold_mode=args.threshold, window=args.window, qr=args.qr,
+                            memory_budget=memory_budget, max_image_pixels=args.max_image_pixels, scale=args.scale,
+                            cache_dir=args.cache, cache_max_bytes=args.cache_size * 1024 * 1024):
+        cache_hits += bool(result.get("cached"))
+        cache_unstored += result.get("cache_stored") is False
+        peak_rss = max(peak_rss, result["peak_rss"] or 0)
+        if metrics_file and result["metrics"]:
+            write_jsonl([result["metrics"]], metrics_file)
+        if result["error"]:
+            failures += 1
+            print(f"FAILED {result['source']}: {result['error']}", file=sys.stderr)
+        elif not args.quiet:
+            version = f", QR version {result['qr_version']}" if "qr_version" in result else ""
+            decode = _format_decode(result["decode"]) if memory_budget else ""
+            cached = ", cached" if result.get("cached") else ""
+            print(f"ok     {result['source']} ({result['seconds']:.2f}s{version}{decode}{cached})")
+
+    if metrics_file:
+        metrics_file.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Converted {len(paths) - failures}/{len(paths)} images in {elapsed:.2f}s.")
+    if memory_budget and peak_rss:
+        print(f"Peak worker memory: {peak_rss / 2**20:.0f} MB.")
+    if args.cache:
+        stats = ResultCache(args.cache, args.cache_size * 1024 * 1024).stats()
+        print(f"Result cache: {cache_hits}/{len(paths)} hits, {stats['entries']} entries, "
+              f"{stats['bytes'] / 2**20:.1f} of {args.cache_size} MB.")
+        if cache_unstored:
+            print(f"Result cache: {cache_unstored} result(s) could not be stored (is {args.cache} writable?).",
+                  file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
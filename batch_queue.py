@@ -0,0 +1,184 @@
+# batch_queue.py
+"""
+Job queue behind the GUI's multi-file drops and multi-select browsing: files
+are converted in parallel on a process pool, each result (matrix, text and a
+preview thumbnail) is kept in queue order so the GUI can page through them,
+and every finished result can be exported in one go. Tk-free; the GUI polls it.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_cli import compute_matrix, get_worker_logic, output_stems, write_matrix_outputs
+from image_logic import ImageProcessorLogic, DEFAULT_BLOCK_SIZE
+from thresholding import DEFAULT_THRESHOLD_MODE
+
+# --- Job States ---
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# --- Defaults ---
+DEFAULT_PREVIEW_SIZE = (340, 460) # Bounding box of the source preview thumbnail kept per result
+DEFAULT_EXPORT_FORMATS = ("png", "txt")
+
+
+def process_file(job):
+    """
+    Converts one queued file inside a worker process and returns a result dict
+    (never raises): matrix, full_text_output, source_preview, source_size and
+    qr_grid on success, error otherwise.
+    """
+    source, dimension, options, qr, preview_size = job
+    result = {"source": source, "error": None}
+    try:
+        image, matrix, full_text_output, grid = compute_matrix(get_worker_logic(), source, dimension, options, qr)
+        source_preview = image.copy()
+        source_preview.thumbnail(preview_size)
+        result.update(
+            matrix=matrix, full_text_output=full_text_output, source_preview=source_preview,
+            source_size=image.size, qr_grid=grid
+        )
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+class QueueJob:
+    """One file in the queue: its settings, state and (once finished) its result dict."""
+    __slots__ = ("path", "qr", "status", "result", "future")
+
+    def __init__(self, path, qr, future):
+        self.path = path
+        self.qr = qr
+        self.status = QUEUED
+        self.result = None
+        self.future = future
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+    def __repr__(self):
+        return f"QueueJob({self.name!r}, {self.status})"
+
+
+class BatchQueue:
+    """
+    Files waiting for, being and done with conversion, in the order they were added.
+    The process pool starts on the first add(). poll() never blocks: it moves finished
+    results onto their jobs, so the Tk loop can call it on a timer.
+    """
+    def __init__(self, workers=None, mp_context=None):
+        self.workers = workers
+        self.mp_context = mp_context
+        self.jobs = []
+        self._executor = None
+
+    def add(self, paths, dimension, block_size=DEFAULT_BLOCK_SIZE, block_threshold=None,
+            threshold_mode=DEFAULT_THRESHOLD_MODE, window=None, qr=False, preview_size=DEFAULT_PREVIEW_SIZE):
+        """Queues paths with one set of conversion settings. Returns the new jobs."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self.mp_context)
+
+        options = {
+            "block_size": tuple(block_size),
+            "block_threshold": block_threshold,
+            "threshold_mode": threshold_mode,
+            "window": window,
+        }
+        added = []
+        for path in paths:
+            future = self._executor.submit(process_file, (path, dimension, options, qr, tuple(preview_size)))
+            added.append(QueueJob(path, qr, future))
+        self.jobs.extend(added)
+        return added
+
+    def poll(self):
+        """Updates job states from the pool. Returns the indexes of jobs whose state changed."""
+        changed = []
+        for index, job in enumerate(self.jobs):
+            if job.status in FINISHED_STATES:
+                continue
+            future = job.future
+            if future.done():
+                if future.cancelled():
+                    job.status = CANCELLED
+                else:
+                    try:
+                        job.result = future.result()
+                    except Exception as e: # The worker process died (e.g. out of memory)
+                        job.result = {"source": job.path, "error": f"{type(e).__name__}: {e}"}
+                    job.status = FAILED if job.result["error"] else DONE
+                job.future = None
+                changed.append(index)
+            elif job.status == QUEUED and future.running():
+                job.status = RUNNING
+                changed.append(index)
+        return changed
+
+    def counts(self):
+        """Number of jobs in each state."""
+        counts = dict.fromkeys((QUEUED, RUNNING) + FINISHED_STATES, 0)
+        for job in self.jobs:
+            counts[job.status] += 1
+        return counts
+
+    def is_busy(self):
+        return any(job.status not in FINISHED_STATES for job in self.jobs)
+
+    def finished_jobs(self):
+        """Jobs with a result, in queue order."""
+        return [job for job in self.jobs if job.status == DONE]
+
+    def cancel_pending(self):
+        """Cancels every job that has not started; running jobs still finish."""
+        for job in self.jobs:
+            if job.status == QUEUED and job.future.cancel():
+                job.status = CANCELLED
+                job.future = None
+
+    def clear(self):
+        """Cancels what has not started and forgets every job (results of running jobs are dropped)."""
+        self.cancel_pending()
+        self.jobs = []
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def export(self, output_dir, formats=DEFAULT_EXPORT_FORMATS, progress=None):
+        """
+        Writes every finished result to output_dir, named like the batch command's outputs
+        (same-named files get distinct names, see batch_cli.output_stems).
+        progress(done, total) is called after each file. Returns (paths written, errors).
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        logic = ImageProcessorLogic()
+        jobs = self.finished_jobs()
+        stems = output_stems([job.path for job in jobs])
+        outputs, errors = [], []
+        for done, (job, stem) in enumerate(zip(jobs, stems), start=1):
+            result = job.result
+            try:
+                outputs.extend(write_matrix_outputs(
+                    logic, output_dir, job.path, result["matrix"], result["full_text_output"], formats, job.qr,
+                    stem=stem
+                ))
+            except OSError as e:
+                errors.append(f"{job.name}: {e}")
+            if progress is not None:
+                progress(done, len(jobs))
+        return outputs, errors
+
+
+def spawn_context():
+    """
+    Process start method for pools created from the GUI: spawn, so workers never
+    inherit a forked copy of the Tk interpreter and its threads.
+    """
+    return multiprocessing.get_context("spawn")
@@ -0,0 +1,207 @@
+# benchmark.py
+"""
+Benchmark suite for every stage of the matrix pipeline.
+
+Times a fresh-process import of the core, then runs each stage on synthetic
+images over a grid of source sizes and matrix dimensions. Writes the timings
+to JSON and (optionally) compares them against a stored baseline, exiting
+with status 1 on regressions beyond a threshold.
+
+Usage:
+    python benchmark.py -o bench.json                      # measure
+    python benchmark.py -o bench.json --baseline base.json # measure and compare
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import PIL
+from PIL import Image
+
+from image_logic import ImageProcessorLogic, BRIGHTNESS_THRESHOLD
+from integral_image import IntegralImage
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# --- Default Grid ---
+DEFAULT_SOURCE_SIZES = ("800x600", "2000x1500", "6000x4000")
+DEFAULT_DIMENSIONS = (50, 100, 200)
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.25 # Fail when a stage gets more than 25% slower than the baseline
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Imports a module in a fresh interpreter and prints only the import's own duration
+IMPORT_PROBE = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def make_synthetic_image(width, height, seed=0):
+    """A deterministic RGB test image: gradients plus noise, so every stage sees real contrast."""
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 64 + seed)
+    blocks = Image.radial_gradient("L").resize((width, height))
+    return Image.merge("RGB", (gradient, noise, blocks))
+
+
+def time_call(func, repeat):
+    """Runs func `repeat` times and returns min/median wall time in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return {"min_s": min(timings), "median_s": statistics.median(timings), "repeat": repeat}
+
+
+def time_fresh_import(module, repeat):
+    """Min/median time to import `module` in a fresh process (what each pool worker pays)."""
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE.format(module=module)],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        timings.append(float(output.strip()))
+    return {"min_s": min(timings), "median_s": statistics.median(timings), "repeat": repeat}
+
+
+def _single_char_matrix(resized_image):
+    """The uncompressed '#'/' ' matrix that _compress_and_format_matrix consumes (setup, not timed)."""
+    width, height = resized_image.size
+    pixels = resized_image.tobytes()
+    return [
+        ['#' if value >= BRIGHTNESS_THRESHOLD else ' ' for value in pixels[y * width:(y + 1) * width]]
+        for y in range(height)
+    ]
+
+
+def _resize_uncached(logic, dim):
+    """process_and_resize without its last-result memo, so every run really resizes."""
+    logic.clear_memo()
+    return logic.process_and_resize(dim)
+
+
+def run_benchmarks(source_sizes, dimensions, repeat, work_dir, log=print):
+    """Times every pipeline stage over the grid and returns {case name: timing dict}."""
+    results = {}
+
+    for module in ("image_logic", "batch_cli"):
+        results[f"import[{module}]"] = time_fresh_import(module, repeat)
+        log(f"import[{module}]: {results[f'import[{module}]']['median_s'] * 1000:.2f} ms")
+
+    for size in source_sizes:
+        width, height = (int(part) for part in size.lower().split("x"))
+        source_path = os.path.join(work_dir, f"source_{width}x{height}.png")
+        make_synthetic_image(width, height).save(source_path)
+
+        # Decode + grayscale + thumbnail + pyramid; a zero-byte cache forces a real decode every time
+        results[f"load_image[{size}]"] = time_call(
+            lambda: ImageProcessorLogic(cache_bytes=0).load_image(source_path), repeat
+        )
+        log(f"load_image[{size}]: {results[f'load_image[{size}]']['median_s'] * 1000:.2f} ms")
+
+        logic = ImageProcessorLogic(cache_bytes=0)
+        logic.load_image(source_path)
+
+        for dim in dimensions:
+            case = f"{size}@{dim}"
+            resized_image = logic.process_and_resize(dim)
+            single_char_matrix = _single_char_matrix(resized_image)
+            matrix, _ = logic.generate_character_matrix(resized_image)
+            matrix_image = logic.create_matrix_image(matrix)
+            table = logic.get_integral_image(resized_image)
+
+            stages = {
+                "process_and_resize": lambda: _resize_uncached(logic, dim),
+                "generate_character_matrix": lambda: logic.generate_character_matrix(resized_image),
+                "_compress_and_format_matrix": lambda: logic._compress_and_format_matrix(single_char_matrix),
+                "integral_image": lambda: IntegralImage.from_image(resized_image),
+                "compress_blocks_4x4": lambda: logic.compress_blocks(table, (4, 4)),
+                "threshold_otsu": lambda: logic.apply_threshold(resized_image, "otsu"),
+                "threshold_sauvola": lambda: logic.apply_threshold(resized_image, "sauvola"),
+                "create_matrix_image": lambda: logic.create_matrix_image(matrix),
+                "encode_png": lambda: matrix_image.save(io.BytesIO(), "PNG"),
+            }
+            for stage, func in stages.items():
+                name = f"{stage}[{case}]"
+                results[name] = time_call(func, repeat)
+                log(f"{name}: {results[name]['median_s'] * 1000:.2f} ms")
+
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """Returns a list of (case, baseline_s, current_s, ratio) for cases slower than 1 + threshold."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or previous["median_s"] <= 0:
+            continue
+        ratio = current["median_s"] / previous["median_s"]
+        if ratio > 1 + threshold:
+            regressions.append((name, previous["median_s"], current["median_s"], ratio))
+    return regressions
+
+
+def environment_info():
+    return {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "numpy": np.__version__ if np is not None else None,
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the matrix pipeline.")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed slowdown before failing, as a fraction (default {DEFAULT_THRESHOLD}).")
+    parser.add_argument("--sizes", nargs="+", default=list(DEFAULT_SOURCE_SIZES),
+                        help="Source image sizes as WIDTHxHEIGHT.")
+    parser.add_argument("--dims", nargs="+", type=int, default=list(DEFAULT_DIMENSIONS),
+                        help="Matrix dimensions to benchmark.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per case (median is compared).")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run_benchmarks(args.sizes, args.dims, args.repeat, work_dir)
+
+    with open(args.output, "w", encoding="utf-8") as out_file:
+        json.dump({"environment": environment_info(), "results": results}, out_file, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)["results"]
+
+    regressions = compare_to_baseline(results, baseline, args.threshold)
+    for name, previous, current, ratio in regressions:
+        print(f"REGRESSION {name}: {previous * 1000:.2f} ms -> {current * 1000:.2f} ms ({ratio:.2f}x)")
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}.")
+        return 1
+
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
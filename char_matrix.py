@@ -0,0 +1,190 @@
+# char_matrix.py
+"""
+Compact representation of a '#'/' ' character matrix: one bit per cell.
+CharMatrix still behaves like the list-of-lists matrix used elsewhere
+(len(), matrix[y][x], iteration, comparison), so callers can switch freely.
+"""
+from PIL import Image
+
+from lazy_imports import get_numpy
+
+# --- Lookup Tables ---
+# Text for the 8 cells of one packed byte ('# ' per set bit, '  ' per clear bit), MSB first
+_BYTE_TEXT = tuple(
+    "".join("# " if (value >> (7 - bit)) & 1 else "  " for bit in range(8))
+    for value in range(256)
+)
+# Gathers the bits at positions 6, 4, 2 and 0 of a byte into a 4-bit value (MSB first)
+_EVEN_BITS_TO_NIBBLE = bytes(
+    ((value >> 6) & 1) << 3 | ((value >> 4) & 1) << 2 | ((value >> 2) & 1) << 1 | (value & 1)
+    for value in range(256)
+)
+_NIBBLE_TO_HIGH = bytes((value << 4) & 0xFF for value in range(256))
+
+
+class CharMatrix:
+    """
+    A rows x cols matrix of '#' (bit set) and ' ' (bit clear) cells.
+    Each row is packed MSB-first into `stride` bytes of one shared bytearray;
+    padding bits at the end of a row are always zero.
+    """
+    __slots__ = ("rows", "cols", "stride", "data")
+
+    def __init__(self, rows, cols, data=None):
+        self.rows = rows
+        self.cols = cols
+        self.stride = (cols + 7) // 8
+        if data is None:
+            self.data = bytearray(rows * self.stride)
+        else:
+            if len(data) != rows * self.stride:
+                raise ValueError(f"Expected {rows * self.stride} bytes for a {cols}x{rows} matrix, got {len(data)}.")
+            self.data = bytearray(data)
+
+    # --- Construction ---
+    @classmethod
+    def from_rows(cls, matrix):
+        """Packs a list-of-lists (or list of strings) of '#'/' ' characters."""
+        rows = len(matrix)
+        cols = len(matrix[0]) if rows else 0
+        packed = cls(rows, cols)
+        for y, row in enumerate(matrix):
+            value = 0
+            for char in row:
+                value = (value << 1) | (char == '#')
+            value <<= packed.stride * 8 - cols # Left-align into the row's bytes
+            start = y * packed.stride
+            packed.data[start:start + packed.stride] = value.to_bytes(packed.stride, "big")
+        return packed
+
+    @classmethod
+    def from_bool_array(cls, array):
+        """Packs a 2-D NumPy boolean array (True = '#')."""
+        np = get_numpy()
+        rows, cols = array.shape
+        return cls(rows, cols, np.packbits(array, axis=1).tobytes())
+
+    # --- Row access ---
+    def row_view(self, y):
+        """Zero-copy view of the packed bytes of row y."""
+        start = y * self.stride
+        return memoryview(self.data)[start:start + self.stride]
+
+    def row_int(self, y):
+        """Row y as one integer; column 0 is the most significant of stride * 8 bits."""
+        start = y * self.stride
+        return int.from_bytes(self.data[start:start + self.stride], "big")
+
+    def get(self, y, x):
+        return bool(self.data[y * self.stride + (x >> 3)] & (0x80 >> (x & 7)))
+
+    def set(self, y, x, value):
+        index = y * self.stride + (x >> 3)
+        if value:
+            self.data[index] |= 0x80 >> (x & 7)
+        else:
+            self.data[index] &= ~(0x80 >> (x & 7)) & 0xFF
+
+    # --- Counting and compression ---
+    def count(self, y, x, height, width):
+        """Number of '#' cells in the height x width block at (y, x), by popcount per row."""
+        shift = self.stride * 8 - x - width
+        mask = (1 << width) - 1
+        return sum(((self.row_int(row) >> shift) & mask).bit_count() for row in range(y, y + height))
+
+    def compress_majority_2x2(self):
+        """
+        2x2 'Majority Wins' compression with inverted output, the same rule as
+        ImageProcessorLogic._compress_and_format_matrix: a block becomes '#' when
+        fewer than 2 of its 4 cells are '#'. Works on whole packed rows at a time.
+        """
+        out_rows, out_cols = self.rows // 2, self.cols // 2
+        result = CharMatrix(out_rows, out_cols)
+        if not out_rows or not out_cols:
+            return result
+
+        nbits = self.stride * 8
+        # Bit positions of the right-hand cell of each complete column pair
+        pair_mask = int.from_bytes(b"\x55" * self.stride, "big")
+        pair_mask &= ~((1 << (nbits - out_cols * 2)) - 1)
+
+        for out_y in range(out_rows):
+            top = self.row_int(out_y * 2)
+            bottom = self.row_int(out_y * 2 + 1)
+
+            # Per pair: both cells set / at least one cell set (in the right-hand bit)
+            top_both, top_any = top & (top >> 1), top | (top >> 1)
+            bottom_both, bottom_any = bottom & (bottom >> 1), bottom | (bottom >> 1)
+            two_or_more = top_both | bottom_both | (top_any & bottom_any)
+            dark = ~two_or_more & pair_mask
+
+            # Squeeze the pair bits together: 4 per byte -> 8 per byte
+            nibbles = dark.to_bytes(self.stride, "big").translate(_EVEN_BITS_TO_NIBBLE)
+            if len(nibbles) % 2:
+                nibbles += b"\x00"
+            high = int.from_bytes(nibbles[0::2].translate(_NIBBLE_TO_HIGH), "big")
+            low = int.from_bytes(nibbles[1::2], "big")
+            packed_row = (high | low).to_bytes(len(nibbles) // 2, "big")
+
+            start = out_y * result.stride
+            result.data[start:start + result.stride] = packed_row[:result.stride]
+
+        return result
+
+    # --- Conversion ---
+    def to_rows(self):
+        """Returns the classic list-of-lists of '#'/' ' characters."""
+        return [self[y] for y in range(self.rows)]
+
+    def to_bool_array(self):
+        """Returns a rows x cols NumPy boolean array (True = '#')."""
+        np = get_numpy()
+        packed = np.frombuffer(bytes(self.data), dtype=np.uint8).reshape(self.rows, self.stride)
+        return np.unpackbits(packed, axis=1, count=self.cols).astype(bool)
+
+    def to_text(self):
+        """Text output: '# ' per '#' cell, '  ' per ' ' cell, one line per row."""
+        width = self.cols * 2
+        lines = []
+        for y in range(self.rows):
+            lines.append("".join(map(_BYTE_TEXT.__getitem__, self.row_view(y)))[:width])
+            lines.append("\n")
+        return "".join(lines)
+
+    def to_image(self):
+        """1-bit image, one pixel per cell: '#' cells black, ' ' cells white."""
+        return Image.frombytes("1", (self.cols, self.rows), bytes(self.data), "raw", "1;I")
+
+    def to_mask(self):
+        """1-bit mask, one pixel per cell: '#' cells set (white), ' ' cells clear."""
+        return Image.frombytes("1", (self.cols, self.rows), bytes(self.data), "raw", "1")
+
+    # --- List-of-lists compatibility ---
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, y):
+        if isinstance(y, slice):
+            return [self[index] for index in range(*y.indices(self.rows))]
+        if y < 0:
+            y += self.rows
+        if not 0 <= y < self.rows:
+            raise IndexError("CharMatrix row index out of range")
+        text = "".join(map(_BYTE_TEXT.__getitem__, self.row_view(y)))
+        return list(text[0:self.cols * 2:2])
+
+    def __iter__(self):
+        for y in range(self.rows):
+            yield self[y]
+
+    def __eq__(self, other):
+        if isinstance(other, CharMatrix):
+            return (self.rows, self.cols, self.data) == (other.rows, other.cols, other.data)
+        if isinstance(other, list):
+            return self.to_rows() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"CharMatrix({self.cols}x{self.rows})"
@@ -0,0 +1,206 @@
+# frame_stream.py
+"""
+Frame-by-frame matrix conversion for animated images (GIF, APNG, WebP) and
+numbered image sequences. Frames are decoded lazily, one at a time, and each
+frame only recomputes (and re-renders) the matrix cells whose thresholded
+source pixels changed since the previous frame.
+"""
+import os
+import re
+
+from PIL import Image, ImageChops, ImageSequence
+
+from image_logic import CELL_SIZE, DEFAULT_BLOCK_SIZE
+from thresholding import DEFAULT_THRESHOLD_MODE
+
+# --- Constants ---
+DEFAULT_FRAME_DURATION_MS = 100 # Used for sequences and for frames that carry no duration
+FRAME_HEADER = "frame {index} {duration}ms\n" # Precedes each frame in the text stream
+ANIMATION_FORMATS = {".gif": "GIF", ".png": "PNG", ".apng": "PNG", ".webp": "WEBP"}
+
+
+def natural_sort_key(path):
+    """Sort key that orders frame_2.png before frame_10.png."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", os.path.basename(path))]
+
+
+def iter_frames(logic, source, default_duration=DEFAULT_FRAME_DURATION_MS):
+    """
+    Lazily yields (frame, duration_ms) for every frame of source: the path of an animated
+    image, or a list of still image paths forming a sequence (in natural order).
+    Each frame is prepared by logic.prepare_frame (grayscale, reduced like load_image).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with Image.open(source) as image:
+            for frame in ImageSequence.Iterator(image):
+                yield logic.prepare_frame(frame), frame.info.get("duration") or default_duration
+        return
+
+    for path in sorted(source, key=natural_sort_key):
+        with Image.open(path) as image:
+            if logic.decode_min_size:
+                image.draft("L", (logic.decode_min_size, logic.decode_min_size)) # JPEG only; no-op otherwise
+            yield logic.prepare_frame(image), default_duration
+
+
+class FrameMatrixStream:
+    """
+    Keeps the matrix, its text lines and (optionally) its rendered image for the
+    previous frame. update() thresholds the new frame, finds the changed pixels in
+    each row of blocks with a Pillow difference, and recomputes and re-renders only
+    the span of blocks that changed.
+    """
+    def __init__(self, logic, resize_dim, block_size=DEFAULT_BLOCK_SIZE, block_threshold=None,
+                 threshold_mode=DEFAULT_THRESHOLD_MODE, window=None, render=False):
+        self.logic = logic
+        self.block_size = tuple(block_size)
+        self.block_threshold = block_threshold
+        self.threshold_mode = threshold_mode
+        self.window = window
+        self.render = render
+
+        self.dimension = logic.fit_dimension(resize_dim, self.block_size)
+        self.cols = self.dimension // self.block_size[0]
+        self.rows = self.dimension // self.block_size[1]
+
+        self.matrix = None # Rows of '#'/' ' cells for the last frame
+        self.lines = None # Text line per matrix row (without the newline)
+        self.image = None # Rendered matrix image, grayscale (render=True only)
+        self._binary = None # Last frame, resized and thresholded to 0/255
+
+    def _threshold(self, frame):
+        """Resizes a frame like process_and_resize and maps bright pixels to 255, dark to 0."""
+        resized = frame.resize((self.dimension, self.dimension), Image.Resampling.NEAREST)
+        thresholded, cutoff = self.logic.apply_threshold(resized, self.threshold_mode, self.window)
+        return thresholded.point([255 if value >= cutoff else 0 for value in range(256)])
+
+    def _compress(self, binary):
+        # The frame is already bilevel, so the fixed global cutoff reproduces it exactly
+        return self.logic.generate_character_matrix(
+            binary, block_size=self.block_size, block_threshold=self.block_threshold
+        )
+
+    def _changed_spans(self, binary):
+        """(row, first col, end col) of every row of blocks whose pixels differ from the last frame."""
+        difference = ImageChops.difference(binary, self._binary)
+        bbox = difference.getbbox()
+        if bbox is None:
+            return []
+
+        block_width, block_height = self.block_size
+        spans = []
+        for row in range(bbox[1] // block_height, min(self.rows, -(-bbox[3] // block_height))):
+            band = difference.crop((0, row * block_height, self.cols * block_width, (row + 1) * block_height))
+            band_bbox = band.getbbox()
+            if band_bbox is not None:
+                spans.append((row, band_bbox[0] // block_width, min(self.cols, -(-band_bbox[2] // block_width))))
+        return spans
+
+    def update(self, frame):
+        """
+        Feeds the next frame. Returns the number of matrix cells recomputed
+        (every cell for the first frame, 0 for an unchanged frame).
+        """
+        binary = self._threshold(frame)
+
+        if self._binary is None:
+            matrix, text = self._compress(binary)
+            self.matrix = [list(row) for row in matrix]
+            self.lines = text.split("\n")[:-1]
+            if self.render:
+                self.image = self.logic.create_matrix_image(self.matrix, mode="L")
+            self._binary = binary
+            return self.rows * self.cols
+
+        block_width, block_height = self.block_size
+        recomputed = 0
+        for row, start, end in self._changed_spans(binary):
+            region = binary.crop((start * block_width, row * block_height, end * block_width, (row + 1) * block_height))
+            cells, text = self._compress(region)
+            self.matrix[row][start:end] = cells[0]
+            line = self.lines[row]
+            self.lines[row] = line[:start * 2] + text[:-1] + line[end * 2:]
+            if self.render:
+                self.image.paste(self.logic.create_matrix_image(cells, mode="L"), (start * CELL_SIZE, row * CELL_SIZE))
+            recomputed += end - start
+
+        self._binary = binary
+        return recomputed
+
+    def text(self):
+        """Text output of the last frame, in the same format as generate_character_matrix."""
+        return "".join(line + "\n" for line in self.lines)
+
+
+def iter_frame_matrices(logic, source, resize_dim, render=False, **options):
+    """
+    Yields one dict per frame: index, duration (ms), text, recomputed (cells) and,
+    with render=True, image (a copy of the rendered matrix image). options are the
+    FrameMatrixStream block and threshold settings.
+    """
+    stream = FrameMatrixStream(logic, resize_dim, render=render, **options)
+    for index, (frame, duration) in enumerate(iter_frames(logic, source)):
+        recomputed = stream.update(frame)
+        yield {
+            "index": index,
+            "duration": duration,
+            "text": stream.text(),
+            "recomputed": recomputed,
+            "image": stream.image.copy() if render else None,
+        }
+
+
+def write_frame_stream(logic, source, destination, resize_dim, animations=(), **options):
+    """
+    Writes every frame's text, each preceded by a FRAME_HEADER line, to a path or text
+    file object (or nowhere, for None) as the frames are converted. In the same pass the
+    rendered frames are encoded to each (destination, format) in animations (see
+    encode_animation). Returns (frames, cells recomputed).
+    """
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, "w", encoding="ascii") as text_file:
+            return write_frame_stream(logic, source, text_file, resize_dim, animations, **options)
+
+    rendered = []
+    frames = recomputed = 0
+    for result in iter_frame_matrices(logic, source, resize_dim, render=bool(animations), **options):
+        if destination is not None:
+            destination.write(FRAME_HEADER.format(index=result["index"], duration=result["duration"]))
+            destination.write(result["text"])
+        if animations:
+            result["image"].info["duration"] = result["duration"]
+            rendered.append(result["image"])
+        frames += 1
+        recomputed += result["recomputed"]
+
+    for animation, format in animations:
+        encode_animation(logic, rendered, animation, format)
+    return frames, recomputed
+
+
+def encode_animation(logic, frames, destination, format=None):
+    """
+    Encodes rendered frames (each with info["duration"] in ms) as one looping animation:
+    GIF, APNG or animated WebP, from format or the destination's extension.
+    """
+    if not frames:
+        raise ValueError("The source has no frames.")
+    if format is None:
+        extension = os.path.splitext(os.fspath(destination))[1].lower()
+        format = ANIMATION_FORMATS.get(extension)
+        if format is None:
+            raise ValueError(f"Cannot tell the animation format of {destination!r}; pass format=.")
+
+    logic.encode_image(
+        frames[0], destination, format, save_all=True, append_images=frames[1:],
+        duration=[frame.info["duration"] for frame in frames], loop=0
+    )
+
+
+def save_animated_matrix(logic, source, destination, resize_dim, format=None, **options):
+    """
+    Renders every frame's matrix image and encodes them as one animation (see
+    encode_animation), keeping each source frame's duration. Returns the number of frames.
+    """
+    frames, _ = write_frame_stream(logic, source, None, resize_dim, [(destination, format)], **options)
+    return frames
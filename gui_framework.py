@@ -1,14 +1,34 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext
-from PIL import Image, ImageTk
-from tkinterdnd2 import DND_ALL, TkinterDnD 
-from image_logic import ImageProcessorLogic, CELL_SIZE 
+from tkinter import filedialog, messagebox, ttk
+import tkinter.font as tkfont
+from PIL import ImageTk
+from image_logic import ImageProcessorLogic, MIN_DIMENSION, MAX_DIMENSION, DEFAULT_BLOCK_SIZE 
+from instrumentation import format_record
+from thresholding import THRESHOLD_MODES, DEFAULT_THRESHOLD_MODE
+from ui_actions import open_portfolio_link, save_image_dialog
 import os
+import queue
+import threading
 
 # --- Layout Constants for Fixed Sizing ---
 PANE_WIDTH = 380 
 PANE_HEIGHT = 550
 PANE_BG = "#f5f5f5"
+PREVIEW_MAX_SIZE = (PANE_WIDTH - 40, PANE_HEIGHT - 90) # Drawable area for the resized source preview in Pane 2
+
+# --- Background Refresh Constants ---
+REFRESH_POLL_MS = 30 # How often the Tk loop checks for results from the refresh worker
+REFRESH_STEPS = ("Resizing image", "Generating matrix", "Rendering matrix image", "Preparing preview")
+LIVE_PREVIEW_DEBOUNCE_MS = 120 # Wait for the slider to settle this long before a live refresh
+MAX_BLOCK_SIZE = 8 # Largest N offered for N x N block compression
+
+# --- Batch Queue Constants ---
+QUEUE_POLL_MS = 100 # How often the queue window checks the worker pool
+QUEUE_WORKERS = max(1, (os.cpu_count() or 2) - 1) # Leave one core for the Tk loop
+QUEUE_FILE_TYPES = "*.png *.jpg *.jpeg *.gif *.bmp *.tif *.tiff *.webp"
+
+# --- Text Output Constants ---
+WHEEL_SCROLL_LINES = 3 # Lines scrolled per mouse-wheel notch in the text output pane
 
 # --- Tooltip Class ---
 class Tooltip:
@@ -49,6 +69,277 @@ class Tooltip:
 # ----------------------------------------------------------------------
 
 
+class VirtualTextView(tk.Frame):
+    """
+    Read-only, scrollable text pane that keeps only the visible window of lines in the
+    Tk Text widget. The full text stays in a Python list; scrolling re-renders the window,
+    so Tk never lays out more than a screenful, however large the matrix is.
+    """
+    def __init__(self, master, font=("Courier", 8), **text_options):
+        super().__init__(master)
+        self.lines = []
+        self.top = 0 # Index of the first visible line
+        self.line_height = max(1, tkfont.Font(root=self, font=font).metrics("linespace"))
+
+        self.text = tk.Text(self, wrap=tk.NONE, font=font, state=tk.DISABLED, **text_options)
+        self.vbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.hbar = tk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.text.xview)
+        self.text.config(xscrollcommand=self.hbar.set)
+
+        self.text.grid(row=0, column=0, sticky="nsew")
+        self.vbar.grid(row=0, column=1, sticky="ns")
+        self.hbar.grid(row=1, column=0, sticky="ew")
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.text.bind("<Configure>", lambda event: self._render())
+        self.text.bind("<MouseWheel>", self._on_mousewheel) # Windows / macOS
+        self.text.bind("<Button-4>", lambda event: self.scroll_lines(-WHEEL_SCROLL_LINES) or "break") # X11
+        self.text.bind("<Button-5>", lambda event: self.scroll_lines(WHEEL_SCROLL_LINES) or "break")
+        self.text.bind("<Prior>", lambda event: self.scroll_lines(-self.visible_line_count()) or "break")
+        self.text.bind("<Next>", lambda event: self.scroll_lines(self.visible_line_count()) or "break")
+
+    def set_text(self, text):
+        """Replaces the content (a matrix or a status message) and scrolls back to the top."""
+        self.lines = text.splitlines()
+        self.top = 0
+        self._render()
+
+    def visible_line_count(self):
+        return max(1, self.text.winfo_height() // self.line_height)
+
+    def scroll_lines(self, count):
+        self.top += count
+        self._render()
+
+    def _on_scrollbar(self, action, *args):
+        if action == tk.MOVETO:
+            self.top = int(float(args[0]) * len(self.lines))
+        elif action == tk.SCROLL:
+            step = int(args[0])
+            self.top += step * self.visible_line_count() if args[1] == tk.PAGES else step
+        self._render()
+
+    def _on_mousewheel(self, event):
+        self.scroll_lines(-WHEEL_SCROLL_LINES if event.delta > 0 else WHEEL_SCROLL_LINES)
+        return "break"
+
+    def _render(self):
+        """Puts just the visible window of lines into the Text widget and syncs the scrollbar."""
+        visible = self.visible_line_count()
+        total = len(self.lines)
+        self.top = max(0, min(self.top, total - visible))
+
+        x_position = self.text.xview()[0]
+        self.text.config(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", "\n".join(self.lines[self.top:self.top + visible + 1]))
+        self.text.config(state=tk.DISABLED)
+        self.text.xview_moveto(x_position)
+
+        if total:
+            self.vbar.set(self.top / total, min(1.0, (self.top + visible) / total))
+        else:
+            self.vbar.set(0.0, 1.0)
+# ----------------------------------------------------------------------
+
+
+class BatchQueueWindow(tk.Toplevel):
+    """
+    Lists the files of a BatchQueue with their state, an overall progress bar,
+    Previous/Next paging through finished results (shown in the main panes) and
+    bulk export. Closing the window only hides it; the queue keeps running.
+    """
+    def __init__(self, app, batch_queue):
+        super().__init__(app.root)
+        self.app = app
+        self.batch_queue = batch_queue
+        self.title("Batch Queue")
+        self.geometry("560x380")
+        self.protocol("WM_DELETE_WINDOW", self.withdraw)
+        self.bind("<Destroy>", self._on_destroy)
+
+        self._poll_id = None
+        self._export_messages = queue.Queue() # Progress from the export thread
+        self._exporting = False
+
+        tree_frame = tk.Frame(self)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        self.tree = ttk.Treeview(tree_frame, columns=("file", "status", "matrix"), show="headings", selectmode="browse")
+        for column, heading, width in (("file", "File", 280), ("status", "Status", 90), ("matrix", "Matrix", 140)):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor=tk.W)
+        scrollbar = tk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.config(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+
+        self.progress = ttk.Progressbar(self, mode="determinate")
+        self.progress.pack(fill=tk.X, padx=10)
+        self.status = tk.Label(self, text="")
+        self.status.pack()
+
+        buttons = tk.Frame(self)
+        buttons.pack(pady=(0, 10))
+        tk.Button(buttons, text="< Previous", command=lambda: self.page(-1)).pack(side=tk.LEFT, padx=2)
+        tk.Button(buttons, text="Next >", command=lambda: self.page(1)).pack(side=tk.LEFT, padx=2)
+        self.export_button = tk.Button(buttons, text="Export All...", command=self.export_all, bg="blue", fg="white")
+        self.export_button.pack(side=tk.LEFT, padx=(12, 2))
+        tk.Button(buttons, text="Cancel Pending", command=self.cancel_pending).pack(side=tk.LEFT, padx=2)
+        tk.Button(buttons, text="Clear", command=self.clear).pack(side=tk.LEFT, padx=2)
+
+    def add_jobs(self, jobs):
+        """Adds rows for newly queued jobs and makes sure the pool is being polled."""
+        start = len(self.batch_queue.jobs) - len(jobs)
+        for index, job in enumerate(jobs, start=start):
+            self.tree.insert("", tk.END, iid=str(index), values=(job.name, job.status, ""))
+        self.deiconify()
+        self.lift()
+        self._update_summary()
+        self._schedule_poll()
+
+    def _schedule_poll(self):
+        if self._poll_id is None:
+            self._poll_id = self.after(QUEUE_POLL_MS, self._poll)
+
+    def _poll(self):
+        """Applies state changes from the pool and the export thread (Tk thread only)."""
+        self._poll_id = None
+        for index in self.batch_queue.poll():
+            self._update_row(index)
+            # Show the first result as soon as it is ready
+            if not self.tree.selection() and self.batch_queue.jobs[index].status == "done":
+                self.tree.selection_set(str(index))
+                self.tree.see(str(index))
+
+        try:
+            while True:
+                kind, *payload = self._export_messages.get_nowait()
+                if kind == "progress":
+                    done, total = payload
+                    self.status.config(text=f"Exporting... {done}/{total}")
+                else:
+                    self._finish_export(*payload)
+        except queue.Empty:
+            pass
+
+        if not self._exporting:
+            self._update_summary()
+        if self.batch_queue.is_busy() or self._exporting:
+            self._schedule_poll()
+
+    def _update_row(self, index):
+        job = self.batch_queue.jobs[index]
+        result = job.result or {}
+        if result.get("error"):
+            detail = result["error"]
+        elif "matrix" in result:
+            matrix = result["matrix"]
+            detail = f"{matrix.cols}x{matrix.rows}" + (f" (QR v{result['qr_grid'].version})" if job.qr else "")
+        else:
+            detail = ""
+        self.tree.item(str(index), values=(job.name, job.status, detail))
+
+    def _update_summary(self):
+        counts = self.batch_queue.counts()
+        total = len(self.batch_queue.jobs)
+        finished = counts["done"] + counts["failed"] + counts["cancelled"]
+        self.progress.config(maximum=max(1, total), value=finished)
+        summary = f"{counts['done']}/{total} done"
+        if counts["running"] or counts["queued"]:
+            summary += f", {counts['running']} running, {counts['queued']} queued"
+        if counts["failed"]:
+            summary += f", {counts['failed']} failed"
+        if counts["cancelled"]:
+            summary += f", {counts['cancelled']} cancelled"
+        self.status.config(text=summary)
+
+    def _on_select(self, event=None):
+        selection = self.tree.selection()
+        if selection:
+            job = self.batch_queue.jobs[int(selection[0])]
+            if job.status == "done":
+                self.app.show_queue_result(job)
+
+    def page(self, step):
+        """Selects the previous (step=-1) or next (step=1) finished result, wrapping around."""
+        finished = [index for index, job in enumerate(self.batch_queue.jobs) if job.status == "done"]
+        if not finished:
+            return
+        selection = self.tree.selection()
+        current = int(selection[0]) if selection else None
+        if step > 0:
+            following = [index for index in finished if current is None or index > current]
+            target = following[0] if following else finished[0]
+        else:
+            preceding = [index for index in finished if current is None or index < current]
+            target = preceding[-1] if preceding else finished[-1]
+        self.tree.selection_set(str(target))
+        self.tree.see(str(target))
+
+    def export_all(self):
+        """Writes every finished result (PNG + text) to a chosen folder on a background thread."""
+        if self._exporting:
+            return
+        if not self.batch_queue.finished_jobs():
+            messagebox.showerror("Export Error", "No finished results to export yet.", parent=self)
+            return
+        output_dir = filedialog.askdirectory(parent=self, title="Export all results to")
+        if not output_dir:
+            return
+
+        def run_export():
+            try:
+                outputs, errors = self.batch_queue.export(
+                    output_dir, progress=lambda done, total: self._export_messages.put(("progress", done, total))
+                )
+            except Exception as e:
+                outputs, errors = [], [str(e)]
+            self._export_messages.put(("done", output_dir, outputs, errors))
+
+        self._exporting = True
+        self.export_button.config(state=tk.DISABLED)
+        threading.Thread(target=run_export, daemon=True).start()
+        self._schedule_poll()
+
+    def _finish_export(self, output_dir, outputs, errors):
+        self._exporting = False
+        self.export_button.config(state=tk.NORMAL)
+        if errors:
+            messagebox.showerror(
+                "Export Error", f"{len(errors)} file(s) could not be written:\n" + "\n".join(errors[:10]), parent=self
+            )
+        else:
+            messagebox.showinfo("Export", f"Wrote {len(outputs)} files to:\n{output_dir}", parent=self)
+
+    def cancel_pending(self):
+        self.batch_queue.cancel_pending()
+        for index, job in enumerate(self.batch_queue.jobs):
+            if job.status == "cancelled":
+                self._update_row(index)
+        self._update_summary()
+
+    def clear(self):
+        """Cancels pending files and empties the list (not while an export is running)."""
+        if self._exporting:
+            return
+        self.batch_queue.clear()
+        self.tree.delete(*self.tree.get_children())
+        self._update_summary()
+
+    def _on_destroy(self, event):
+        # Fires for every child widget too; only the window itself (e.g. on app exit) stops the pool
+        if event.widget is self:
+            self.batch_queue.shutdown()
+# ----------------------------------------------------------------------
+
+
+class RefreshCancelled(Exception):
+    """Raised inside the refresh worker when a newer refresh has superseded it."""
+# ----------------------------------------------------------------------
+
+
 class ImageProcessorGUI:
     def __init__(self, root):
         self.root = root
@@ -60,10 +351,25 @@ class ImageProcessorGUI:
         self.root.resizable(False, False) # Lock the size
 
         self.logic = ImageProcessorLogic() 
+        # Tk photos of panes 1 and 2, kept and pasted into while the preview size stays the same
         self.photo = None 
         self.resized_photo = None 
         self.current_matrix_image = None # PIL Image of the final character matrix (used for Download)
-        
+        self.current_matrix = None # The matrix behind it, for the direct exports (see matrix_export)
+
+        # --- Background refresh state ---
+        # Each refresh gets a generation number and a cancel event; results from
+        # older generations are discarded when they reach the Tk loop.
+        self._refresh_results = queue.Queue()
+        self._refresh_generation = 0
+        self._refresh_cancel = None
+        self._refresh_poll_id = None
+        self._live_preview_id = None
+
+        # --- Batch queue (multi-file drops), created on first use ---
+        self.batch_queue = None
+        self.queue_window = None
+
         # --- Top Bar ---
         self.top_bar = tk.Frame(root, height=30)
         self.top_bar.pack(fill=tk.X, padx=10, pady=(5, 0))
@@ -79,10 +385,13 @@ class ImageProcessorGUI:
         self.setup_output_pane(self.main_container)
         
         # Initial status text
-        self.text_output.insert(tk.END, "Load an image and click Refresh to generate the character matrix.")
+        self.text_output.set_text("Load an image and click Refresh to generate the character matrix.")
 
-        # Bind the slider change only to update the label, NOT the matrix
+        # The slider updates the label; the matrix follows it only in Live Preview mode
         self.slider.config(command=self.update_slider_value) 
+
+        # Load image plugins, NumPy and the glyph font in the background once the window is up
+        self.root.after(500, lambda: threading.Thread(target=self.logic.warm_up, daemon=True).start())
         
     def setup_top_bar(self, frame):
         tk.Label(frame).pack(side=tk.LEFT, expand=True) 
@@ -90,7 +399,7 @@ class ImageProcessorGUI:
         self.how_to_use_button = tk.Button(
             frame, 
             text="ⓘ How to Use", 
-            command=self.logic.open_portfolio_link,
+            command=open_portfolio_link,
             relief=tk.FLAT, 
             fg="blue"
         )
@@ -131,25 +440,81 @@ class ImageProcessorGUI:
         )
         self.image_label.pack(fill=tk.BOTH, expand=True)
         self.image_label.bind("<Button-1>", self.browse_image)
-        self.image_label.drop_target_register(DND_ALL) 
-        self.image_label.dnd_bind('<<Drop>>', self.drop_image) 
+        # Drag & drop (tkdnd) is loaded after the window is on screen, see _enable_drag_and_drop
+        self.root.after_idle(self._enable_drag_and_drop)
         
         tk.Button(self.input_pane, text="Browse Image", command=self.browse_image).pack(pady=(0, 10))
         
-        tk.Label(self.input_pane, text="Matrix Dimension (10 to 200 pixels):", bg=PANE_BG).pack()
+        tk.Label(self.input_pane, text=f"Matrix Dimension ({MIN_DIMENSION} to {MAX_DIMENSION} pixels):", bg=PANE_BG).pack()
         self.slider = tk.Scale(
-            self.input_pane, from_=10, to=200, orient=tk.HORIZONTAL, length=300, 
+            self.input_pane, from_=MIN_DIMENSION, to=MAX_DIMENSION, orient=tk.HORIZONTAL, length=300, 
             resolution=1
         )
         self.slider.set(50)
         self.slider.pack(pady=5, padx=10, fill=tk.X)
         self.slider_value = tk.Label(self.input_pane, text="Value: 50", bg=PANE_BG)
         self.slider_value.pack()
+
+        # Block size: N x N source pixels per matrix cell (2 = the classic 2x2 majority)
+        block_row = tk.Frame(self.input_pane, bg=PANE_BG)
+        block_row.pack(pady=(5, 0))
+        tk.Label(block_row, text="Block Size (N x N pixels per cell):", bg=PANE_BG).pack(side=tk.LEFT)
+        self.block_size = tk.IntVar(value=DEFAULT_BLOCK_SIZE[0])
+        tk.Spinbox(
+            block_row, from_=1, to=MAX_BLOCK_SIZE, width=3, textvariable=self.block_size, state="readonly",
+            command=lambda: self.update_slider_value(self.slider.get())
+        ).pack(side=tk.LEFT, padx=5)
+
+        # Threshold mode: global 128 cutoff, Otsu, or local mean / Sauvola for unevenly lit scans
+        threshold_row = tk.Frame(self.input_pane, bg=PANE_BG)
+        threshold_row.pack(pady=(5, 0))
+        tk.Label(threshold_row, text="Threshold:", bg=PANE_BG).pack(side=tk.LEFT)
+        self.threshold_mode = tk.StringVar(value=DEFAULT_THRESHOLD_MODE)
+        threshold_menu = ttk.Combobox(
+            threshold_row, textvariable=self.threshold_mode, values=THRESHOLD_MODES, state="readonly", width=10
+        )
+        threshold_menu.pack(side=tk.LEFT, padx=5)
+        threshold_menu.bind("<<ComboboxSelected>>", lambda event: self.update_slider_value(self.slider.get()))
+
+        # Live Preview: panes 2 and 3 follow the slider (served from the resolution pyramid)
+        self.live_preview = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            self.input_pane, text="Live Preview (updates while dragging)",
+            variable=self.live_preview, bg=PANE_BG
+        ).pack()
+
+        # QR grid: one cell per QR module, located by the finder patterns (slider and block size unused)
+        self.qr_grid_mode = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            self.input_pane, text="Sample QR Modules (one cell per module)",
+            variable=self.qr_grid_mode, bg=PANE_BG, command=lambda: self.update_slider_value(self.slider.get())
+        ).pack()
         
         # Submit/Refresh Button
         tk.Button(self.input_pane, text="Refresh Matrix", command=self.refresh_matrix, bg="#0088AA", fg="white", padx=20, pady=5).pack(pady=20)
         tk.Button(self.input_pane, text="Download Matrix Image", command=self.download_image, bg="blue", fg="white", padx=10, pady=5).pack()
 
+        # Progress of the background refresh
+        self.refresh_progress = ttk.Progressbar(self.input_pane, mode="determinate", maximum=len(REFRESH_STEPS), length=300)
+        self.refresh_progress.pack(pady=(15, 0), padx=10, fill=tk.X)
+        self.refresh_status = tk.Label(self.input_pane, text="", bg=PANE_BG)
+        self.refresh_status.pack()
+
+
+    def _enable_drag_and_drop(self):
+        """
+        Loads tkinterdnd2 and the tkdnd Tcl package on first idle, so they do not delay
+        the first frame. Works with a plain tk.Tk root as well as TkinterDnD.Tk.
+        """
+        try:
+            from tkinterdnd2 import DND_ALL, TkinterDnD
+            if not getattr(self.root, "TkdndVersion", None):
+                self.root.TkdndVersion = TkinterDnD._require(self.root)
+            self.image_label.drop_target_register(DND_ALL) 
+            self.image_label.dnd_bind('<<Drop>>', self.drop_image) 
+        except (ImportError, RuntimeError, tk.TclError):
+            # No tkdnd available: browsing still works
+            self.image_label.config(text="Click to Browse for an Image")
 
     # --- PANE 2: PREVIEW (Single Box, Fixed Size) ---
     def setup_preview_pane(self, container):
@@ -181,6 +546,15 @@ class ImageProcessorGUI:
         self.size_info_label = tk.Label(self.preview_pane, text="Output size: N/A", bg=PANE_BG)
         self.size_info_label.pack(pady=5)
 
+        # Optional per-stage timing status line (instrumentation is off unless checked)
+        self.show_timings = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            self.preview_pane, text="Show stage timings", variable=self.show_timings,
+            command=self.toggle_stage_timings, bg=PANE_BG
+        ).pack()
+        self.timing_label = tk.Label(self.preview_pane, text="", bg=PANE_BG, wraplength=PANE_WIDTH - 40, justify=tk.LEFT)
+        self.timing_label.pack()
+
 
     # --- PANE 3: TEXT OUTPUT (Fixed Size & Scrollable) ---
     def setup_output_pane(self, container):
@@ -211,10 +585,9 @@ class ImageProcessorGUI:
             bg="#e0e0e0"
         ).pack(side=tk.RIGHT)
         
-        # Text Widget for Output with Scrollbars (ScrolledText is simpler)
-        self.text_output = scrolledtext.ScrolledText(
+        # Virtualized text view: only the visible lines of large matrices are handed to Tk
+        self.text_output = VirtualTextView(
             self.output_pane, 
-            wrap=tk.NONE, # Important for ASCII/matrix output
             font=("Courier", 8),
             bg="#f0f0f0",
             relief=tk.SUNKEN
@@ -224,87 +597,260 @@ class ImageProcessorGUI:
     
     # --- HANDLERS ---
     def browse_image(self, event=None):
-        file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.png *.jpg *.jpeg *.gif")])
-        if file_path:
-            self._display_loaded_image(file_path)
-    
+        """One selected file is loaded for interactive use; several go to the batch queue."""
+        file_paths = filedialog.askopenfilenames(filetypes=[("Image files", QUEUE_FILE_TYPES)])
+        file_paths = self.root.tk.splitlist(file_paths) # Some Tk versions return a single Tcl list string
+        if len(file_paths) == 1:
+            self._display_loaded_image(file_paths[0])
+        elif file_paths:
+            self._enqueue_files(file_paths)
+
     def drop_image(self, event):
-        file_path = event.data.strip().strip('{}')
-        if ' ' in file_path: file_path = file_path.split(' ')[0]
-             
-        if os.path.isfile(file_path):
-            self._display_loaded_image(file_path)
-        else:
-            messagebox.showerror("Error", f"Invalid file path dropped: {file_path}")
+        """
+        One dropped file is loaded for interactive use; several files, or any folder,
+        go to the batch queue. tkdnd delivers a Tcl list (paths with spaces are braced).
+        """
+        from batch_cli import IMAGE_EXTENSIONS, collect_image_paths
+
+        dropped = self.root.tk.splitlist(event.data)
+        files = [path for path in dropped if os.path.isfile(path)]
+        folders = [path for path in dropped if os.path.isdir(path)]
+        if len(files) + len(folders) < len(dropped):
+            invalid = [path for path in dropped if path not in files and path not in folders]
+            messagebox.showerror("Error", f"Invalid file path dropped: {invalid[0]}")
+
+        if len(files) == 1 and not folders:
+            self._display_loaded_image(files[0])
+            return
+
+        paths = [os.path.abspath(path) for path in files if path.lower().endswith(IMAGE_EXTENSIONS)]
+        paths += collect_image_paths(folders)
+        if paths:
+            self._enqueue_files(paths)
+        elif files or folders:
+            messagebox.showerror("Error", "No image files found in the dropped items.")
+
+    def _enqueue_files(self, file_paths):
+        """Queues files with the current settings; they convert in parallel on a worker pool."""
+        # Imported here: the pool machinery is only needed once several files are dropped
+        from batch_queue import BatchQueue, spawn_context
+
+        if self.batch_queue is None:
+            self.batch_queue = BatchQueue(workers=QUEUE_WORKERS, mp_context=spawn_context())
+            self.queue_window = BatchQueueWindow(self, self.batch_queue)
+
+        block = self.block_size.get()
+        jobs = self.batch_queue.add(
+            file_paths, self.slider.get(), block_size=(block, block), threshold_mode=self.threshold_mode.get(),
+            qr=self.qr_grid_mode.get(), preview_size=PREVIEW_MAX_SIZE
+        )
+        self.queue_window.add_jobs(jobs)
+
+    def show_queue_result(self, job):
+        """Shows a finished queue result in panes 2 and 3; Copy Text and Download then use it."""
+        self._cancel_refresh()
+        result = dict(job.result, live=False, metrics=None)
+        result["matrix_image"] = self.logic.create_matrix_image(result["matrix"])
+        result["source_preview"] = self.logic.scale_preview(result["source_preview"], PREVIEW_MAX_SIZE)
+        self._apply_refresh_result(result)
+        self.refresh_status.config(text=f"Queue result: {job.name}")
     
     def _display_loaded_image(self, file_path):
         """Calls logic to load image and updates the UI in the input pane."""
+        # Results of a refresh still running for the previous image are no longer wanted
+        self._cancel_refresh()
         try:
             # Load the original image for the small thumbnail preview
             preview_img, _ = self.logic.load_image(file_path)
             
             # Convert PIL image for Tkinter display (small thumbnail for Input Pane)
-            self.photo = ImageTk.PhotoImage(preview_img)
-            self.image_label.config(image=self.photo, text="")
-            self.image_label.image = self.photo
+            photo = self._update_photo(self.photo, preview_img)
+            if photo is not self.photo:
+                self.photo = photo
+                self.image_label.config(image=self.photo)
+                self.image_label.image = self.photo
+            self.image_label.config(text="")
         except Exception as e:
             messagebox.showerror("Error Loading Image", f"Could not load image: {e}")
             self.image_label.config(image=None, text="Error loading image.\nClick to browse.")
             self.logic.current_image = None
             
         # Clear previous outputs when a new image is loaded
-        self.text_output.delete("1.0", tk.END)
-        self.text_output.insert(tk.END, "New image loaded. Click 'Refresh Matrix' to generate.")
+        self.logic.text_output_buffer = ""
+        self.text_output.set_text("New image loaded. Click 'Refresh Matrix' to generate.")
         self.resized_preview_label.config(image=None, text="Original Image scaled to matrix size (e.g., 50x50)")
     
+    def toggle_stage_timings(self):
+        """Turns the logic's per-stage instrumentation on or off (applies from the next refresh)."""
+        self.logic.enable_profiling(self.show_timings.get())
+        self.timing_label.config(text="Timings appear after the next refresh." if self.show_timings.get() else "")
+
     def update_slider_value(self, value):
         self.slider_value.config(text=f"Value: {value}")
 
-    # The main processing function, only called by the Refresh button
- # The main processing function, only called by the Refresh button
+        if self.live_preview.get() and self.logic.current_image:
+            # Debounce: restart the timer on every slider move, refresh once it settles
+            if self._live_preview_id is not None:
+                self.root.after_cancel(self._live_preview_id)
+            self._live_preview_id = self.root.after(LIVE_PREVIEW_DEBOUNCE_MS, self._refresh_live_preview)
+
+    def _refresh_live_preview(self):
+        self._live_preview_id = None
+        if self.logic.current_image:
+            self._start_refresh(live=True)
+
+    # The main processing function, called by the Refresh button
     def refresh_matrix(self):
         """
-        Processes the image using the current slider value and updates the preview
-        and text output panes, ensuring the resized image fits the pane.
+        Starts processing the image with the current slider value on a background
+        worker. Any refresh still in progress is cancelled; its results are dropped.
         """
         if not self.logic.current_image:
-            self.text_output.delete("1.0", tk.END)
-            self.text_output.insert(tk.END, "Error: Please load an image first.")
+            self.text_output.set_text("Error: Please load an image first.")
             return
-            
+
+        self._start_refresh(live=False)
+
+    def _start_refresh(self, live):
+        """
+        Launches the refresh worker. A live refresh resizes from the pyramid and
+        skips rendering the (downloadable) matrix image.
+        """
         resize_dim = self.slider.get()
+        block = self.block_size.get()
+        threshold_mode = self.threshold_mode.get()
+        qr_mode = self.qr_grid_mode.get()
+
+        self._cancel_refresh()
+        self._refresh_generation += 1
+        self._refresh_cancel = threading.Event()
+
+        worker = threading.Thread(
+            target=self._run_refresh_job,
+            args=(self._refresh_generation, self._refresh_cancel, resize_dim, live, (block, block), threshold_mode, qr_mode),
+            daemon=True
+        )
+        worker.start()
+
+        self._show_refresh_progress(0)
+        if self._refresh_poll_id is None:
+            self._refresh_poll_id = self.root.after(REFRESH_POLL_MS, self._poll_refresh_results)
+
+    def _cancel_refresh(self):
+        """Signals the running refresh worker (if any) to stop at its next checkpoint."""
+        if self._refresh_cancel is not None:
+            self._refresh_cancel.set()
+            self._refresh_cancel = None
+            self.refresh_progress.config(value=0)
+            self.refresh_status.config(text="")
+
+    def _run_refresh_job(self, generation, cancel_event, resize_dim, live=False, block_size=DEFAULT_BLOCK_SIZE,
+                         threshold_mode=DEFAULT_THRESHOLD_MODE, qr_mode=False):
+        """
+        Runs the compute stages off the Tk thread. Never touches widgets:
+        progress and results are handed back through the results queue.
+        """
+        def checkpoint(step):
+            if cancel_event.is_set():
+                raise RefreshCancelled()
+            self._refresh_results.put(("progress", generation, step))
+
         try:
-            # --- Logic Calls ---
-            resized_image_pil = self.logic.process_and_resize(resize_dim)
-            matrix, full_text_output = self.logic.generate_character_matrix(resized_image_pil)
-            matrix_image_pil = self.logic.create_matrix_image(matrix)
-            self.current_matrix_image = matrix_image_pil # Store PIL Image for the Download button
-
-            # 4. Calculate display parameters based on the new matrix image size (Logic)
-            display_w, display_h, text_w, text_h = self.logic.calculate_display_params(matrix_image_pil)
-            
-            
-            # --- Update Preview Pane 2 (Resized Source Image) ---
-            
-            # Maximum drawable space in Pane 2 (Pane dimensions - padding/labels)
-            # This accounts for the top title and the bottom size_info_label.
-            max_width_drawable = PANE_WIDTH - 40   # 380 - (10*2 padding) - (20 margin for safety)
-            max_height_drawable = PANE_HEIGHT - 90 # 550 - (approx 90px for labels/margins)
-            
-            # Create a copy of the *resized* image for the preview
-            source_preview = resized_image_pil.copy()
-            
-            # Scale the image to fit the maximum drawable area while maintaining aspect ratio
-            source_preview.thumbnail((max_width_drawable, max_height_drawable))
-            
-            self.resized_photo = ImageTk.PhotoImage(source_preview)
-            
+            with self.logic.profile_run("refresh", dimension=resize_dim, live=live, block_size=block_size,
+                                        threshold_mode=threshold_mode, qr_mode=qr_mode) as record:
+                checkpoint(0)
+                if qr_mode:
+                    # One cell per module, read straight from the loaded image
+                    resized_image_pil = self.logic.current_image
+                    matrix, full_text_output, qr_grid = self.logic.sample_qr_matrix(threshold_mode=threshold_mode)
+                    checkpoint(1)
+                else:
+                    qr_grid = None
+                    resized_image_pil = self.logic.process_and_resize(resize_dim, use_pyramid=live, block_size=block_size)
+
+                    checkpoint(1)
+                    matrix, full_text_output = self.logic.generate_character_matrix(
+                        resized_image_pil, block_size=block_size, threshold_mode=threshold_mode
+                    )
+
+                checkpoint(2)
+                matrix_image_pil = None if live else self.logic.create_matrix_image(matrix)
+
+                checkpoint(3)
+                # Scale the *resized* image to the drawable area of Pane 2 (pane minus padding/labels),
+                # enlarging small matrix sizes with NEAREST so each source pixel stays visible
+                source_preview = self.logic.scale_preview(resized_image_pil, PREVIEW_MAX_SIZE)
+
+                if cancel_event.is_set():
+                    raise RefreshCancelled()
+                result = {
+                    "resize_dim": resize_dim,
+                    "live": live,
+                    "matrix": matrix,
+                    "full_text_output": full_text_output,
+                    "matrix_image": matrix_image_pil,
+                    "source_preview": source_preview,
+                    "source_size": resized_image_pil.size,
+                    "qr_grid": qr_grid,
+                    "metrics": record, # Filled in when the run closes (None if profiling is off)
+                }
+            self._refresh_results.put(("done", generation, result))
+        except RefreshCancelled:
+            pass
+        except Exception as e:
+            self._refresh_results.put(("error", generation, e))
+
+    def _poll_refresh_results(self):
+        """Drains the worker queue on the Tk thread and applies only current results."""
+        self._refresh_poll_id = None
+        try:
+            while True:
+                kind, generation, payload = self._refresh_results.get_nowait()
+                if generation != self._refresh_generation or self._refresh_cancel is None:
+                    continue # Stale message from a cancelled refresh
+
+                if kind == "progress":
+                    self._show_refresh_progress(payload)
+                elif kind == "done":
+                    self._refresh_cancel = None
+                    self._apply_refresh_result(payload)
+                elif kind == "error":
+                    self._refresh_cancel = None
+                    self._show_refresh_error(payload)
+        except queue.Empty:
+            pass
+
+        # Keep polling while a refresh is still running
+        if self._refresh_cancel is not None:
+            self._refresh_poll_id = self.root.after(REFRESH_POLL_MS, self._poll_refresh_results)
+
+    def _show_refresh_progress(self, step):
+        self.refresh_progress.config(value=step)
+        self.refresh_status.config(text=f"{REFRESH_STEPS[step]}... ({step + 1}/{len(REFRESH_STEPS)})")
+
+    def _apply_refresh_result(self, result):
+        """Updates the preview and text output panes with a finished refresh (Tk thread only)."""
+        source_w, source_h = result["source_size"]
+        matrix = result["matrix"]
+        source_preview = result["source_preview"]
+
+        self.refresh_progress.config(value=len(REFRESH_STEPS))
+        if result["live"]:
+            self.refresh_status.config(text="Live preview. Click 'Refresh Matrix' to enable download.")
+        else:
+            self.refresh_status.config(text="Done.")
+        self.current_matrix_image = result["matrix_image"] # Store PIL Image for the Download button (None for live previews)
+        self.current_matrix = matrix if self.current_matrix_image is not None else None
+
+        # --- Update Preview Pane 2 (Resized Source Image) ---
+        photo = self._update_photo(self.resized_photo, source_preview)
+        if photo is not self.resized_photo:
+            self.resized_photo = photo
             # Set the image and ensure the label resizes to contain it within the pane
             # We set the label width/height to the actual image size, but the label's packing (expand=True)
             # ensures it is centered within the fixed pane space.
             self.resized_preview_label.config(
                 image=self.resized_photo,
-                text=f"Source Image ({resize_dim}x{resize_dim}) Preview",
                 compound=tk.CENTER,
                 width=source_preview.width,
                 height=source_preview.height,
@@ -312,27 +858,52 @@ class ImageProcessorGUI:
                 bg="lightgray" # Set background of the label to see its boundaries
             )
             self.resized_preview_label.image = self.resized_photo
-            
-            # --- Update Status Info ---
-            char_w = len(matrix[0]) if matrix and matrix[0] else 0
-            char_h = len(matrix) if matrix else 0
-            self.size_info_label.config(text=f"Matrix Size: {char_w}x{char_h} characters (Source: {resize_dim}x{resize_dim} pixels)")
-            
-            # --- Update Output Pane 3 ---
-            self.text_output.delete("1.0", tk.END)
-            self.text_output.insert(tk.END, full_text_output)
-            
-        except Exception as e:
-            messagebox.showerror("Processing Error", f"An error occurred during matrix generation: {e}")
-            self.text_output.delete("1.0", tk.END)
-            self.text_output.insert(tk.END, f"Error: {e}")
+        self.resized_preview_label.config(text=f"Source Image ({source_w}x{source_h}) Preview")
+
+        if result["metrics"]:
+            self.timing_label.config(text=format_record(result["metrics"]))
+        
+        # --- Update Status Info ---
+        char_w = len(matrix[0]) if matrix and matrix[0] else 0
+        char_h = len(matrix) if matrix else 0
+        qr_grid = result["qr_grid"]
+        if qr_grid is not None:
+            self.size_info_label.config(
+                text=f"Matrix Size: {char_w}x{char_h} modules (QR version {qr_grid.version}, "
+                     f"{qr_grid.module_size:.1f} pixels per module)"
+            )
+        else:
+            self.size_info_label.config(text=f"Matrix Size: {char_w}x{char_h} characters (Source: {source_w}x{source_h} pixels)")
+        
+        # --- Update Output Pane 3 ---
+        self.logic.text_output_buffer = result["full_text_output"] # Source for Copy Text
+        self.text_output.set_text(result["full_text_output"])
+
+    def _update_photo(self, photo, image):
+        """
+        Returns a Tk photo showing image: the given photo with the new pixels pasted in
+        when its size matches (no new Tk image), otherwise a new PhotoImage.
+        """
+        if photo is not None and (photo.width(), photo.height()) == image.size:
+            photo.paste(image)
+            return photo
+        return ImageTk.PhotoImage(image)
+
+    def _show_refresh_error(self, error):
+        self.refresh_progress.config(value=0)
+        self.refresh_status.config(text="Failed.")
+        messagebox.showerror("Processing Error", f"An error occurred during matrix generation: {error}")
+        self.logic.text_output_buffer = ""
+        self.text_output.set_text(f"Error: {error}")
             
     def copy_text(self):
-        """Copies the content of the text widget using Tkinter's clipboard functions."""
+        """Copies the current matrix text straight from the logic-side buffer (not from the widget)."""
+        text_to_copy = self.logic.text_output_buffer.strip()
+        if not text_to_copy:
+            messagebox.showerror("Copy Error", "No matrix text generated to copy.")
+            return
+
         try:
-            # Get text directly from the ScrolledText widget
-            text_to_copy = self.text_output.get("1.0", tk.END).strip()
-            
             self.root.clipboard_clear()
             self.root.clipboard_append(text_to_copy)
             messagebox.showinfo("Copied", "Matrix content copied to clipboard!")
@@ -346,7 +917,7 @@ class ImageProcessorGUI:
             return
 
         try:
-            self.logic.save_image(self.current_matrix_image)
+            save_image_dialog(self.logic, self.current_matrix_image, self.current_matrix)
         except Exception as e:
             messagebox.showerror("Save Error", f"Could not save image: {e}")
 
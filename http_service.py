@@ -0,0 +1,412 @@
+# http_service.py
+"""
+Local HTTP service around the matrix pipeline, so other tools can convert
+images without starting a Python process per image. An asyncio server accepts
+uploads, runs the compute stages on a bounded process pool and answers with
+text or an image. Requests beyond the pool's capacity wait in a bounded queue;
+once that is full, new requests get 503 (with Retry-After) before their upload
+is read, so a burst cannot pile up in memory.
+
+Usage:
+    python -m image_logic serve [--host 127.0.0.1] [--port 8765] [--workers N] [--max-pending N]
+    curl --data-binary @photo.jpg "http://127.0.0.1:8765/matrix?dimension=80&format=png" -o matrix.png
+    curl -F image=@photo.jpg -F threshold=otsu http://127.0.0.1:8765/matrix
+
+Parameters (query string or form fields): dimension, threshold, block (N or WxH),
+block_threshold, window, qr (0/1), format (see RESPONSE_TYPES) and scale (pixels
+per cell for png1/pbm). GET /health reports the pool and queue state as JSON.
+"""
+import asyncio
+import email.parser
+import email.policy
+import io
+import json
+import multiprocessing
+import os
+import signal
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_cli import DEFAULT_DIMENSION, compute_matrix, get_worker_logic
+from image_logic import ImageProcessorLogic, MIN_DIMENSION
+from matrix_export import export_matrix
+from thresholding import THRESHOLD_MODES, DEFAULT_THRESHOLD_MODE
+
+# --- Constants ---
+DEFAULT_HOST = "127.0.0.1" # Local only unless asked otherwise
+DEFAULT_PORT = 8765
+DEFAULT_MAX_PENDING = 16 # Requests allowed to wait for a free worker; more get 503
+DEFAULT_MAX_UPLOAD_MB = 50
+MAX_SERVICE_DIMENSION = 1000 # Largest dimension a request may ask for (the PNG canvas grows with its square)
+REQUEST_TIMEOUT_S = 30 # Time allowed to send the request line, headers and body
+RETRY_AFTER_S = 1 # Retry-After sent with 503 responses
+MAX_HEADER_LINES = 100
+
+# Response format -> Content-Type: text, the glyph image, or a direct export (see matrix_export)
+RESPONSE_TYPES = {
+    "txt": "text/plain; charset=us-ascii",
+    "png": "image/png",
+    "png1": "image/png",
+    "pbm": "image/x-portable-bitmap",
+    "rle": "text/plain; charset=us-ascii",
+    "bits": "application/octet-stream",
+}
+STATUS_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 408: "Request Timeout",
+    411: "Length Required", 413: "Payload Too Large", 422: "Unprocessable Entity", 431: "Request Header Fields Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class RequestError(Exception):
+    """
+    An error answered with an HTTP status and a plain-text message. unread is the size of
+    an upload refused before it was read: it is drained after the answer, so the client can
+    finish sending and read the answer instead of seeing the connection reset.
+    """
+    def __init__(self, status, message, headers=None, unread=0):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+        self.unread = unread
+
+
+def render_upload(job):
+    """
+    Converts one uploaded image inside a worker process and returns a result dict
+    (never raises): content_type, body, cols, rows and qr_version on success, error otherwise.
+    """
+    data, dimension, options, qr, output_format, scale = job
+    result = {"error": None}
+    try:
+        logic = get_worker_logic()
+        _, matrix, full_text_output, grid = compute_matrix(logic, data, dimension, options, qr)
+        if output_format == "txt":
+            body = full_text_output.encode("ascii")
+        elif output_format == "rle":
+            buffer = io.StringIO()
+            export_matrix(matrix, buffer, "rle")
+            body = buffer.getvalue().encode("ascii")
+        else:
+            buffer = io.BytesIO()
+            if output_format == "png":
+                logic.encode_image(logic.create_matrix_image(matrix), buffer, "PNG")
+            else:
+                export_matrix(matrix, buffer, output_format, scale, logic)
+            body = buffer.getvalue()
+        result.update(
+            content_type=RESPONSE_TYPES[output_format], body=body, cols=matrix.cols, rows=matrix.rows,
+            qr_version=grid.version if grid is not None else None
+        )
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _int_param(fields, name, default, low, high):
+    value = fields.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}.") from None
+    if not low <= number <= high:
+        raise ValueError(f"{name} must be between {low} and {high}, got {number}.")
+    return number
+
+
+def parse_params(fields):
+    """
+    Validates request parameters (a dict of strings) into the render_upload settings
+    (dimension, options, qr, format, scale). Raises ValueError on bad input.
+    """
+    dimension = _int_param(fields, "dimension", DEFAULT_DIMENSION, MIN_DIMENSION, MAX_SERVICE_DIMENSION)
+
+    threshold_mode = fields.get("threshold") or DEFAULT_THRESHOLD_MODE
+    if threshold_mode not in THRESHOLD_MODES:
+        raise ValueError(f"threshold must be one of {', '.join(THRESHOLD_MODES)}, got {threshold_mode!r}.")
+
+    block = (fields.get("block") or "2").lower().split("x")
+    if len(block) == 1:
+        block *= 2
+    if len(block) != 2 or not all(part.isdigit() and 1 <= int(part) <= dimension for part in block):
+        raise ValueError(f"block must be N or WxH (at most the dimension), got {fields['block']!r}.")
+    block_size = (int(block[0]), int(block[1]))
+    # The dimension the workers will actually resize to, whatever the block size
+    if ImageProcessorLogic.fit_dimension(dimension, block_size) > MAX_SERVICE_DIMENSION:
+        raise ValueError(f"dimension {dimension} with {block_size[0]}x{block_size[1]} blocks exceeds {MAX_SERVICE_DIMENSION}.")
+
+    area = block_size[0] * block_size[1]
+    options = {
+        "block_size": block_size,
+        "block_threshold": _int_param(fields, "block_threshold", None, 0, area),
+        "threshold_mode": threshold_mode,
+        "window": _int_param(fields, "window", None, 1, MAX_SERVICE_DIMENSION),
+    }
+
+    output_format = (fields.get("format") or "txt").lower()
+    if output_format not in RESPONSE_TYPES:
+        raise ValueError(f"format must be one of {', '.join(RESPONSE_TYPES)}, got {output_format!r}.")
+    qr = (fields.get("qr") or "0").lower() in ("1", "true", "yes", "on")
+    scale = _int_param(fields, "scale", 1, 1, 64)
+    return dimension, options, qr, output_format, scale
+
+
+def parse_multipart(content_type, body):
+    """
+    Splits a multipart/form-data body into (image bytes, text fields): the image is
+    the part named 'image', or else the first part carrying a file name.
+    """
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+    )
+    if not message.is_multipart():
+        raise ValueError("Malformed multipart/form-data body.")
+
+    image, fields = None, {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        payload = part.get_payload(decode=True) or b""
+        if name == "image" or (image is None and part.get_filename()):
+            image = payload
+        elif name:
+            fields[name] = payload.decode("utf-8", "replace")
+    if image is None:
+        raise ValueError("No image part in the form (send it as 'image').")
+    return image, fields
+
+
+class MatrixService:
+    """
+    The HTTP front end. At most `workers` conversions run at once (one per pool process);
+    up to max_pending more wait for a worker. One request per connection.
+    """
+    def __init__(self, workers=None, max_pending=DEFAULT_MAX_PENDING, max_upload=DEFAULT_MAX_UPLOAD_MB * 1024 * 1024,
+                 executor=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.max_upload = max_upload
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._slots = None # asyncio.Semaphore, created inside the running loop
+        self.admitted = 0 # Requests running or waiting for a worker
+        self.running = 0
+        self.served = 0
+        self.rejected = 0 # Turned away with 503
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Starts listening (port 0 picks a free port) and returns the asyncio server."""
+        if self._executor is None:
+            # Spawned, not forked: workers must not inherit the listening socket or the event loop
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._slots = asyncio.Semaphore(self.workers)
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def serve_forever(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await self.start(host, port)
+        bound_host, bound_port = server.sockets[0].getsockname()[:2]
+        print(f"Serving on http://{bound_host}:{bound_port} ({self.workers} workers, {self.max_pending} pending)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        """Shuts the worker pool down (if the service created it)."""
+        if self._executor is not None and self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "waiting": self.admitted - self.running,
+            "max_pending": self.max_pending,
+            "served": self.served,
+            "rejected": self.rejected,
+        }
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            unread = 0
+            try:
+                status, content_type, body, headers = await self._handle_request(reader, writer)
+            except RequestError as e:
+                status, content_type, body, headers = e.status, "text/plain; charset=utf-8", f"{e}\n".encode(), e.headers
+                unread = e.unread
+            except asyncio.TimeoutError:
+                status, content_type, body, headers = 408, "text/plain; charset=utf-8", b"Request timed out.\n", {}
+            except Exception as e: # Worker pool broken, etc.: answer rather than drop the connection
+                status, content_type, body, headers = 500, "text/plain; charset=utf-8", f"{type(e).__name__}: {e}\n".encode(), {}
+            await _write_response(writer, status, content_type, body, headers)
+            if unread:
+                await asyncio.wait_for(_discard(reader, unread), REQUEST_TIMEOUT_S)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass # Client went away (or never finished sending a refused upload)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _handle_request(self, reader, writer):
+        method, path, fields, headers = await asyncio.wait_for(_read_head(reader), REQUEST_TIMEOUT_S)
+
+        if path == "/health":
+            if method != "GET":
+                raise RequestError(405, "Use GET /health.", {"Allow": "GET"})
+            return 200, "application/json", json.dumps(self.stats()).encode(), {}
+        if path != "/matrix":
+            raise RequestError(404, "Unknown path; POST images to /matrix.")
+        if method != "POST":
+            raise RequestError(405, "POST the image to /matrix.", {"Allow": "POST"})
+
+        length = headers.get("content-length")
+        if length is None or not length.isdigit():
+            raise RequestError(411, "Send the upload with a Content-Length.")
+        length = int(length)
+        # A client that sent Expect: 100-continue waits for our go-ahead, so a refused upload is never sent
+        expects_continue = headers.get("expect", "").lower() == "100-continue"
+        unread = 0 if expects_continue else length
+        if length > self.max_upload:
+            raise RequestError(413, f"Uploads are limited to {self.max_upload} bytes.", unread=min(unread, self.max_upload))
+
+        # Backpressure: refuse before reading the upload once every worker and queue slot is taken
+        if self.admitted >= self.workers + self.max_pending:
+            self.rejected += 1
+            raise RequestError(503, "Busy; retry shortly.", {"Retry-After": str(RETRY_AFTER_S)}, unread)
+
+        self.admitted += 1
+        try:
+            if expects_continue:
+                writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                await writer.drain()
+            body = await asyncio.wait_for(reader.readexactly(length), REQUEST_TIMEOUT_S)
+            content_type = headers.get("content-type", "")
+            try:
+                if content_type.lower().startswith("multipart/form-data"):
+                    body, form_fields = parse_multipart(content_type, body)
+                    fields = dict(fields, **form_fields)
+                dimension, options, qr, output_format, scale = parse_params(fields)
+            except ValueError as e:
+                raise RequestError(400, str(e)) from None
+            if not body:
+                raise RequestError(400, "The upload is empty.")
+
+            async with self._slots:
+                self.running += 1
+                try:
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(
+                        self._executor, render_upload, (body, dimension, options, qr, output_format, scale)
+                    )
+                finally:
+                    self.running -= 1
+        finally:
+            self.admitted -= 1
+
+        if result["error"]:
+            raise RequestError(422, result["error"])
+        self.served += 1
+        headers = {"X-Matrix-Size": f"{result['cols']}x{result['rows']}"}
+        if result["qr_version"] is not None:
+            headers["X-QR-Version"] = str(result["qr_version"])
+        return 200, result["content_type"], result["body"], headers
+
+
+async def _read_line(reader, status, message):
+    """readline that answers a line longer than the reader's limit (64 KiB by default) with status."""
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise RequestError(status, message) from None
+
+
+async def _read_head(reader):
+    """Reads the request line and headers. Returns (method, path, query fields, headers)."""
+    request_line = await _read_line(reader, 400, "Request line too long.")
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise RequestError(400, "Malformed request line.")
+    method, target, _ = parts
+
+    headers = {}
+    while True:
+        line = await _read_line(reader, 431, "Header line too long.")
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADER_LINES:
+            raise RequestError(431, "Too many header lines.")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    url = urllib.parse.urlsplit(target)
+    fields = {name: values[-1] for name, values in urllib.parse.parse_qs(url.query).items()}
+    return method.upper(), url.path, fields, headers
+
+
+async def _discard(reader, size):
+    """Reads and drops size bytes of a refused upload, a chunk at a time."""
+    while size > 0:
+        chunk = await reader.read(min(size, 64 * 1024))
+        if not chunk:
+            return
+        size -= len(chunk)
+
+
+async def _write_response(writer, status, content_type, body, headers):
+    head = [f"HTTP/1.1 {status} {STATUS_REASONS.get(status, '')}", f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}", "Connection: close"]
+    head += [f"{name}: {value}" for name, value in headers.items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+def request_matrix(base_url, image, timeout=60, **params):
+    """
+    Minimal client for a running service: posts an image (a path or bytes) to /matrix
+    with the given parameters and returns the response body (bytes).
+    Raises urllib.error.HTTPError for error responses (the body holds the message).
+    """
+    if not isinstance(image, (bytes, bytearray)):
+        with open(image, "rb") as image_file:
+            image = image_file.read()
+    query = urllib.parse.urlencode({name: value for name, value in params.items() if value is not None})
+    request = urllib.request.Request(
+        f"{base_url.rstrip('/')}/matrix?{query}", data=bytes(image), method="POST",
+        headers={"Content-Type": "application/octet-stream"}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+
+def add_serve_arguments(subparser):
+    subparser.add_argument("--host", default=DEFAULT_HOST, help=f"Interface to listen on (default {DEFAULT_HOST}).")
+    subparser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default {DEFAULT_PORT}).")
+    subparser.add_argument("-w", "--workers", type=int, default=None,
+                           help="Worker processes, i.e. conversions at once (default: CPU count).")
+    subparser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                           help=f"Requests that may wait for a worker before new ones get 503 "
+                                f"(default {DEFAULT_MAX_PENDING}).")
+    subparser.add_argument("--max-upload", type=int, default=DEFAULT_MAX_UPLOAD_MB, metavar="MB",
+                           help=f"Largest accepted upload (default {DEFAULT_MAX_UPLOAD_MB} MB).")
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve_main(args):
+    # Stop on SIGTERM like on Ctrl+C, so the worker pool is shut down too
+    signal.signal(signal.SIGTERM, _interrupt)
+    service = MatrixService(args.workers, args.max_pending, args.max_upload * 1024 * 1024)
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,97 @@
+# image_cache.py
+"""
+In-memory LRU cache of decoded images, so re-opening a file from the working
+set skips the JPEG/PNG decode and grayscale conversion.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+# --- Constants ---
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024 # Default memory budget for cached pixel data
+
+
+def image_nbytes(*images):
+    """Approximate pixel-buffer size of one or more PIL images (None entries are ignored)."""
+    return sum(img.width * img.height * len(img.getbands()) for img in images if img is not None)
+
+
+class ImageCache:
+    """
+    Least-recently-used cache keyed by (absolute path, file size, mtime).
+    A changed file gets a new key, so stale entries are never returned; they simply
+    age out. Entries are evicted oldest-first once the total exceeds max_bytes.
+    """
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict() # key -> (value, nbytes)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(file_path):
+        """Builds the cache key for a file on disk."""
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+    def get(self, key):
+        """Returns the cached value (marking it most recently used), or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        """Stores a value, then evicts least-recently-used entries until within budget."""
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+            # Values larger than the whole budget are never cached
+            if nbytes > self.max_bytes:
+                return
+
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def set_budget(self, max_bytes):
+        """Changes the memory budget, evicting entries if the new budget is smaller."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            while self._entries and self.current_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Returns a snapshot of the cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
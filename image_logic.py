@@ -1,69 +1,391 @@
 # image_logic.py
+import io
 import os
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
-import webbrowser
-from tkinter import messagebox, filedialog
+from contextlib import nullcontext
+from functools import lru_cache
+from PIL import Image
+from image_cache import ImageCache, DEFAULT_CACHE_BYTES, image_nbytes
+from char_matrix import CharMatrix
+from integral_image import IntegralImage
+from qr_grid import locate_grid, sample_modules
+from thresholding import (
+    DEFAULT_THRESHOLD_MODE, LOCAL_THRESHOLD_MODES, THRESHOLD_MODES,
+    default_window, local_bright_mask, otsu_threshold
+)
+from instrumentation import StageProfiler
+from lazy_imports import get_numpy
+
+# NumPy is optional (see lazy_imports.get_numpy): when available, thresholding and
+# block compression run as whole-array operations instead of per-pixel Python loops.
+# Tkinter dialogs live in ui_actions, so this module imports without Tk.
 
 # --- Constants (Used for UI sizing/scaling, shared by logic) ---
 PREVIEW_WIDTH_PX = 300 
 CHAR_WIDTH_PX = 7 
 CHAR_HEIGHT_PX = 15 
 
+# --- Matrix Dimension Constants (slider range) ---
+MIN_DIMENSION = 10
+MAX_DIMENSION = 200
+PYRAMID_BASE_SIZE = MAX_DIMENSION * 2 # Largest level of the live-preview resolution pyramid
+DECODE_MIN_SIZE = PYRAMID_BASE_SIZE # Smallest decoded size (per axis) that still serves every stage
+
+# --- Streaming Constants ---
+DEFAULT_BAND_ROWS = 256 # Resized-image rows processed per band by the streaming API (kept even)
+
+# --- Threshold Constants ---
+BRIGHTNESS_THRESHOLD = 128 # Pixels at or above this brightness count as bright ('#')
+
+# --- Block Compression Constants ---
+DEFAULT_BLOCK_SIZE = (2, 2) # (width, height) of the pixel block compressed into one matrix cell
+
 # --- New Constants for Matrix Image Visualization ---
 CELL_SIZE = 20 # Pixel size of each cell in the visualized matrix
 FONT_SIZE = 16 # Font size for characters in the visualized matrix
+FONT_NAME = "arial.ttf" # TrueType font for the visualized matrix (falls back to PIL's default)
+
+
+# --- Glyph Cache for Matrix Image Rendering ---
+@lru_cache(maxsize=None)
+def _load_font(font_name, font_size):
+    """Loads a font once per (name, size); falls back to PIL's default font."""
+    from PIL import ImageFont
+    try:
+        return ImageFont.truetype(font_name, font_size)
+    except OSError:
+        return ImageFont.load_default()
+
+@lru_cache(maxsize=None)
+def _get_glyph_cell(char, font_name, font_size, cell_size):
+    """
+    Rasterizes a single character into a grayscale ('L') cell of cell_size x cell_size,
+    drawn exactly as create_matrix_image used to draw it: black text on white, centered.
+    The cell is cached, so each (char, font, size) is rasterized only once.
+    """
+    from PIL import ImageDraw
+    cell = Image.new("L", (cell_size, cell_size), 255)
+    offset = (cell_size - font_size) // 2
+    ImageDraw.Draw(cell).text((offset, offset), char, fill=0, font=_load_font(font_name, font_size))
+    return cell
 
 class ImageProcessorLogic:
     """
     Handles all non-Tkinter business logic: file operations, 
     image manipulation, and data calculations.
     """
-    def __init__(self):
+    def __init__(self, cache_bytes=DEFAULT_CACHE_BYTES, decode_min_size=DECODE_MIN_SIZE, memory_budget=None,
+                 max_image_pixels=None):
         self.current_image = None
         self.image_path = None
+        # Images are decoded at reduced resolution down to this size per axis (None = full decode)
+        self.decode_min_size = decode_min_size
+        # Memory-bounded mode: full-resolution pixel bytes decoded at once (None = whole image, see band_decode)
+        self.memory_budget = memory_budget
+        # Pixel limit replacing Pillow's decompression-bomb check, for trusted inputs (None = Pillow's limit)
+        self.max_image_pixels = max_image_pixels
+        # How the last file was decoded: strategy, sizes, bands and peak pixel-buffer bytes (None if cached)
+        self.last_decode = None
+        self.pyramid = [] # Square downsampled copies of current_image, largest first
+        self.text_output_buffer = "" # Text of the matrix currently shown (source for copy)
+        # Decoded images (with their thumbnails and pyramids) keyed by path, size and mtime
+        self.image_cache = ImageCache(cache_bytes)
+        # Per-stage timing/memory instrumentation; None until enable_profiling(True)
+        self.profiler = None
+        # Last process_and_resize result and the bright-pixel table built from it, so a
+        # block-size change at the same dimension reuses both: (source, key, image) / (image, settings, table)
+        self._last_resize = None
+        self._last_integral = None
+
+    # --- Instrumentation (opt-in) ---
+    def enable_profiling(self, enabled=True, trace_memory=True):
+        """Turns per-stage instrumentation on (keeping any existing history) or off."""
+        if enabled and self.profiler is None:
+            self.profiler = StageProfiler(trace_memory=trace_memory)
+        elif not enabled and self.profiler is not None:
+            self.profiler.close()
+            self.profiler = None
+
+    def profile_run(self, kind, **params):
+        """
+        Context manager grouping the stages executed inside it into one run record
+        (yielded, or None when instrumentation is off).
+        """
+        return self.profiler.run(kind, **params) if self.profiler else nullcontext()
+
+    def _stage(self, name):
+        return self.profiler.stage(name) if self.profiler else nullcontext()
     
+    def warm_up(self):
+        """
+        Preloads what the first refresh would otherwise pay for: Pillow's format plugins,
+        NumPy and the rasterized glyph cell. Safe to call from a background thread.
+        """
+        Image.init()
+        get_numpy()
+        _get_glyph_cell('#', FONT_NAME, FONT_SIZE, CELL_SIZE)
+
     def open_portfolio_link(self):
-        """Opens the portfolio URL in a web browser."""
-        # Using a complete, protocol-prefixed URL
-        url = "https://github.com/peter00123/portfolio" 
-        try:
-            webbrowser.open_new_tab(url)
-            messagebox.showinfo("Portfolio", f"Opening link in your browser:\n{url}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not open web browser: {e}")
+        """Opens the portfolio URL in a web browser (UI helper, see ui_actions)."""
+        from ui_actions import open_portfolio_link
+        open_portfolio_link()
 
     def load_image(self, file_path):
-        """Loads and returns the PIL Image object and calculated preview dimensions."""
+        """
+        Loads and returns the PIL Image object and calculated preview dimensions.
+        Decoded results are served from the LRU image cache while the file is unchanged.
+        """
         if not os.path.isfile(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
 
+        with self.profile_run("load", path=file_path):
+            return self._load_image(file_path)
+
+    def _load_image(self, file_path):
         self.image_path = file_path
-        # Convert to Grayscale ('L') immediately for consistent brightness calculation
-        self.current_image = Image.open(file_path).convert("L") 
-        
-        max_size = (400, 300)
-        preview_img = self.current_image.copy()
-        preview_img.thumbnail(max_size)
+        self.clear_memo()
+        cache_key = ImageCache.make_key(file_path) + (self.decode_min_size,)
+        cached = self.image_cache.get(cache_key)
+        if cached is not None:
+            self.current_image, preview_img, self.pyramid = cached
+            self.last_decode = None
+            return preview_img, self.image_path
+
+        self.current_image = self._decode_grayscale(file_path, self.decode_min_size)
+        preview_img = self._build_views()
+
+        self.image_cache.put(
+            cache_key,
+            (self.current_image, preview_img, self.pyramid),
+            image_nbytes(self.current_image, preview_img, *self.pyramid)
+        )
 
         return preview_img, self.image_path
 
-    def process_and_resize(self, resize_dim):
+    def decode_image(self, source, name=None):
         """
-        Resizes the current image to a fixed, even dimension to allow for 2x2 compression.
+        Headless load_image for a path or the bytes of an encoded image (e.g. an HTTP
+        upload): decodes current_image only, without preview, pyramid or image cache.
+        Returns current_image.
         """
-        if not self.current_image:
+        if isinstance(source, (bytes, bytearray)):
+            name = name or "<upload>"
+            source = io.BytesIO(source)
+        elif not os.path.isfile(source):
+            raise FileNotFoundError(f"File not found: {source}")
+        else:
+            name = name or source
+
+        with self.profile_run("load", path=name):
+            self.image_path = name
+            self.clear_memo()
+            self.pyramid = []
+            self.current_image = self._decode_grayscale(source, self.decode_min_size)
+        return self.current_image
+
+    def use_image(self, image, name=None):
+        """
+        Makes an already decoded image the current one (converted to grayscale), like
+        load_image but without decoding, preview or pyramid.
+        """
+        self.image_path = name
+        self.clear_memo()
+        self.current_image = image if image.mode == "L" else image.convert("L")
+        self.pyramid = []
+
+    def _build_views(self):
+        """Builds the pyramid of current_image and returns its preview thumbnail."""
+        with self._stage("resize"):
+            self.pyramid = self._build_pyramid(self.current_image)
+            
+            max_size = (400, 300)
+            preview_img = self.current_image.copy()
+            preview_img.thumbnail(max_size)
+        return preview_img
+
+    def _decode_grayscale(self, file_path, min_size=None):
+        """
+        Decodes the file to a grayscale ('L') image, only at the resolution needed:
+        JPEGs are first scaled by the decoder itself (draft), then any format is reduced
+        by an integer factor, as long as both axes stay at or above min_size.
+        With a memory_budget, TIFF and raw files are decoded and reduced band by band.
+        """
+        # Imported here: band_decode loads Pillow's TIFF plugin, which most workers never need
+        from band_decode import band_reader, open_image, pixel_bytes, pixel_limit
+
+        with self._stage("decode"), pixel_limit(self.max_image_pixels):
+            image = open_image(file_path, self.max_image_pixels)
+            source_size = image.size
+            strategy = "full"
+
+            if min_size:
+                if image.format == "JPEG":
+                    # Let the JPEG decoder scale by 1/2, 1/4 or 1/8 and output grayscale directly
+                    image.draft("L", (min_size, min_size))
+                    strategy = "draft"
+                elif self.memory_budget:
+                    reader = band_reader(image, self.max_image_pixels)
+                    if reader is not None:
+                        return self._decode_in_bands(image, reader, min_size)
+
+                decoded_bytes = image.width * image.height * pixel_bytes(image.mode)
+                image = self._reduce(image, min_size)
+            image.load()
+            if not min_size:
+                decoded_bytes = image.width * image.height * pixel_bytes(image.mode)
+
+        # Convert to Grayscale ('L') immediately for consistent brightness calculation
+        if image.mode != "L":
+            with self._stage("grayscale"):
+                image = image.convert("L")
+
+        self.last_decode = {
+            "strategy": strategy,
+            "source_size": source_size,
+            "decoded_size": image.size,
+            "bands": 1,
+            "peak_pixel_bytes": decoded_bytes + (image.width * image.height if min_size else 0),
+        }
+        return image
+
+    def _decode_in_bands(self, image, reader, min_size):
+        """
+        Decodes rows band by band (see band_decode.band_reader) and reduces them by the
+        factor _reduce would use for the whole image, so the result is identical while only
+        about one full-resolution band is in memory. Rows that do not fill a whole reduction
+        block yet are carried over to the next band, so no block is split between bands.
+        """
+        from band_decode import band_rows, pixel_bytes
+
+        unit_rows, read_band = reader
+        width, height = image.size
+        factor = max(1, self._reduce_factor(image, min_size))
+        rows = band_rows(image, self.memory_budget, unit_rows)
+
+        reduced = Image.new("L", (-(-width // factor), -(-height // factor)))
+        carry = None # Decoded rows waiting for the rest of their reduction block
+        reduced_top = band_peak = bands = 0
+        for top in range(0, height, rows):
+            band = read_band(top, min(height, top + rows))
+            band.load()
+            bands += 1
+            if carry is not None:
+                joined = Image.new(band.mode, (width, carry.height + band.height))
+                if band.mode == "P":
+                    joined.putpalette(band.getpalette())
+                joined.paste(carry, (0, 0))
+                joined.paste(band, (0, carry.height))
+                band = joined
+            band_peak = max(band_peak, band.width * band.height * pixel_bytes(band.mode))
+
+            # The last band reduces whatever is left; others stop at a whole number of blocks
+            usable = band.height if top + rows >= height else band.height - band.height % factor
+            carry = band.crop((0, usable, width, band.height)) if usable < band.height else None
+            if usable:
+                block_rows = self._reduce_by(band.crop((0, 0, width, usable)) if carry else band, factor)
+                reduced.paste(block_rows if block_rows.mode == "L" else block_rows.convert("L"), (0, reduced_top))
+                reduced_top += block_rows.height
+        image.close()
+
+        self.last_decode = {
+            "strategy": "bands",
+            "source_size": (width, height),
+            "decoded_size": reduced.size,
+            "bands": bands,
+            "peak_pixel_bytes": band_peak + reduced.width * reduced.height,
+        }
+        return reduced
+
+    def _reduce_factor(self, image, min_size):
+        """Largest integer factor that keeps both axes at or above min_size."""
+        return min(image.width // min_size, image.height // min_size)
+
+    def _reduce(self, image, min_size):
+        """Reduces an image by the largest integer factor that keeps both axes at or above min_size."""
+        return self._reduce_by(image, self._reduce_factor(image, min_size))
+
+    def _reduce_by(self, image, factor):
+        """Reduces an image by an integer factor (box average); factors below 2 leave it unchanged."""
+        if factor >= 2:
+            if image.mode not in ("L", "LA", "RGB", "RGBA", "I", "F"):
+                image = image.convert("L") # reduce() does not support palette/bilevel modes
+            image = image.reduce(factor)
+        return image
+
+    def prepare_frame(self, frame):
+        """
+        Returns a grayscale copy of one decoded animation or sequence frame, reduced like
+        load_image reduces a still image (see decode_min_size).
+        """
+        prepared = self._reduce(frame, self.decode_min_size) if self.decode_min_size else frame
+        if prepared.mode != "L":
+            return prepared.convert("L")
+        # The frame object is reused when seeking to the next frame, so never hand it out
+        return prepared.copy() if prepared is frame else prepared
+
+    def _build_pyramid(self, image):
+        """
+        Builds square, NEAREST-downsampled copies of the image (400, 200, 100, ... pixels)
+        so live previews can resize from a small level instead of the full-resolution source.
+        """
+        levels = [image.resize((PYRAMID_BASE_SIZE, PYRAMID_BASE_SIZE), Image.Resampling.NEAREST)]
+        while levels[-1].width // 2 >= MIN_DIMENSION:
+            size = levels[-1].width // 2
+            levels.append(levels[-1].resize((size, size), Image.Resampling.NEAREST))
+        return levels
+
+    @staticmethod
+    def fit_dimension(resize_dim, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Returns the dimension actually used for resize_dim: rounded down to an even number
+        (at least MIN_DIMENSION) whatever the block size, so one resize and one bright-pixel
+        table serve every block size. Blocks that do not fit whole at the right and bottom
+        edges are dropped. Raises ValueError when not even one block_size block fits.
+        """
+        final_dim = max(MIN_DIMENSION, resize_dim - resize_dim % 2)
+        if max(block_size) > final_dim:
+            raise ValueError(f"A {block_size[0]}x{block_size[1]} block does not fit in {final_dim}x{final_dim} pixels.")
+        return final_dim
+
+    def process_and_resize(self, resize_dim, use_pyramid=False, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Resizes the current image to a fixed dimension (see fit_dimension; block_size is
+        only checked to fit). With use_pyramid=True the resize starts from the smallest
+        pyramid level that is still at least as large as the target (fast, approximate;
+        used for live previews). Repeating the last call, even with another block size,
+        returns the same image object, so its bright-pixel table (see get_integral_image)
+        is reused as well.
+        """
+        # Read once: a cancelled GUI refresh may still be running when load_image switches images,
+        # and must not file its resize under the new image
+        image, pyramid = self.current_image, self.pyramid
+        if not image:
             raise ValueError("No image loaded for processing.")
             
-        # Ensure the dimension is even for 2x2 compression
-        final_dim = resize_dim if resize_dim % 2 == 0 else resize_dim - 1
-        if final_dim < 10:
-             final_dim = 10 
+        final_dim = self.fit_dimension(resize_dim, block_size)
+        resize_key = (final_dim, use_pyramid)
+        if self._last_resize is not None:
+            last_source, last_key, last_image = self._last_resize
+            if last_source is image and last_key == resize_key:
+                return last_image
+
+        source = image
+        if use_pyramid and pyramid:
+            for level in pyramid:
+                if level.width < final_dim:
+                    break
+                source = level
         
-        # Resize to the final even dimension
-        resized_image = self.current_image.resize((final_dim, final_dim), Image.Resampling.NEAREST)
+        # Resize to the final dimension
+        with self._stage("resize"):
+            resized_image = source.resize((final_dim, final_dim), Image.Resampling.NEAREST)
         
+        self._last_resize = (image, resize_key, resized_image)
         return resized_image
 
+    def clear_memo(self):
+        """Forgets the last process_and_resize result and its bright-pixel table, so the next call recomputes both."""
+        self._last_resize = self._last_integral = None
+
     def _get_pixel_brightness(self, image, x, y):
         """Gets the pixel brightness (0-255) from a grayscale image."""
         return image.getpixel((x, y))
@@ -111,87 +433,401 @@ class ImageProcessorLogic:
             
         return compressed_matrix, full_text_output
 
-    def generate_character_matrix(self, resized_image):
+    def _compress_bright_array(self, bright, compact=False):
+        """
+        NumPy version of the 2x2 'Majority Wins' compression.
+        Takes a boolean array (True = bright '#') and returns the same
+        compressed matrix and text output as _compress_and_format_matrix
+        (the matrix as a CharMatrix when compact=True).
+        """
+        rows, cols = bright.shape[0] // 2, bright.shape[1] // 2
+        blocks = bright[:rows * 2, :cols * 2].reshape(rows, 2, cols, 2)
+        hash_count = blocks.sum(axis=(1, 3))
+
+        # Fewer than 2 bright pixels: drawn as '#' (inverted, as in _compress_and_format_matrix)
+        return self._format_dark_array(hash_count < 2, compact)
+
+    def _format_dark_array(self, dark, compact=False):
+        """Turns a boolean array (True = '#' cell) into the compressed matrix and its text output."""
+        np = get_numpy()
+        rows, cols = dark.shape
+        if compact:
+            compressed_matrix = CharMatrix.from_bool_array(dark)
+        else:
+            compressed_matrix = np.where(dark, '#', ' ').tolist()
+
+        # Build the text as one byte buffer: '# ' or '  ' per cell plus a newline per row
+        text_buffer = np.full((rows, cols * 2 + 1), ord(' '), dtype=np.uint8)
+        text_buffer[:, 0:cols * 2:2][dark] = ord('#')
+        text_buffer[:, -1] = ord('\n')
+        full_text_output = text_buffer.tobytes().decode("ascii")
+
+        return compressed_matrix, full_text_output
+
+    # --- Block compression over a summed-area table (any block size) ---
+    def get_integral_image(self, resized_image, threshold_mode=DEFAULT_THRESHOLD_MODE, window=None):
+        """
+        Returns the summed-area table of bright pixels (1 per bright pixel, see apply_threshold)
+        for resized_image. The last table is kept, so calling again with the same image
+        object and threshold (e.g. for another block size) does not re-threshold the pixels.
+        """
+        settings = (threshold_mode, window)
+        if self._last_integral is not None:
+            last_image, last_settings, last_table = self._last_integral
+            if last_image is resized_image and last_settings == settings:
+                return last_table
+
+        with self._stage("threshold"):
+            thresholded, cutoff = self.apply_threshold(resized_image, threshold_mode, window)
+            bright = thresholded.point([1 if value >= cutoff else 0 for value in range(256)])
+            table = IntegralImage.from_image(bright)
+
+        self._last_integral = (resized_image, settings, table)
+        return table
+
+    def compress_blocks(self, table, block_size=DEFAULT_BLOCK_SIZE, block_threshold=None, compact=False):
+        """
+        Compresses every whole block_size (width, height) block of a bright-pixel table
+        into one cell, with the same inverted 'Majority Wins' output as the 2x2 rule:
+        a block with at least block_threshold bright pixels becomes ' ', any other '#'.
+        block_threshold defaults to half the block area, rounded up (2 for 2x2 blocks).
+        Each block count is a constant-time lookup in the table, whatever the block size.
+        """
+        block_width, block_height = block_size
+        area = block_width * block_height
+        if block_threshold is None:
+            block_threshold = (area + 1) // 2
+        if not 0 <= block_threshold <= area:
+            raise ValueError(f"Block threshold must be between 0 and {area} for {block_width}x{block_height} blocks.")
+
+        sums = table.block_sums(block_width, block_height)
+        if get_numpy() is not None:
+            return self._format_dark_array(sums < block_threshold, compact)
+
+        return self._format_dark_rows([[count < block_threshold for count in row] for row in sums], compact)
+
+    def _format_dark_rows(self, dark_rows, compact=False):
+        """List-of-lists version of _format_dark_array (True = '#' cell), used without NumPy."""
+        compressed_matrix = [['#' if dark else ' ' for dark in row] for row in dark_rows]
+        full_text_output = "".join(
+            "".join('# ' if dark else '  ' for dark in row) + "\n" for row in dark_rows
+        )
+        if compact:
+            compressed_matrix = CharMatrix.from_rows(compressed_matrix)
+        return compressed_matrix, full_text_output
+
+    # --- QR module grid sampling ---
+    def sample_qr_matrix(self, compact=False, threshold_mode=DEFAULT_THRESHOLD_MODE, window=None):
+        """
+        Locates the QR code in the current image by its three finder patterns and reads
+        every module centre exactly once (see qr_grid), instead of resizing the whole image.
+        Returns (compressed_matrix, full_text_output, grid): one cell per module, '#' for
+        dark modules as in the compressed matrix; grid holds the version and module size.
+        Raises ValueError when no QR code is found.
+        """
+        if not self.current_image:
+            raise ValueError("No image loaded for processing.")
+
+        with self._stage("threshold"):
+            thresholded, cutoff = self.apply_threshold(self.current_image, threshold_mode, window)
+            mask = thresholded.point([1 if value >= cutoff else 0 for value in range(256)])
+        with self._stage("locate"):
+            grid = locate_grid(mask)
+        with self._stage("sample"):
+            dark_rows = sample_modules(mask, grid)
+
+        np = get_numpy()
+        if np is not None:
+            compressed_matrix, full_text_output = self._format_dark_array(np.array(dark_rows, dtype=bool), compact)
+        else:
+            compressed_matrix, full_text_output = self._format_dark_rows(dark_rows, compact)
+        return compressed_matrix, full_text_output, grid
+
+    # --- Thresholding ---
+    def apply_threshold(self, resized_image, threshold_mode=DEFAULT_THRESHOLD_MODE, window=None):
+        """
+        Returns (image, cutoff): pixels of the returned 'L' image at or above cutoff are bright.
+          - "global":  resized_image with the fixed BRIGHTNESS_THRESHOLD
+          - "otsu":    resized_image with the cutoff Otsu's method picks from its histogram
+          - "mean" / "sauvola": a 0/1 mask thresholded per pixel against its window
+            (window pixels square, see thresholding.local_bright_mask) with cutoff 1
+        """
+        if threshold_mode not in THRESHOLD_MODES:
+            raise ValueError(f"Unknown threshold mode {threshold_mode!r}; choose from {', '.join(THRESHOLD_MODES)}.")
+        if resized_image.mode != "L":
+            resized_image = resized_image.convert("L")
+
+        if threshold_mode == "global":
+            return resized_image, BRIGHTNESS_THRESHOLD
+        if threshold_mode == "otsu":
+            return resized_image, otsu_threshold(resized_image.histogram(), BRIGHTNESS_THRESHOLD)
+        return local_bright_mask(resized_image, threshold_mode, window), 1
+
+    def _threshold_to_char_matrix(self, resized_image, cutoff=BRIGHTNESS_THRESHOLD):
+        """
+        Thresholds the image into a single-character CharMatrix ('#' = bright) without
+        a per-pixel Python loop: Pillow maps it to a 1-bit image, whose packed rows
+        are exactly the CharMatrix layout.
+        """
+        if resized_image.mode != "L":
+            resized_image = resized_image.convert("L")
+        lookup = [255 if value >= cutoff else 0 for value in range(256)]
+        bilevel = resized_image.point(lookup, "1")
+        return CharMatrix(bilevel.height, bilevel.width, bilevel.tobytes())
+
+    def generate_character_matrix(self, resized_image, compact=False, block_size=DEFAULT_BLOCK_SIZE,
+                                  block_threshold=None, threshold_mode=DEFAULT_THRESHOLD_MODE, window=None):
         """
         Generates a preliminary matrix of single characters ('#' or ' ') and then 
         passes it to the compression logic.
+        With compact=True the compressed matrix is returned as a bit-packed CharMatrix
+        (same cells, a fraction of the memory) instead of a list of lists.
+        Block sizes and thresholds other than the default 2x2 majority go through the
+        summed-area table (see get_integral_image and compress_blocks).
+        threshold_mode picks which pixels count as bright (see apply_threshold).
         """
-        matrix_single_char = []
-        width, height = resized_image.size 
-        
-        for y in range(height):
-            row = []
-            for x in range(width):
-                brightness = self._get_pixel_brightness(resized_image, x, y)
-                # Bright pixels (>= 128) map to '#', Dark pixels (< 128) map to ' '
-                char = '#' if brightness >= 128 else ' ' 
-                row.append(char)
-            matrix_single_char.append(row)
+        block_size = tuple(block_size)
+        if block_size != DEFAULT_BLOCK_SIZE or block_threshold not in (None, 2):
+            table = self.get_integral_image(resized_image, threshold_mode, window)
+            with self._stage("compress"):
+                return self.compress_blocks(table, block_size, block_threshold, compact)
+
+        np = get_numpy()
+        if np is not None:
+            # Threshold the whole image at once and compress with array operations
+            with self._stage("threshold"):
+                resized_image, cutoff = self.apply_threshold(resized_image, threshold_mode, window)
+                bright = np.asarray(resized_image) >= cutoff
+            with self._stage("compress"):
+                return self._compress_bright_array(bright, compact)
+
+        if compact:
+            # Bit-parallel path: threshold via Pillow, compress whole packed rows at a time
+            with self._stage("threshold"):
+                resized_image, cutoff = self.apply_threshold(resized_image, threshold_mode, window)
+                single_char_matrix = self._threshold_to_char_matrix(resized_image, cutoff)
+            with self._stage("compress"):
+                compressed_matrix = single_char_matrix.compress_majority_2x2()
+                return compressed_matrix, compressed_matrix.to_text()
+
+        with self._stage("threshold"):
+            resized_image, cutoff = self.apply_threshold(resized_image, threshold_mode, window)
+            matrix_single_char = []
+            width, height = resized_image.size 
+            
+            for y in range(height):
+                row = []
+                for x in range(width):
+                    brightness = self._get_pixel_brightness(resized_image, x, y)
+                    # Bright pixels (>= cutoff, 128 by default) map to '#', Dark pixels map to ' '
+                    char = '#' if brightness >= cutoff else ' ' 
+                    row.append(char)
+                matrix_single_char.append(row)
             
         # Pass the full-resolution matrix to the compression function
-        compressed_matrix, full_text_output = self._compress_and_format_matrix(matrix_single_char)
+        with self._stage("compress"):
+            compressed_matrix, full_text_output = self._compress_and_format_matrix(matrix_single_char)
         
         # Return the compressed matrix for image drawing, and the final text output
         return compressed_matrix, full_text_output
 
-    def create_matrix_image(self, matrix):
+    def _stamp_glyph_numpy(self, matrix, glyph):
+        """
+        Builds the canvas with one Kronecker product: every '#' cell receives the
+        glyph's ink, every ' ' cell stays white.
+        """
+        np = get_numpy()
+        if isinstance(matrix, CharMatrix):
+            hash_mask = matrix.to_bool_array().astype(np.uint8)
+        else:
+            hash_mask = (np.asarray(matrix) == '#').astype(np.uint8)
+        ink = 255 - np.asarray(glyph, dtype=np.uint8)
+        canvas = 255 - np.kron(hash_mask, ink)
+        return Image.fromarray(canvas.astype(np.uint8), "L")
+
+    def _stamp_glyph_pillow(self, matrix, glyph, rows, cols):
+        """
+        Pillow-only fallback: tiles the glyph across the canvas with O(rows + cols) pastes,
+        then keeps it only where the upscaled '#' mask is set.
+        """
+        cell_w, cell_h = glyph.size
+
+        # Tile the glyph across one row strip, then stack that strip down the canvas
+        strip = Image.new("L", (cols * cell_w, cell_h))
+        for x in range(cols):
+            strip.paste(glyph, (x * cell_w, 0))
+        tiled = Image.new("L", (cols * cell_w, rows * cell_h))
+        for y in range(rows):
+            tiled.paste(strip, (0, y * cell_h))
+
+        # One pixel per cell (set = '#'), expanded to cell size in a single NEAREST resize
+        if isinstance(matrix, CharMatrix):
+            mask = matrix.to_mask().convert("L")
+        else:
+            mask_bytes = bytes(255 if str(char) == '#' else 0 for row in matrix for char in row)
+            mask = Image.frombytes("L", (cols, rows), mask_bytes)
+        mask = mask.resize(tiled.size, Image.Resampling.NEAREST)
+
+        white = Image.new("L", tiled.size, 255)
+        return Image.composite(tiled, white, mask)
+
+    # --- Streaming API (bounded memory for very large dimensions) ---
+    def _resampled_rows(self, final_dim):
+        """
+        Source row for every row of a final_dim-high NEAREST resize of current_image.
+        Pillow walks source rows by accumulating the scale step; this mirrors that walk,
+        so bands built from these rows match a full resize exactly.
+        """
+        scale_y = self.current_image.height / final_dim
+        rows = []
+        source_y = scale_y * 0.5
+        for _ in range(final_dim):
+            rows.append(int(source_y))
+            source_y += scale_y
+        return rows
+
+    def _resample_band(self, final_dim, source_rows):
+        """Builds the final_dim-wide rows of the resized image for the given source rows."""
+        src_width = self.current_image.width
+        band_image = Image.new("L", (final_dim, len(source_rows)))
+        for y, row in enumerate(source_rows):
+            # A one-row box keeps the horizontal sampling identical to the full resize
+            band_image.paste(
+                self.current_image.resize((final_dim, 1), Image.Resampling.NEAREST, box=(0, row, src_width, row + 1)),
+                (0, y)
+            )
+        return band_image
+
+    def iter_matrix_bands(self, resize_dim, band_rows=DEFAULT_BAND_ROWS, compact=False,
+                          block_size=DEFAULT_BLOCK_SIZE, block_threshold=None,
+                          threshold_mode=DEFAULT_THRESHOLD_MODE, window=None):
+        """
+        Yields (compressed_matrix, text) band by band, top to bottom, for the same matrix
+        that process_and_resize + generate_character_matrix would produce in one go.
+        Each band resamples only the source rows it needs, so memory stays proportional
+        to band_rows * resize_dim rather than resize_dim ** 2.
+        "otsu" first sums the histograms of all bands (one extra resampling pass);
+        the local modes resample window // 2 extra rows above and below each band.
+        """
+        if not self.current_image:
+            raise ValueError("No image loaded for processing.")
+        if threshold_mode not in THRESHOLD_MODES:
+            raise ValueError(f"Unknown threshold mode {threshold_mode!r}; choose from {', '.join(THRESHOLD_MODES)}.")
+
+        final_dim = self.fit_dimension(resize_dim, block_size)
+        block_height = block_size[1]
+        band_rows = max(block_height, band_rows - band_rows % block_height) # Bands must hold whole blocks
+        source_rows = self._resampled_rows(final_dim)
+
+        # Bands are handed on already thresholded: bright pixels 255, dark pixels 0
+        binary_lookup = [0] + [255] * 255
+        if threshold_mode == "otsu":
+            histogram = [0] * 256
+            for top in range(0, final_dim, band_rows):
+                band_histogram = self._resample_band(final_dim, source_rows[top:top + band_rows]).histogram()
+                histogram = [total + count for total, count in zip(histogram, band_histogram)]
+            cutoff = otsu_threshold(histogram, BRIGHTNESS_THRESHOLD)
+            binary_lookup = [255 if value >= cutoff else 0 for value in range(256)]
+        elif threshold_mode in LOCAL_THRESHOLD_MODES:
+            window = window or default_window(final_dim, final_dim)
+        context = window // 2 if threshold_mode in LOCAL_THRESHOLD_MODES else 0
+
+        for top in range(0, final_dim, band_rows):
+            bottom = min(top + band_rows, final_dim)
+            start, stop = max(0, top - context), min(final_dim, bottom + context)
+            band_image = self._resample_band(final_dim, source_rows[start:stop])
+
+            if threshold_mode in LOCAL_THRESHOLD_MODES:
+                mask = local_bright_mask(band_image, threshold_mode, window)
+                band_image = mask.crop((0, top - start, final_dim, bottom - start)).point(binary_lookup)
+            elif threshold_mode == "otsu":
+                band_image = band_image.point(binary_lookup)
+
+            yield self.generate_character_matrix(band_image, compact, block_size, block_threshold)
+
+    def write_matrix_stream(self, resize_dim, destination, band_rows=DEFAULT_BAND_ROWS,
+                            block_size=DEFAULT_BLOCK_SIZE, block_threshold=None,
+                            threshold_mode=DEFAULT_THRESHOLD_MODE, window=None):
+        """
+        Streams the text output band by band to a file path, a file object (text or
+        binary) or a connected socket, without building the whole text in memory.
+        Returns the (columns, rows) of the written matrix.
+        """
+        if isinstance(destination, (str, os.PathLike)):
+            with open(destination, "w", encoding="ascii") as text_file:
+                return self.write_matrix_stream(
+                    resize_dim, text_file, band_rows, block_size, block_threshold, threshold_mode, window
+                )
+
+        if hasattr(destination, "sendall"):
+            write = lambda text: destination.sendall(text.encode("ascii"))
+        elif isinstance(destination, io.TextIOBase):
+            write = destination.write
+        else:
+            write = lambda text: destination.write(text.encode("ascii"))
+
+        cols = rows = 0
+        bands = self.iter_matrix_bands(resize_dim, band_rows, True, block_size, block_threshold, threshold_mode, window)
+        for band_matrix, text in bands:
+            write(text)
+            rows += band_matrix.rows
+            cols = band_matrix.cols
+        return cols, rows
+
+    def create_matrix_image(self, matrix, mode="RGB"):
         """
         Creates a visual image from the compressed character matrix (only '#' or ' '). 
         Note: The image drawing uses the 'char' assigned in the compression step. 
               Since we swapped the 'char' values, the image visualization is now also inverted.
+        The '#' glyph is rasterized once (and cached), then stamped onto every '#' cell in bulk.
+        mode="L" skips the RGB conversion (the image is grayscale either way).
         """
-        if not matrix or not matrix[0]: return Image.new("RGB", (10, 10), "white")
+        if not matrix or not matrix[0]: return Image.new(mode, (10, 10), "white")
         
         rows = len(matrix)
         cols = len(matrix[0])
 
-        # Create image canvas
-        img_width = cols * CELL_SIZE
-        img_height = rows * CELL_SIZE
-        image = Image.new("RGB", (img_width, img_height), "white")
-        draw = ImageDraw.Draw(image)
+        # We only draw '#' characters (which now represent the dark areas of the source image)
+        glyph = _get_glyph_cell('#', FONT_NAME, FONT_SIZE, CELL_SIZE)
 
-        try:
-            font = ImageFont.truetype("arial.ttf", FONT_SIZE)
-        except:
-            font = ImageFont.load_default()
+        with self._stage("render"):
+            if get_numpy() is not None:
+                canvas = self._stamp_glyph_numpy(matrix, glyph)
+            else:
+                canvas = self._stamp_glyph_pillow(matrix, glyph, rows, cols)
 
-        # Draw each character from the compressed matrix
-        for y in range(rows):
-            for x in range(cols):
-                char = str(matrix[y][x])
-                
-                # We only draw '#' characters (which now represent the dark areas of the source image)
-                if char == '#':
-                    # Center the text in the cell
-                    x_pos = x * CELL_SIZE + (CELL_SIZE - FONT_SIZE) // 2
-                    y_pos = y * CELL_SIZE + (CELL_SIZE - FONT_SIZE) // 2
-                    
-                    fill_color = "black"
-                    draw.text((x_pos, y_pos), char, fill=fill_color, font=font)
-                # If char == ' ' (which now represents the bright areas), we skip drawing.
-                
-        return image
+            return canvas if mode == "L" else canvas.convert(mode)
 
     def save_image(self, image_to_save):
-        """Asks user for save location and saves the processed image."""
-        # Calculate compressed size for default filename
-        rows = image_to_save.height // CELL_SIZE
-        cols = image_to_save.width // CELL_SIZE
-        default_filename = f"compressed_matrix_inverted_{cols}x{rows}.png"
+        """Asks user for save location and saves the processed image (UI helper, see ui_actions)."""
+        from ui_actions import save_image_dialog
+        return save_image_dialog(self, image_to_save)
         
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".png",
-            initialfile=default_filename,
-            filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("All files", "*.*")]
-        )
+    def encode_image(self, image, destination, format=None, **params):
+        """
+        Encodes an image to a path or binary file object (no dialogs; usable headless).
+        Extra params go to the encoder (e.g. save_all/append_images for animations).
+        """
+        with self._stage("encode"):
+            image.save(destination, format=format, **params)
+
+    def scale_preview(self, image, max_size):
+        """
+        Fits an image into max_size for display with a single resize: small images are
+        enlarged by a whole factor with NEAREST (square, crisp pixels), larger ones shrunk
+        like thumbnail() but without its copy. An image that already fits at 1x is returned as is.
+        """
+        max_width, max_height = max_size
+        factor = min(max_width // image.width, max_height // image.height)
+        if factor == 1:
+            return image
+        if factor > 1:
+            return image.resize((image.width * factor, image.height * factor), Image.Resampling.NEAREST)
+
+        scale = min(max_width / image.width, max_height / image.height)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        return image.resize(size, Image.Resampling.BICUBIC, reducing_gap=2.0)
 
-        if file_path:
-            image_to_save.save(file_path)
-            messagebox.showinfo("Success", f"Image successfully saved to:\n{file_path}")
-            return True
-        return False
-        
     def calculate_display_params(self, matrix_image):
         """Calculates the display parameters based on the newly created matrix image."""
         
@@ -202,4 +838,10 @@ class ImageProcessorLogic:
         text_width_chars = max(1, display_w // CHAR_WIDTH_PX)
         text_height_lines = max(1, display_h // CHAR_HEIGHT_PX)
 
-        return display_w, display_h, text_width_chars, text_height_lines
\ No newline at end of file
+        return display_w, display_h, text_width_chars, text_height_lines
+
+if __name__ == "__main__":
+    # Headless entry point: python -m image_logic batch ...
+    import sys
+    from batch_cli import main
+    sys.exit(main())
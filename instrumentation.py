@@ -0,0 +1,154 @@
+# instrumentation.py
+"""
+Opt-in per-stage instrumentation for the matrix pipeline: wall time, CPU time
+and peak traced memory for each stage (decode, grayscale, resize, threshold,
+compress, render, encode), grouped into per-run records.
+"""
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import resource # Unix only
+except ImportError:
+    resource = None
+
+# --- Constants ---
+DEFAULT_HISTORY = 500 # Run records (and per-stage samples) kept for the rolling histogram
+HISTOGRAM_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000) # Bucket upper bounds; the last bucket is open
+
+
+class StageHistogram:
+    """Rolling window of stage wall times with fixed millisecond buckets."""
+    def __init__(self, window=DEFAULT_HISTORY):
+        self.window = window
+        self._samples = {} # stage -> deque of wall times (ms)
+
+    def add(self, stage, wall_ms):
+        self._samples.setdefault(stage, deque(maxlen=self.window)).append(wall_ms)
+
+    def summary(self):
+        """Per stage: sample count, p50/p95/max in ms and bucket counts over the window."""
+        summary = {}
+        for stage, samples in self._samples.items():
+            ordered = sorted(samples)
+            buckets = {f"<{edge}ms": 0 for edge in HISTOGRAM_EDGES_MS}
+            buckets[f">={HISTOGRAM_EDGES_MS[-1]}ms"] = 0
+            for value in ordered:
+                for edge in HISTOGRAM_EDGES_MS:
+                    if value < edge:
+                        buckets[f"<{edge}ms"] += 1
+                        break
+                else:
+                    buckets[f">={HISTOGRAM_EDGES_MS[-1]}ms"] += 1
+            summary[stage] = {
+                "count": len(ordered),
+                "p50_ms": ordered[len(ordered) // 2],
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max_ms": ordered[-1],
+                "buckets": buckets,
+            }
+        return summary
+
+
+class StageProfiler:
+    """
+    Records stages into run records. A run is opened with run(); stages executed
+    on the same thread while it is open are added to it. Stages outside any run
+    get a run of their own. Memory figures come from tracemalloc, so they cover
+    Python and NumPy allocations (not Pillow's internal C buffers); the peak is
+    process-wide, so concurrent runs on other threads can inflate it.
+    """
+    def __init__(self, history=DEFAULT_HISTORY, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.records = deque(maxlen=history)
+        self.histogram = StageHistogram(history)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def close(self):
+        """Stops tracemalloc if this profiler started it."""
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    @contextmanager
+    def run(self, kind, **params):
+        """Opens a run record for this thread (or joins the one already open) and yields it."""
+        current = getattr(self._local, "record", None)
+        if current is not None:
+            yield current
+            return
+
+        record = {"run": kind, "started": time.time(), "params": params, "stages": []}
+        self._local.record = record
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self._local.record = None
+            record["total_wall_ms"] = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.records.append(record)
+
+    @contextmanager
+    def stage(self, name):
+        """Times one stage and appends it to the current run."""
+        with self.run(name) as record:
+            tracing = self.trace_memory and tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.reset_peak()
+                memory_before = tracemalloc.get_traced_memory()[0]
+            wall_started = time.perf_counter()
+            cpu_started = time.thread_time()
+            try:
+                yield
+            finally:
+                entry = {
+                    "stage": name,
+                    "wall_ms": (time.perf_counter() - wall_started) * 1000,
+                    "cpu_ms": (time.thread_time() - cpu_started) * 1000,
+                    "peak_bytes": tracemalloc.get_traced_memory()[1] - memory_before if tracing else None,
+                }
+                record["stages"].append(entry)
+                with self._lock:
+                    self.histogram.add(name, entry["wall_ms"])
+
+    def last_record(self):
+        with self._lock:
+            return self.records[-1] if self.records else None
+
+    def histogram_summary(self):
+        with self._lock:
+            return self.histogram.summary()
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process so far, in bytes (None where the platform
+    does not report it). Unlike the tracemalloc figures it includes Pillow's pixel buffers.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024 # Linux reports kilobytes
+
+
+def format_record(record):
+    """One-line summary of a run record, e.g. for a status bar."""
+    parts = [f"{entry['stage']} {entry['wall_ms']:.1f} ms" for entry in record["stages"]]
+    return " | ".join(parts) + f"  (total {record['total_wall_ms']:.1f} ms)"
+
+
+def write_jsonl(records, file_obj):
+    """Writes run records as JSON lines (one record per line) to an open text file."""
+    for record in records:
+        file_obj.write(json.dumps(record) + "\n")
@@ -0,0 +1,115 @@
+# integral_image.py
+"""
+Summed-area tables (integral images) for O(1) rectangle sums over a
+grayscale image, whatever the rectangle size. One table serves every block
+size, so changing the block size never re-reads the pixels.
+"""
+from itertools import accumulate
+
+from lazy_imports import get_numpy
+
+
+class IntegralImage:
+    """
+    Summed-area table of an 'L' image: entry (y, x) is the sum of all pixel values
+    above and to the left of (y, x), exclusive, so the table has one more row and
+    column than the image. Stored as a NumPy int64 array when NumPy is available,
+    otherwise as a list of Python int lists.
+    """
+    __slots__ = ("width", "height", "table")
+
+    def __init__(self, width, height, table):
+        self.width = width
+        self.height = height
+        self.table = table
+
+    @classmethod
+    def from_image(cls, image, squared=False):
+        """
+        Builds the table for a grayscale image (other modes are converted to 'L').
+        With squared=True it sums the squared pixel values instead (for local variance).
+        """
+        if image.mode != "L":
+            image = image.convert("L")
+        width, height = image.size
+
+        np = get_numpy()
+        if np is not None:
+            values = np.asarray(image, dtype=np.int64)
+            table = np.zeros((height + 1, width + 1), dtype=np.int64)
+            np.cumsum(values * values if squared else values, axis=0, out=table[1:, 1:])
+            np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+            return cls(width, height, table)
+
+        pixels = image.tobytes()
+        table = [[0] * (width + 1)]
+        for y in range(height):
+            above = table[-1]
+            row = pixels[y * width:(y + 1) * width]
+            if squared:
+                row = [value * value for value in row]
+            row_prefix = accumulate(row, initial=0)
+            table.append([top + left for top, left in zip(above, row_prefix)])
+        return cls(width, height, table)
+
+    def block_sum(self, x, y, width, height):
+        """Sum of the pixel values in the width x height rectangle at (x, y)."""
+        table = self.table
+        bottom, right = y + height, x + width
+        return int(table[bottom][right] - table[y][right] - table[bottom][x] + table[y][x])
+
+    def block_sums(self, block_width, block_height):
+        """
+        Sums over the grid of whole block_width x block_height blocks, tiled from the
+        top-left corner; a remainder narrower or shorter than one block is ignored.
+        Returns a rows x cols NumPy array (or list of lists without NumPy).
+        """
+        if block_width < 1 or block_height < 1:
+            raise ValueError(f"Block size must be at least 1x1, got {block_width}x{block_height}.")
+        cols, rows = self.width // block_width, self.height // block_height
+
+        np = get_numpy()
+        if np is not None:
+            corners = self.table[0:rows * block_height + 1:block_height, 0:cols * block_width + 1:block_width]
+            return corners[1:, 1:] - corners[:-1, 1:] - corners[1:, :-1] + corners[:-1, :-1]
+
+        sums = []
+        for block_y in range(rows):
+            top = self.table[block_y * block_height]
+            bottom = self.table[(block_y + 1) * block_height]
+            sums.append([
+                bottom[x + block_width] - top[x + block_width] - bottom[x] + top[x]
+                for x in range(0, cols * block_width, block_width)
+            ])
+        return sums
+
+    def window_sums(self, radius):
+        """
+        Sum and pixel count of the (2 * radius + 1)-square window centred on every pixel,
+        clipped at the image border. Returns (sums, counts) as height x width NumPy
+        arrays (or lists of lists without NumPy).
+        """
+        width, height = self.width, self.height
+
+        np = get_numpy()
+        if np is not None:
+            top = np.clip(np.arange(height) - radius, 0, height)[:, None]
+            bottom = np.clip(np.arange(height) + radius + 1, 0, height)[:, None]
+            left = np.clip(np.arange(width) - radius, 0, width)[None, :]
+            right = np.clip(np.arange(width) + radius + 1, 0, width)[None, :]
+            table = self.table
+            sums = table[bottom, right] - table[top, right] - table[bottom, left] + table[top, left]
+            return sums, (bottom - top) * (right - left)
+
+        lefts = [max(0, x - radius) for x in range(width)]
+        rights = [min(width, x + radius + 1) for x in range(width)]
+        sums, counts = [], []
+        for y in range(height):
+            top, bottom = max(0, y - radius), min(height, y + radius + 1)
+            top_row, bottom_row = self.table[top], self.table[bottom]
+            sums.append([
+                bottom_row[right] - top_row[right] - bottom_row[left] + top_row[left]
+                for left, right in zip(lefts, rights)
+            ])
+            counts.append([(bottom - top) * (right - left) for left, right in zip(lefts, rights)])
+        return sums, counts
@@ -0,0 +1,16 @@
+# lazy_imports.py
+"""
+Optional and heavy dependencies, imported on first use rather than at module
+import time, so headless workers and the CLI start quickly.
+"""
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def get_numpy():
+    """Returns the numpy module, or None when NumPy is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
@@ -0,0 +1,149 @@
+# matrix_export.py
+"""
+Compact exports of a compressed '#'/' ' matrix that skip the glyph canvas:
+a 1-bit bitmap (PNG or PBM, one pixel per cell or upscaled with NEAREST),
+a run-length text form and a packed binary form (one bit per cell). The text
+and binary forms can be read back into a CharMatrix.
+"""
+import io
+import os
+import re
+import struct
+
+from PIL import Image
+
+from char_matrix import CharMatrix
+
+# --- Formats ---
+# Export format -> file name suffix (appended to the {stem}_matrix_{cols}x{rows} base name)
+EXPORT_FORMATS = {"png1": "_1bit.png", "pbm": ".pbm", "rle": ".rle", "bits": ".bits"}
+RLE_HEADER = "RLE {cols}x{rows}\n" # First line of the run-length form
+PACKED_MAGIC = b"CMX1"
+PACKED_HEADER = struct.Struct(">4sII") # Magic, columns, rows (big-endian), then the packed rows
+
+_RUNS = re.compile(r"0+|1+")
+_RLE_HEADER_PATTERN = re.compile(r"RLE (\d+)x(\d+)$")
+
+
+def as_char_matrix(matrix):
+    """The matrix as a CharMatrix (list-of-lists matrices are packed)."""
+    return matrix if isinstance(matrix, CharMatrix) else CharMatrix.from_rows(matrix)
+
+
+# --- 1-bit Bitmap ---
+def matrix_to_bitmap(matrix, scale=1):
+    """
+    1-bit image of the matrix with scale x scale pixels per cell: '#' cells black,
+    ' ' cells white, like the glyph canvas but without rendering any glyph.
+    """
+    if scale < 1:
+        raise ValueError(f"Scale must be at least 1, got {scale}.")
+    bitmap = as_char_matrix(matrix).to_image()
+    if scale > 1:
+        bitmap = bitmap.resize((bitmap.width * scale, bitmap.height * scale), Image.Resampling.NEAREST)
+    return bitmap
+
+
+# --- Run-length Text ---
+def _row_runs(matrix, y):
+    """Alternating run lengths of row y, starting with ' ' cells (0 when the row starts with '#')."""
+    bits = format(matrix.row_int(y), f"0{matrix.stride * 8}b")[:matrix.cols]
+    runs = [len(run) for run in _RUNS.findall(bits)]
+    if bits.startswith("1"):
+        runs.insert(0, 0)
+    return runs
+
+
+def write_rle(matrix, destination):
+    """
+    Writes the run-length form to a path or text file object: an RLE_HEADER line, then
+    one line per row of alternating ' '/'#' run lengths, starting with ' ' (e.g. '0 3 5 2').
+    """
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, "w", encoding="ascii") as text_file:
+            return write_rle(matrix, text_file)
+
+    matrix = as_char_matrix(matrix)
+    destination.write(RLE_HEADER.format(cols=matrix.cols, rows=matrix.rows))
+    for y in range(matrix.rows):
+        destination.write(" ".join(map(str, _row_runs(matrix, y))) + "\n")
+
+
+def read_rle(source):
+    """Reads the run-length form from a path or text file object back into a CharMatrix."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r", encoding="ascii") as text_file:
+            return read_rle(text_file)
+
+    header = _RLE_HEADER_PATTERN.match(source.readline().rstrip("\n"))
+    if header is None:
+        raise ValueError("Not a run-length matrix: missing 'RLE <cols>x<rows>' header.")
+    cols, rows = int(header.group(1)), int(header.group(2))
+
+    matrix = CharMatrix(rows, cols)
+    padding = matrix.stride * 8 - cols
+    for y in range(rows):
+        line = source.readline()
+        if not line:
+            raise ValueError(f"Run-length matrix ends after {y} of {rows} rows.")
+        runs = [int(run) for run in line.split()]
+        if any(run < 0 for run in runs):
+            raise ValueError(f"Row {y} has a negative run length.")
+        if sum(runs) != cols:
+            raise ValueError(f"Row {y} covers {sum(runs)} cells, expected {cols}.")
+        bits = "".join(("1" if index % 2 else "0") * run for index, run in enumerate(runs))
+        start = y * matrix.stride
+        matrix.data[start:start + matrix.stride] = (int(bits or "0", 2) << padding).to_bytes(matrix.stride, "big")
+    return matrix
+
+
+# --- Packed Binary ---
+def write_packed(matrix, destination):
+    """
+    Writes the packed form to a path or binary file object: PACKED_HEADER, then every
+    row MSB-first in (cols + 7) // 8 bytes, '#' = 1 (the CharMatrix layout).
+    """
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, "wb") as binary_file:
+            return write_packed(matrix, binary_file)
+
+    matrix = as_char_matrix(matrix)
+    destination.write(PACKED_HEADER.pack(PACKED_MAGIC, matrix.cols, matrix.rows))
+    destination.write(matrix.data)
+
+
+def read_packed(source):
+    """Reads the packed form from a path, bytes or binary file object back into a CharMatrix."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as binary_file:
+            return read_packed(binary_file)
+
+    header = source.read(PACKED_HEADER.size)
+    if len(header) != PACKED_HEADER.size:
+        raise ValueError("Not a packed matrix: header is truncated.")
+    magic, cols, rows = PACKED_HEADER.unpack(header)
+    if magic != PACKED_MAGIC:
+        raise ValueError(f"Not a packed matrix: bad magic {magic!r}.")
+    return CharMatrix(rows, cols, source.read(rows * ((cols + 7) // 8)))
+
+
+def export_matrix(matrix, destination, format, scale=1, logic=None):
+    """
+    Writes the matrix to destination in one of EXPORT_FORMATS. scale applies to the
+    bitmap formats; with a logic object their encoding is profiled like any other image.
+    """
+    if format == "rle":
+        write_rle(matrix, destination)
+    elif format == "bits":
+        write_packed(matrix, destination)
+    elif format in ("png1", "pbm"):
+        bitmap = matrix_to_bitmap(matrix, scale)
+        image_format = "PNG" if format == "png1" else "PPM" # Pillow writes 1-bit PPM as binary PBM (P4)
+        if logic is not None:
+            logic.encode_image(bitmap, destination, image_format)
+        else:
+            bitmap.save(destination, format=image_format)
+    else:
+        raise ValueError(f"Unknown export format {format!r}; choose from {', '.join(EXPORT_FORMATS)}.")
@@ -0,0 +1,308 @@
+# qr_grid.py
+"""
+Locates a QR code's three finder patterns in a thresholded image and samples
+each module centre exactly once, so the resulting matrix has one cell per QR
+module (21x21 for version 1 up to 177x177 for version 40) instead of an
+arbitrary resize of the whole image.
+"""
+import math
+from itertools import combinations, groupby
+
+# --- Constants ---
+FINDER_RATIO = (1, 1, 3, 1, 1) # Dark/light/dark/light/dark run widths across a finder pattern, in modules
+FINDER_MODULES = sum(FINDER_RATIO)
+MIN_VERSION = 1
+MAX_VERSION = 40
+MAX_CANDIDATES = 8 # Most-confirmed finder candidates considered when choosing the three patterns
+TRACE_STEP = 0.25 # Pixels advanced per step when tracing across a finder pattern
+VERSION_INFO_MIN_VERSION = 7 # Versions 7+ carry an 18-bit version block next to two finders
+VERSION_INFO_GENERATOR = 0x1F25 # BCH(18, 6) generator polynomial of the version block
+VERSION_INFO_MAX_ERRORS = 3 # The BCH code corrects up to 3 bit errors
+VERSION_INFO_MAX_SHIFT = 2 # A version block is only trusted within this many versions of the estimate
+MAX_TRIPLE_SCORE = 0.2 # Finder triples scoring worse are not a QR code (a square code scores near 0, noise 0.2+)
+MIN_MODULE_SIZE = 2.0 # Pixels; smaller modules cannot be sampled reliably (and noise finds "finders" at 1-2 px)
+LEG_TOLERANCE = 0.1 # Each leg may differ from the version's size by this fraction (plus 4 modules)
+TIMING_MIN_MATCH = 0.8 # Fraction of timing-pattern modules that must alternate as expected
+
+
+def _version_codeword(version):
+    """The 18-bit version block for a version: 6 version bits followed by 12 BCH check bits."""
+    remainder = version << 12
+    for bit in range(17, 11, -1):
+        if remainder & (1 << bit):
+            remainder ^= VERSION_INFO_GENERATOR << (bit - 12)
+    return version << 12 | remainder
+
+
+VERSION_CODEWORDS = {version: _version_codeword(version) for version in range(VERSION_INFO_MIN_VERSION, 41)}
+
+
+class QRGrid:
+    """
+    Module grid of one QR code: its version, size in modules and the image
+    positions of the three finder pattern centres. Module (row, col) centres
+    are interpolated affinely from those three points.
+    """
+    __slots__ = ("version", "size", "module_size", "top_left", "top_right", "bottom_left")
+
+    def __init__(self, version, module_size, top_left, top_right, bottom_left):
+        self.version = version
+        self.size = 4 * version + 17
+        self.module_size = module_size
+        self.top_left = top_left
+        self.top_right = top_right
+        self.bottom_left = bottom_left
+
+    def module_center(self, row, col):
+        """Image (x, y) of the centre of module (row, col)."""
+        # Finder centres sit 3.5 modules in from their corners, size - 7 modules apart
+        span = self.size - 7
+        u = (col - 3) / span
+        v = (row - 3) / span
+        x0, y0 = self.top_left
+        return (
+            x0 + u * (self.top_right[0] - x0) + v * (self.bottom_left[0] - x0),
+            y0 + u * (self.top_right[1] - y0) + v * (self.bottom_left[1] - y0),
+        )
+
+    def __repr__(self):
+        return f"QRGrid(version={self.version}, {self.size}x{self.size} modules, module_size={self.module_size:.2f}px)"
+
+
+def _is_finder_ratio(runs):
+    """True when five run widths match 1:1:3:1:1 within half a module per unit."""
+    total = sum(runs)
+    if total < FINDER_MODULES:
+        return False
+    module = total / FINDER_MODULES
+    tolerance = module / 2
+    return all(abs(module * ratio - run) < tolerance * ratio for ratio, run in zip(FINDER_RATIO, runs))
+
+
+def _check_line(line, center):
+    """
+    Measures the five runs through line[center] (which must be dark) along one line of
+    the mask. Returns (refined centre index, total width) for a finder-like cross
+    section, else None.
+    """
+    if line[center]:
+        return None
+    length = len(line)
+    runs = [0] * 5
+
+    index = center
+    for slot, bright in ((2, 0), (1, 1), (0, 0)):
+        while index >= 0 and line[index] == bright:
+            runs[slot] += 1
+            index -= 1
+    index = center + 1
+    for slot, bright in ((2, 0), (3, 1), (4, 0)):
+        while index < length and line[index] == bright:
+            runs[slot] += 1
+            index += 1
+
+    if not all(runs) or not _is_finder_ratio(runs):
+        return None
+    return index - runs[4] - runs[3] - runs[2] / 2, sum(runs)
+
+
+def find_finder_patterns(mask):
+    """
+    Scans every row of a 0/1 'L' mask (1 = bright) for 1:1:3:1:1 run sequences,
+    confirms each one vertically and horizontally through its centre, and merges
+    nearby confirmations. Returns [(x, y, module_size, confirmations)], most confirmed first.
+    """
+    width, height = mask.size
+    pixels = mask.tobytes()
+    candidates = []
+
+    for y in range(height):
+        row = pixels[y * width:(y + 1) * width]
+        runs = [(value, sum(1 for _ in group)) for value, group in groupby(row)]
+
+        start = 0
+        for index in range(len(runs) - 4):
+            window = runs[index:index + 5]
+            if window[0][0] == 0 and _is_finder_ratio([run for _, run in window]):
+                center_x = start + window[0][1] + window[1][1] + window[2][1] / 2
+                vertical = _check_line(pixels[int(center_x)::width], y)
+                if vertical is not None:
+                    center_y, vertical_total = vertical
+                    horizontal = _check_line(pixels[int(center_y) * width:(int(center_y) + 1) * width], int(center_x))
+                    if horizontal is not None:
+                        center_x, horizontal_total = horizontal
+                        module_size = (vertical_total + horizontal_total) / (2 * FINDER_MODULES)
+                        _add_candidate(candidates, center_x, center_y, module_size)
+            start += window[0][1]
+
+    return sorted((tuple(candidate) for candidate in candidates), key=lambda candidate: -candidate[3])
+
+
+def _add_candidate(candidates, x, y, module_size):
+    """Merges a confirmed centre into a nearby candidate (running average), or adds a new one."""
+    for candidate in candidates:
+        cx, cy, size, count = candidate
+        if abs(x - cx) <= size and abs(y - cy) <= size and abs(module_size - size) <= max(1.0, size):
+            total = count + 1
+            candidate[:] = [
+                (cx * count + x) / total, (cy * count + y) / total, (size * count + module_size) / total, total
+            ]
+            return
+    candidates.append([x, y, module_size, 1])
+
+
+def _order_patterns(patterns):
+    """Orders three pattern centres as (top-left, top-right, bottom-left)."""
+    a, b, c = patterns
+    # Top-left is opposite the longest side (the diagonal between the other two)
+    sides = [(math.dist(b[:2], c[:2]), a, b, c), (math.dist(a[:2], c[:2]), b, a, c), (math.dist(a[:2], b[:2]), c, a, b)]
+    _, top_left, right, bottom = max(sides, key=lambda side: side[0])
+    # In image coordinates (y down), top-right x bottom-left around top-left is positive
+    cross = (right[0] - top_left[0]) * (bottom[1] - top_left[1]) - (right[1] - top_left[1]) * (bottom[0] - top_left[0])
+    if cross < 0:
+        right, bottom = bottom, right
+    return top_left, right, bottom
+
+
+def _triple_score(ordered):
+    """Lower is better: equal module sizes, equal legs and a right angle at top-left."""
+    top_left, top_right, bottom_left = ordered
+    sizes = [pattern[2] for pattern in ordered]
+    size_spread = (max(sizes) - min(sizes)) / max(sizes)
+    leg_a = (top_right[0] - top_left[0], top_right[1] - top_left[1])
+    leg_b = (bottom_left[0] - top_left[0], bottom_left[1] - top_left[1])
+    length_a, length_b = math.hypot(*leg_a), math.hypot(*leg_b)
+    if not length_a or not length_b:
+        return math.inf
+    leg_spread = abs(length_a - length_b) / max(length_a, length_b)
+    cosine = abs(leg_a[0] * leg_b[0] + leg_a[1] * leg_b[1]) / (length_a * length_b)
+    return size_spread + leg_spread + cosine
+
+
+def _is_dark(pixels, width, height, x, y):
+    """Mask lookup at image point (x, y); pixel (i, j) covers [i, i + 1) x [j, j + 1). Outside is bright."""
+    return 0 <= x < width and 0 <= y < height and not pixels[int(y) * width + int(x)]
+
+
+def _trace_finder_width(pixels, width, height, center, toward):
+    """
+    Width of the finder pattern at center measured along the line toward another
+    finder centre: from the centre out through dark, light and dark in both
+    directions. Unlike the row/column runs used for detection, this does not
+    grow when the code is rotated. Returns the width in pixels (7 modules), or None.
+    """
+    dx, dy = toward[0] - center[0], toward[1] - center[1]
+    length = math.hypot(dx, dy)
+    if not length:
+        return None
+    dx, dy = dx / length * TRACE_STEP, dy / length * TRACE_STEP
+
+    total = 0.0
+    for sign in (1, -1):
+        x, y = center
+        steps = 0
+        for want_dark in (True, False, True):
+            while _is_dark(pixels, width, height, x, y) == want_dark:
+                x, y = x + sign * dx, y + sign * dy
+                steps += 1
+                if steps * TRACE_STEP > length:
+                    return None
+        total += steps * TRACE_STEP
+    return total
+
+
+def _read_version(pixels, width, height, grid):
+    """
+    Reads both 18-bit version blocks with a provisional grid and returns the version
+    whose codeword is nearest (at most VERSION_INFO_MAX_ERRORS bits off), else None.
+    The blocks sit right next to the top-right and bottom-left finders, so a
+    provisional version that is off by one or two still lands on the right modules.
+    """
+    best_version, best_errors = None, VERSION_INFO_MAX_ERRORS + 1
+    for transposed in (False, True):
+        value = 0
+        for bit in range(17, -1, -1):
+            near, across = bit // 3, grid.size - 11 + bit % 3
+            row, col = (across, near) if transposed else (near, across)
+            value = value << 1 | _is_dark(pixels, width, height, *grid.module_center(row, col))
+        for version, codeword in VERSION_CODEWORDS.items():
+            errors = (value ^ codeword).bit_count()
+            if errors < best_errors:
+                best_version, best_errors = version, errors
+    return best_version
+
+
+def locate_grid(mask):
+    """
+    Finds the three finder patterns in a 0/1 mask and estimates module size and version:
+    the module size from the finder widths traced along both legs, the version from the
+    leg length, confirmed by the version blocks from version 7 up.
+    Returns a QRGrid; raises ValueError when no plausible set of three patterns is found.
+    """
+    candidates = find_finder_patterns(mask)[:MAX_CANDIDATES]
+    if len(candidates) < 3:
+        raise ValueError(f"Found {len(candidates)} QR finder pattern(s); need 3.")
+
+    best = min((_order_patterns(triple) for triple in combinations(candidates, 3)), key=_triple_score)
+    if _triple_score(best) > MAX_TRIPLE_SCORE:
+        raise ValueError("No three finder patterns form a plausible QR code.")
+    top_left, top_right, bottom_left = (pattern[:2] for pattern in best)
+
+    width, height = mask.size
+    pixels = mask.tobytes()
+    widths = [
+        _trace_finder_width(pixels, width, height, center, toward)
+        for center, toward in ((top_left, top_right), (top_right, top_left),
+                               (top_left, bottom_left), (bottom_left, top_left))
+    ]
+    widths = [value for value in widths if value]
+    if not widths:
+        raise ValueError("Could not measure the QR module size.")
+    module_size = sum(widths) / len(widths) / FINDER_MODULES
+    if module_size < MIN_MODULE_SIZE:
+        raise ValueError(f"QR modules of {module_size:.2f}px are too small to sample.")
+
+    # Finder centres are (size - 7) modules apart along both legs
+    legs = (math.dist(top_left, top_right) + math.dist(top_left, bottom_left)) / 2
+    estimated_size = legs / module_size + 7
+    version = min(MAX_VERSION, max(MIN_VERSION, round((estimated_size - 17) / 4)))
+    grid = QRGrid(version, module_size, top_left, top_right, bottom_left)
+
+    if version >= VERSION_INFO_MIN_VERSION - 1:
+        read_version = _read_version(pixels, width, height, grid)
+        if read_version is not None and 0 < abs(read_version - version) <= VERSION_INFO_MAX_SHIFT:
+            grid = QRGrid(read_version, module_size, top_left, top_right, bottom_left)
+
+    leg_sizes = [math.dist(top_left, corner) / module_size + 7 for corner in (top_right, bottom_left)]
+    if any(abs(size - grid.size) > grid.size * LEG_TOLERANCE + 4 for size in leg_sizes):
+        raise ValueError(f"The finder patterns do not span a version {grid.version} QR code.")
+    if _timing_match(pixels, width, height, grid) < TIMING_MIN_MATCH:
+        raise ValueError(f"No timing pattern where a version {grid.version} QR code has one.")
+    return grid
+
+
+def _timing_match(pixels, width, height, grid):
+    """
+    Fraction of the row 6 and column 6 timing modules (between the finders) that read
+    as expected: dark at even indices, light at odd ones.
+    """
+    indices = range(8, grid.size - 8)
+    matches = sum(
+        _is_dark(pixels, width, height, *grid.module_center(row, col)) == (index % 2 == 0)
+        for index in indices
+        for row, col in ((6, index), (index, 6))
+    )
+    return matches / (2 * len(indices))
+
+
+def sample_modules(mask, grid):
+    """
+    Reads the mask once at every module centre of grid. Returns grid.size rows of
+    booleans, True for dark modules. Centres outside the image read as bright.
+    """
+    width, height = mask.size
+    pixels = mask.tobytes()
+    return [
+        [_is_dark(pixels, width, height, *grid.module_center(row, col)) for col in range(grid.size)]
+        for row in range(grid.size)
+    ]
@@ -0,0 +1,247 @@
+# result_cache.py
+"""
+Persistent, content-addressed cache of conversion results. Entries are keyed by
+a hash of the source file's bytes plus every parameter that shapes the matrix,
+so a re-run over unchanged inputs skips decoding and compression entirely,
+while a changed file or setting simply misses. Several processes can share one
+directory: entries are written atomically, and once the directory outgrows its
+size budget the least recently used entries are evicted.
+"""
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+from matrix_export import read_packed, write_packed
+
+# --- Constants ---
+CACHE_VERSION = 1 # Part of every key: bump when a pipeline change alters matrices for the same parameters
+DEFAULT_CACHE_MAX_MB = 512
+ENTRY_SUFFIX = ".mrc"
+ENTRY_MAGIC = b"MRC1"
+ENTRY_HEADER = struct.Struct(">4sI") # Magic, length of the JSON metadata that follows it
+EVICT_TO = 0.9 # Eviction frees space down to this fraction of max_bytes, so it does not run on every write
+STALE_TEMP_S = 3600 # Unfinished temp files older than this were left by a crashed writer
+HASH_CHUNK = 1024 * 1024
+
+
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+ENTRY_MODE = 0o666 & ~_umask() # Plain-file permissions (NamedTemporaryFile creates 0600), so users can share a cache
+
+
+def hash_source(source):
+    """SHA-256 hex digest of a file's bytes (path) or of bytes, read a chunk at a time."""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray)):
+        digest.update(source)
+        return digest.hexdigest()
+    with open(source, "rb") as source_file:
+        for chunk in iter(lambda: source_file.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(source_digest, params):
+    """Cache key for a source digest and a dict of JSON-serializable pipeline parameters."""
+    payload = json.dumps({"version": CACHE_VERSION, "source": source_digest, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _write_entry(entry_file, matrix, text, meta):
+    meta_bytes = json.dumps(meta).encode("utf-8")
+    entry_file.write(ENTRY_HEADER.pack(ENTRY_MAGIC, len(meta_bytes)))
+    entry_file.write(meta_bytes)
+    write_packed(matrix, entry_file)
+    entry_file.write(zlib.compress(text.encode("ascii")))
+
+
+def _read_entry(entry_file):
+    magic, meta_length = ENTRY_HEADER.unpack(entry_file.read(ENTRY_HEADER.size))
+    if magic != ENTRY_MAGIC:
+        raise ValueError(f"Not a cache entry: bad magic {magic!r}.")
+    meta = json.loads(entry_file.read(meta_length))
+    matrix = read_packed(entry_file)
+    text = zlib.decompress(entry_file.read()).decode("ascii")
+    return matrix, text, meta
+
+
+class ResultCache:
+    """
+    Matrix + text results stored as one file per key under directory (fanned out by the
+    key's first two characters). get() refreshes an entry's modification time, which
+    serves as its last use for eviction. The counters cover this process only.
+    """
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.write_errors = 0
+        self._lock = threading.Lock()
+        self._approx_bytes = None # Directory size as last scanned plus this process's writes since
+
+    def key_for(self, source, **params):
+        """Key of a source (path or bytes) converted with params."""
+        return make_key(hash_source(source), params)
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """Returns (matrix, text, meta) stored under key, or None."""
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as entry_file:
+                entry = _read_entry(entry_file)
+        except FileNotFoundError:
+            entry = None
+        except (OSError, ValueError, struct.error, zlib.error):
+            # Truncated or corrupt (e.g. a disk filled up mid-write elsewhere): drop it and recompute
+            entry = None
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if entry is not None:
+            try:
+                os.utime(path) # Mark as recently used
+            except OSError:
+                pass # Read-only cache or another user's entry: still a hit
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(self, key, matrix, text, **meta):
+        """
+        Stores a result (meta: extra JSON-serializable values, e.g. qr_version). The file is
+        written under a temporary name and renamed into place, so readers never see half an entry.
+        Returns False (and counts a write error) when the entry cannot be written, e.g. on a
+        read-only directory or a full disk: the cache is an optimization, never a failure.
+        """
+        try:
+            size = self._write(key, matrix, text, meta)
+        except OSError:
+            with self._lock:
+                self.write_errors += 1
+            return False
+
+        with self._lock:
+            self.writes += 1
+            if self._approx_bytes is None:
+                self._approx_bytes = self._disk_usage()[1]
+            else:
+                self._approx_bytes += size
+            over_budget = self._approx_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+        return True
+
+    def _write(self, key, matrix, text, meta):
+        """Writes one entry atomically. Returns its size in bytes."""
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = dict(meta, cols=matrix.cols, rows=matrix.rows)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".tmp", delete=False) as temp_file:
+            try:
+                _write_entry(temp_file, matrix, text, meta)
+                temp_file.flush()
+            except BaseException:
+                temp_file.close()
+                os.remove(temp_file.name)
+                raise
+        try:
+            os.chmod(temp_file.name, ENTRY_MODE)
+            os.replace(temp_file.name, path)
+        except OSError:
+            os.remove(temp_file.name)
+            raise
+        return os.path.getsize(path)
+
+    def _scan(self):
+        """(mtime, size, path) of every entry; removes temp files abandoned by crashed writers."""
+        entries = []
+        now = time.time()
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for item in os.scandir(shard.path):
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue # Evicted by another process meanwhile
+                if item.name.endswith(ENTRY_SUFFIX):
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+                elif item.name.endswith(".tmp") and now - stat.st_mtime > STALE_TEMP_S:
+                    try:
+                        os.remove(item.path)
+                    except OSError:
+                        pass
+        return entries
+
+    def _disk_usage(self):
+        entries = self._scan()
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def evict(self, target_bytes=None):
+        """
+        Removes least recently used entries until the directory holds at most target_bytes
+        (default: EVICT_TO of max_bytes). Returns the number of entries removed.
+        """
+        if target_bytes is None:
+            target_bytes = int(self.max_bytes * EVICT_TO)
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= target_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass # Another process got there first
+            except OSError:
+                continue # Not ours to remove (e.g. another user's entry in a shared cache)
+            total -= size
+
+        with self._lock:
+            self.evictions += removed
+            self._approx_bytes = total
+        return removed
+
+    def clear(self):
+        """Removes every entry."""
+        return self.evict(0)
+
+    def stats(self):
+        """This process's hits/misses/writes/evictions/write errors, plus the entries and bytes now on disk."""
+        entries, total = self._disk_usage()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "write_errors": self.write_errors,
+                "entries": entries,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+from PIL import Image
+
+from async_api import AsyncMatrixPipeline
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.png"
+    Image.linear_gradient("L").save(path)
+    return path
+
+
+@pytest.mark.parametrize("name, format, expected", [
+    ("out.jpg", "jpg", "JPEG"),
+    ("out.jpg", ".JPG", "JPEG"),
+    ("out.img", "png", "PNG"),
+    ("out.img", "WEBP", "WEBP"),
+    ("out.bmp", None, "BMP"),
+])
+def test_convert_image_formats(source, tmp_path, name, format, expected):
+    async def convert():
+        async with AsyncMatrixPipeline() as pipeline:
+            await pipeline.convert(source, 40, tmp_path / name, format=format)
+
+    asyncio.run(convert())
+    with Image.open(tmp_path / name) as written:
+        assert written.format == expected
+
+
+@pytest.mark.parametrize("name, format", [("out.img", None), ("out.png", "nope"), ("out.png", "psd")])
+def test_convert_rejects_unknown_formats(source, tmp_path, name, format):
+    async def convert():
+        async with AsyncMatrixPipeline() as pipeline:
+            await pipeline.convert(source, 40, tmp_path / name, format=format)
+
+    with pytest.raises(ValueError):
+        asyncio.run(convert())
@@ -0,0 +1,59 @@
+import pytest
+from PIL import Image
+
+from image_logic import ImageProcessorLogic
+from thresholding import THRESHOLD_MODES
+
+WIDTH, HEIGHT = 301, 257
+
+
+@pytest.fixture(scope="module")
+def source():
+    """Gradient plus noise, so reductions and thresholds depend on every row."""
+    gradient = Image.linear_gradient("L").resize((WIDTH, HEIGHT))
+    return Image.blend(gradient, Image.effect_noise((WIDTH, HEIGHT), 60), 0.4)
+
+
+@pytest.fixture(scope="module")
+def tiffs(source, tmp_path_factory):
+    """Strip TIFFs written by Pillow: LZW strips of a few rows each (L, RGB, P) and one uncompressed strip."""
+    directory = tmp_path_factory.mktemp("tiffs")
+    rgb = Image.merge("RGB", (source, source.transpose(Image.Transpose.FLIP_TOP_BOTTOM), source.point(lambda v: 255 - v)))
+    images = {"l": source, "rgb": rgb, "p": rgb.quantize(16)}
+    paths = {}
+    for name, image in images.items():
+        paths[name] = directory / f"{name}_strips.tif"
+        image.save(paths[name], "TIFF", compression="tiff_lzw", strip_size=3000)
+    paths["raw"] = directory / "l_raw.tif"
+    source.save(paths["raw"], "TIFF")
+    return paths
+
+
+@pytest.mark.parametrize("name", ["l", "rgb", "p", "raw"])
+@pytest.mark.parametrize("min_size", [25, 60, 120])
+# 1 byte: every band is a single strip (or row), smaller than one reduction block
+@pytest.mark.parametrize("memory_budget", [1, 20_000])
+def test_band_decoding_matches_full_decoding(tiffs, name, min_size, memory_budget):
+    full = ImageProcessorLogic(cache_bytes=0)._decode_grayscale(str(tiffs[name]), min_size)
+
+    logic = ImageProcessorLogic(cache_bytes=0, memory_budget=memory_budget)
+    banded = logic._decode_grayscale(str(tiffs[name]), min_size)
+
+    assert logic.last_decode["strategy"] == "bands"
+    assert logic.last_decode["bands"] > 1
+    assert banded.size == full.size
+    assert banded.tobytes() == full.tobytes()
+
+
+@pytest.mark.parametrize("threshold_mode", THRESHOLD_MODES)
+@pytest.mark.parametrize("band_rows", [2, 16, 256])
+@pytest.mark.parametrize("block_size", [(2, 2), (3, 5)])
+def test_iter_matrix_bands_matches_whole_matrix(source, threshold_mode, band_rows, block_size):
+    logic = ImageProcessorLogic(cache_bytes=0)
+    logic.use_image(source)
+    resized = logic.process_and_resize(80, block_size=block_size)
+    matrix, text = logic.generate_character_matrix(resized, block_size=block_size, threshold_mode=threshold_mode)
+
+    bands = list(logic.iter_matrix_bands(80, band_rows, block_size=block_size, threshold_mode=threshold_mode))
+    assert [row for band, _ in bands for row in band] == matrix
+    assert "".join(band_text for _, band_text in bands) == text
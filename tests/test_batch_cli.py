@@ -0,0 +1,20 @@
+import pytest
+
+from batch_cli import main, output_stems
+
+
+def test_output_stems_are_unique():
+    paths = ["/a/photo.png", "/b/photo.png", "/b/photo.jpg", "/c/x.PNG", "/d/y.gif", "/e/photo_png_2.png"]
+    assert output_stems(paths) == ["photo_png", "photo_png_3", "photo_jpg", "x", "y", "photo_png_2"]
+
+
+@pytest.mark.parametrize("argv", [
+    ["batch", "in", "-o", "out", "-w", "0"],
+    ["batch", "in", "-o", "out", "--chunk-size", "0"],
+    ["serve", "-w", "0"],
+])
+def test_invalid_pool_settings_are_usage_errors(argv, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(argv)
+    assert exit_info.value.code == 2
+    assert "must be at least 1" in capsys.readouterr().err
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from char_matrix import CharMatrix
+from image_logic import ImageProcessorLogic
+
+# Odd and even sizes, with column counts on and off byte boundaries
+SHAPES = [(2, 2), (4, 8), (6, 16), (5, 9), (7, 13), (3, 17), (10, 30), (8, 65)]
+
+
+def random_rows(rows, cols, seed=0):
+    rng = random.Random(seed * 100 + rows * 10 + cols)
+    return [[rng.choice("# ") for _ in range(cols)] for _ in range(rows)]
+
+
+@pytest.mark.parametrize("rows, cols", SHAPES)
+def test_from_rows_round_trip(rows, cols):
+    matrix = random_rows(rows, cols)
+    packed = CharMatrix.from_rows(matrix)
+    assert (len(packed), packed.cols) == (rows, cols)
+    assert packed.to_rows() == matrix
+    assert packed == matrix
+    assert [[packed.get(y, x) for x in range(cols)] for y in range(rows)] == [
+        [char == "#" for char in row] for row in matrix
+    ]
+
+
+@pytest.mark.parametrize("rows, cols", SHAPES)
+def test_bool_array_round_trip(rows, cols):
+    np = pytest.importorskip("numpy")
+    matrix = random_rows(rows, cols)
+    array = np.array(matrix) == "#"
+    packed = CharMatrix.from_rows(matrix)
+    assert (packed.to_bool_array() == array).all()
+    assert CharMatrix.from_bool_array(array) == packed
+
+
+@pytest.mark.parametrize("rows, cols", SHAPES)
+def test_count_matches_brute_force(rows, cols):
+    matrix = random_rows(rows, cols)
+    packed = CharMatrix.from_rows(matrix)
+    rng = random.Random(rows * cols)
+    for _ in range(20):
+        y, x = rng.randrange(rows), rng.randrange(cols)
+        height, width = rng.randint(1, rows - y), rng.randint(1, cols - x)
+        expected = sum(row[x:x + width].count("#") for row in matrix[y:y + height])
+        assert packed.count(y, x, height, width) == expected
+
+
+@pytest.mark.parametrize("rows, cols", SHAPES)
+@pytest.mark.parametrize("seed", range(3))
+def test_compress_majority_2x2_matches_reference(rows, cols, seed):
+    matrix = random_rows(rows, cols, seed)
+    # The reference needs whole 2x2 blocks; a trailing odd row or column is dropped either way
+    whole = [row[:cols - cols % 2] for row in matrix[:rows - rows % 2]]
+    expected_matrix, expected_text = ImageProcessorLogic(cache_bytes=0)._compress_and_format_matrix(whole)
+
+    compressed = CharMatrix.from_rows(matrix).compress_majority_2x2()
+    assert compressed == expected_matrix
+    assert compressed.to_text() == expected_text
@@ -0,0 +1,64 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from http_service import MAX_SERVICE_DIMENSION, MatrixService, parse_params
+
+
+def upload(query):
+    """A POST /matrix request carrying a small PNG."""
+    buffer = io.BytesIO()
+    Image.linear_gradient("L").resize((64, 64)).save(buffer, "PNG")
+    body = buffer.getvalue()
+    return (f"POST /matrix?{query} HTTP/1.1\r\nContent-Type: image/png\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body
+
+
+async def exchange(payload):
+    """Sends payload to a fresh service and returns the whole response."""
+    service = MatrixService(workers=1)
+    server = await service.start("127.0.0.1", 0)
+    try:
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+        writer.write(payload)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+    finally:
+        server.close()
+        await server.wait_closed()
+        service.close()
+
+
+@pytest.mark.parametrize("payload, expected", [
+    (b"GET /health HTTP/1.1\r\n\r\n", "HTTP/1.1 200 OK"),
+    (b"GET /" + b"a" * 70000 + b" HTTP/1.1\r\n\r\n", "HTTP/1.1 400 Bad Request"),
+    (b"GET /health HTTP/1.1\r\nX-Long: " + b"a" * 70000 + b"\r\n\r\n", "HTTP/1.1 431 Request Header Fields Too Large"),
+])
+def test_request_head(payload, expected):
+    assert asyncio.run(exchange(payload)).split(b"\r\n")[0].decode() == expected
+
+
+@pytest.mark.parametrize("fields", [
+    {"dimension": "51", "block": "51"},
+    {"dimension": str(MAX_SERVICE_DIMENSION + 1)},
+])
+def test_parse_params_rejects_oversized_work(fields):
+    with pytest.raises(ValueError):
+        parse_params(fields)
+
+
+@pytest.mark.parametrize("query, rows, cols", [
+    ("dimension=40&block=3x5", 8, 13),
+    # Coprime block sides must not inflate the resize (1000 stays 1000, one block fits)
+    ("dimension=1000&block=997x991", 1, 1),
+])
+def test_upload_block_sizes(query, rows, cols):
+    head, _, body = asyncio.run(exchange(upload(query))).partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    lines = body.decode("ascii").splitlines()
+    assert len(lines) == rows
+    assert all(len(line) == cols * 2 for line in lines)
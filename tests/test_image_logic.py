@@ -0,0 +1,80 @@
+import pytest
+from PIL import Image
+
+from image_logic import ImageProcessorLogic
+
+
+def test_process_and_resize_memo():
+    logic = ImageProcessorLogic(cache_bytes=0)
+    logic.use_image(Image.linear_gradient("L"))
+
+    resized = logic.process_and_resize(64)
+    assert logic.process_and_resize(64) is resized
+
+    logic.clear_memo()
+    again = logic.process_and_resize(64)
+    assert again is not resized
+    assert again.tobytes() == resized.tobytes()
+
+
+@pytest.mark.parametrize("resize_dim, block_size, expected", [
+    (50, (2, 2), 50), (51, (2, 2), 50), (50, (3, 3), 50), (50, (7, 9), 50), (1000, (997, 991), 1000), (4, (2, 2), 10),
+])
+def test_fit_dimension_never_rounds_past_resize_dim(resize_dim, block_size, expected):
+    assert ImageProcessorLogic(cache_bytes=0).fit_dimension(resize_dim, block_size) == expected
+
+
+def test_fit_dimension_rejects_blocks_larger_than_the_image():
+    with pytest.raises(ValueError):
+        ImageProcessorLogic(cache_bytes=0).fit_dimension(51, (51, 51))
+
+
+def test_block_size_change_reuses_resize_and_table():
+    logic = ImageProcessorLogic(cache_bytes=0)
+    logic.use_image(Image.linear_gradient("L"))
+
+    resized = logic.process_and_resize(50, block_size=(3, 3))
+    matrix, _ = logic.generate_character_matrix(resized, block_size=(3, 3))
+    table = logic.get_integral_image(resized)
+    assert (len(matrix), len(matrix[0])) == (16, 16)
+
+    assert logic.process_and_resize(50, block_size=(7, 9)) is resized
+    matrix, _ = logic.generate_character_matrix(resized, block_size=(7, 9))
+    assert logic.get_integral_image(resized) is table
+    assert (len(matrix), len(matrix[0])) == (5, 7)
+
+
+def test_process_and_resize_memo_survives_image_switch():
+    """A resize that finishes after another image was loaded must not be reused for that image."""
+    logic = ImageProcessorLogic(cache_bytes=0)
+    first, second = Image.new("L", (100, 100), 0), Image.new("L", (100, 100), 255)
+    logic.use_image(first)
+
+    stage = logic._stage
+
+    def switch_during_resize(name):
+        if name == "resize":
+            logic.use_image(second) # What a concurrent load_image does to a running refresh
+        return stage(name)
+
+    logic._stage = switch_during_resize
+    stale = logic.process_and_resize(50)
+    logic._stage = stage
+
+    assert stale.getextrema() == (0, 0)
+    assert logic.process_and_resize(50).getextrema() == (255, 255)
+
+
+def test_decode_image_is_headless(tmp_path):
+    path = tmp_path / "source.png"
+    Image.linear_gradient("L").save(path)
+    encoded = path.read_bytes()
+
+    logic = ImageProcessorLogic()
+    logic._build_views = None # Any call would fail: no preview or pyramid is built
+    from_path = logic.decode_image(str(path))
+    assert logic.pyramid == [] and logic.image_path == str(path)
+    from_bytes = logic.decode_image(encoded)
+    assert logic.image_path == "<upload>"
+    assert from_path.tobytes() == from_bytes.tobytes()
+    assert len(logic.image_cache) == 0
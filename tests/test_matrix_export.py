@@ -0,0 +1,29 @@
+import io
+
+import pytest
+
+from char_matrix import CharMatrix
+from matrix_export import read_packed, read_rle, write_packed, write_rle
+
+ROWS = ["# ##  ###", "         ", "#########", " # # # # "]
+
+
+def test_rle_round_trip():
+    matrix = CharMatrix.from_rows([list(row) for row in ROWS])
+    text = io.StringIO()
+    write_rle(matrix, text)
+    text.seek(0)
+    assert read_rle(text).data == matrix.data
+
+
+def test_packed_round_trip():
+    matrix = CharMatrix.from_rows([list(row) for row in ROWS])
+    binary = io.BytesIO()
+    write_packed(matrix, binary)
+    assert read_packed(binary.getvalue()).data == matrix.data
+
+
+@pytest.mark.parametrize("body", ["-1 4\n", "1 1\n", "2 x 1\n", ""])
+def test_read_rle_rejects_bad_rows(body):
+    with pytest.raises(ValueError):
+        read_rle(io.StringIO("RLE 3x1\n" + body))
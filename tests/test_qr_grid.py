@@ -0,0 +1,90 @@
+import random
+
+import pytest
+from PIL import Image, ImageFilter
+
+from qr_grid import VERSION_CODEWORDS, locate_grid, sample_modules
+
+MODULE_PX = 6
+QUIET_MODULES = 4
+
+
+def synthetic_modules(version, seed=0):
+    """Hand-drawn QR module grid (True = dark): finders, separators, timing, version blocks, random data."""
+    size = 4 * version + 17
+    modules = [[random.Random(seed * 1000 + row).random() < 0.5 for _ in range(size)] for row in range(size)]
+
+    for top, left in ((0, 0), (0, size - 7), (size - 7, 0)):
+        # Separator ring around the finder, then the 7x7 finder itself
+        for row in range(max(0, top - 1), min(size, top + 8)):
+            for col in range(max(0, left - 1), min(size, left + 8)):
+                modules[row][col] = False
+        for row in range(7):
+            for col in range(7):
+                ring = max(abs(row - 3), abs(col - 3))
+                modules[top + row][left + col] = ring != 2
+
+    for index in range(8, size - 8):
+        modules[6][index] = modules[index][6] = index % 2 == 0
+
+    if version in VERSION_CODEWORDS:
+        codeword = VERSION_CODEWORDS[version]
+        for bit in range(18):
+            dark = bool(codeword >> bit & 1)
+            near, across = bit // 3, size - 11 + bit % 3
+            modules[near][across] = modules[across][near] = dark
+    return modules
+
+
+def render_mask(modules):
+    """0/1 'L' mask (1 = bright) with MODULE_PX pixels per module and a quiet zone."""
+    side = (len(modules) + 2 * QUIET_MODULES) * MODULE_PX
+    mask = Image.new("L", (side, side), 1)
+    for row, line in enumerate(modules):
+        for col, dark in enumerate(line):
+            if dark:
+                x, y = (col + QUIET_MODULES) * MODULE_PX, (row + QUIET_MODULES) * MODULE_PX
+                mask.paste(0, (x, y, x + MODULE_PX, y + MODULE_PX))
+    return mask
+
+
+@pytest.mark.parametrize("version", [1, 3, 7, 10])
+def test_locate_grid_and_sample(version):
+    modules = synthetic_modules(version)
+    mask = render_mask(modules)
+
+    grid = locate_grid(mask)
+    assert grid.version == version
+    assert grid.size == len(modules)
+    assert grid.module_size == pytest.approx(MODULE_PX, rel=0.05)
+    assert sample_modules(mask, grid) == modules
+
+
+def test_locate_grid_without_finders():
+    with pytest.raises(ValueError):
+        locate_grid(Image.new("L", (100, 100), 1))
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("blur", [0, 1])
+def test_locate_grid_rejects_noise(seed, blur):
+    """Random noise holds plenty of 1:1:3:1:1 runs, but never a plausible code."""
+    rng = random.Random(seed)
+    noise = Image.frombytes("L", (400, 400), bytes(rng.getrandbits(8) for _ in range(400 * 400)))
+    if blur:
+        noise = noise.filter(ImageFilter.GaussianBlur(blur))
+    with pytest.raises(ValueError):
+        locate_grid(noise.point(lambda value: 1 if value >= 128 else 0))
+
+
+@pytest.mark.parametrize("angle", [8, 30])
+def test_locate_grid_rotated(angle):
+    modules = synthetic_modules(5)
+    rotated = render_mask(modules).point(lambda value: value * 255).rotate(
+        angle, Image.Resampling.BILINEAR, expand=True, fillcolor=255
+    )
+    mask = rotated.point(lambda value: 1 if value >= 128 else 0)
+
+    grid = locate_grid(mask)
+    assert grid.version == 5
+    assert sample_modules(mask, grid) == modules
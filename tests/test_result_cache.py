@@ -0,0 +1,55 @@
+import errno
+import os
+
+import pytest
+from PIL import Image
+
+import result_cache
+from batch_cli import run_batch
+from char_matrix import CharMatrix
+from result_cache import ENTRY_MODE, ResultCache
+
+MATRIX = CharMatrix.from_rows([list("# # "), list(" ## ")])
+TEXT = "#   #   \n  # #   \n"
+
+
+def disk_full(*args):
+    raise OSError(errno.ENOSPC, "No space left on device")
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = ResultCache(tmp_path)
+    key = cache.key_for(b"source", dimension=4)
+    assert cache.get(key) is None
+    assert cache.put(key, MATRIX, TEXT, qr_version=None)
+
+    matrix, text, meta = cache.get(key)
+    assert (matrix.data, text, meta["cols"], meta["rows"]) == (MATRIX.data, TEXT, 4, 2)
+    assert cache.stats()["hits"] == 1
+
+
+def test_entries_get_plain_file_permissions(tmp_path):
+    cache = ResultCache(tmp_path)
+    key = cache.key_for(b"source")
+    cache.put(key, MATRIX, TEXT)
+    assert os.stat(cache._entry_path(key)).st_mode & 0o777 == ENTRY_MODE
+
+
+def test_failed_write_is_counted_not_raised(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "_write_entry", disk_full)
+    cache = ResultCache(tmp_path)
+    assert not cache.put(cache.key_for(b"source"), MATRIX, TEXT)
+    assert cache.stats()["write_errors"] == 1
+    assert not any(name.endswith(".tmp") for _, _, names in os.walk(tmp_path) for name in names)
+
+
+def test_batch_survives_cache_write_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "_write_entry", disk_full)
+    source = tmp_path / "source.png"
+    Image.linear_gradient("L").save(source)
+
+    results = list(run_batch([str(source)], str(tmp_path / "out"), 40, ("txt",), workers=1,
+                             cache_dir=str(tmp_path / "cache")))
+    assert results[0]["error"] is None
+    assert results[0]["cache_stored"] is False
+    assert os.path.exists(results[0]["outputs"][0])
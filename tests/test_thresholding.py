@@ -0,0 +1,129 @@
+import random
+
+import pytest
+from PIL import Image
+
+import integral_image
+import thresholding
+from integral_image import IntegralImage
+from thresholding import LOCAL_THRESHOLD_MODES, local_bright_mask, otsu_threshold
+
+
+@pytest.fixture
+def without_numpy(monkeypatch):
+    """Forces the pure-Python paths of both modules."""
+    for module in (integral_image, thresholding):
+        monkeypatch.setattr(module, "get_numpy", lambda: None)
+
+
+def noisy_image(width, height, seed=0):
+    """Uneven lighting (a gradient) under noise."""
+    rng = random.Random(seed)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.frombytes("L", (width, height), bytes(rng.getrandbits(8) for _ in range(width * height)))
+    return Image.blend(gradient, noise, 0.5)
+
+
+def as_lists(values):
+    return values.tolist() if hasattr(values, "tolist") else values
+
+
+def test_otsu_threshold_bimodal():
+    histogram = [0] * 256
+    histogram[50] = histogram[200] = 100
+    # Every split between the two peaks is equally good; the first one wins
+    assert otsu_threshold(histogram, 128) == 51
+
+
+def test_otsu_threshold_uneven_classes():
+    histogram = [0] * 256
+    histogram[20], histogram[30], histogram[220] = 300, 100, 50
+    assert otsu_threshold(histogram, 128) == 31
+
+
+def test_otsu_threshold_single_value():
+    histogram = [0] * 256
+    histogram[90] = 500
+    assert otsu_threshold(histogram, 128) == 128
+
+
+@pytest.mark.parametrize("mode", LOCAL_THRESHOLD_MODES)
+@pytest.mark.parametrize("window", [None, 3, 8, 31])
+def test_local_bright_mask_backends_agree(mode, window, request):
+    pytest.importorskip("numpy")
+    image = noisy_image(37, 29)
+    with_numpy = local_bright_mask(image, mode, window)
+    request.getfixturevalue("without_numpy")
+    pure_python = local_bright_mask(image, mode, window)
+
+    assert with_numpy.mode == pure_python.mode == "L"
+    assert with_numpy.tobytes() == pure_python.tobytes()
+    assert set(with_numpy.tobytes()) <= {0, 1}
+
+
+def test_local_bright_mask_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        local_bright_mask(noisy_image(8, 8), "otsu")
+
+
+def brute_block_sums(image, block_width, block_height):
+    width, height = image.size
+    pixels = image.tobytes()
+    return [
+        [
+            sum(pixels[y * width + x] for y in range(top, top + block_height) for x in range(left, left + block_width))
+            for left in range(0, width - block_width + 1, block_width)
+        ]
+        for top in range(0, height - block_height + 1, block_height)
+    ]
+
+
+def brute_window_sums(image, radius):
+    width, height = image.size
+    pixels = image.tobytes()
+    sums, counts = [], []
+    for y in range(height):
+        ys = range(max(0, y - radius), min(height, y + radius + 1))
+        sums.append([])
+        counts.append([])
+        for x in range(width):
+            xs = range(max(0, x - radius), min(width, x + radius + 1))
+            sums[-1].append(sum(pixels[row * width + col] for row in ys for col in xs))
+            counts[-1].append(len(ys) * len(xs))
+    return sums, counts
+
+
+@pytest.mark.parametrize("numpy_backend", [True, False])
+@pytest.mark.parametrize("block_size", [(1, 1), (2, 2), (3, 5), (7, 4), (23, 19)])
+def test_block_sums(numpy_backend, block_size, request):
+    if numpy_backend:
+        pytest.importorskip("numpy")
+    else:
+        request.getfixturevalue("without_numpy")
+    image = noisy_image(23, 19, seed=1)
+    table = IntegralImage.from_image(image)
+    assert as_lists(table.block_sums(*block_size)) == brute_block_sums(image, *block_size)
+    assert table.block_sum(3, 2, 5, 4) == sum(brute_block_sums(image.crop((3, 2, 8, 6)), 5, 4)[0])
+
+
+@pytest.mark.parametrize("numpy_backend", [True, False])
+@pytest.mark.parametrize("radius", [0, 1, 4, 30])
+def test_window_sums(numpy_backend, radius, request):
+    if numpy_backend:
+        pytest.importorskip("numpy")
+    else:
+        request.getfixturevalue("without_numpy")
+    image = noisy_image(23, 19, seed=2)
+    sums, counts = IntegralImage.from_image(image).window_sums(radius)
+    assert (as_lists(sums), as_lists(counts)) == brute_window_sums(image, radius)
+
+
+def test_squared_table():
+    image = noisy_image(9, 7, seed=3)
+    squared = IntegralImage.from_image(image, squared=True)
+    assert squared.block_sum(0, 0, 9, 7) == sum(value * value for value in image.tobytes())
+
+
+def test_block_sums_rejects_empty_blocks():
+    with pytest.raises(ValueError):
+        IntegralImage.from_image(noisy_image(4, 4)).block_sums(0, 2)
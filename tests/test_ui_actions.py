@@ -0,0 +1,61 @@
+import pytest
+from PIL import Image
+
+pytest.importorskip("tkinter")
+
+import ui_actions
+from char_matrix import CharMatrix
+from image_logic import CELL_SIZE, ImageProcessorLogic
+from matrix_export import read_packed, read_rle
+
+MATRIX = CharMatrix.from_rows([list("# # "), list(" ## "), list("#  #")])
+
+
+@pytest.fixture
+def dialogs(monkeypatch):
+    """Stands in for the Tk dialogs: answers the save dialog with a path, records the message."""
+    calls = {}
+
+    def asksaveasfilename(**options):
+        calls["options"] = options
+        return calls["path"]
+
+    def showinfo(title, message):
+        calls["message"] = message
+
+    monkeypatch.setattr(ui_actions.filedialog, "asksaveasfilename", asksaveasfilename)
+    monkeypatch.setattr(ui_actions.messagebox, "showinfo", showinfo)
+    return calls
+
+
+def save(dialogs, path):
+    dialogs["path"] = str(path)
+    logic = ImageProcessorLogic(cache_bytes=0)
+    image = logic.create_matrix_image(MATRIX)
+    assert ui_actions.save_image_dialog(logic, image, MATRIX)
+    return dialogs["message"]
+
+
+def test_offers_every_matrix_export(dialogs, tmp_path):
+    save(dialogs, tmp_path / "m.png")
+    patterns = [pattern for _, pattern in dialogs["options"]["filetypes"]]
+    assert {"*_1bit.png", "*.pbm", "*.rle", "*.bits"} <= set(patterns)
+
+
+def test_saves_glyph_image(dialogs, tmp_path):
+    assert save(dialogs, tmp_path / "m.png").startswith("Image successfully saved")
+    with Image.open(tmp_path / "m.png") as written:
+        assert written.size == (4 * CELL_SIZE, 3 * CELL_SIZE)
+
+
+def test_saves_1bit_png(dialogs, tmp_path):
+    assert save(dialogs, tmp_path / "m_1bit.png").startswith("1-bit PNG successfully saved")
+    with Image.open(tmp_path / "m_1bit.png") as written:
+        assert (written.mode, written.size) == ("1", (4, 3))
+
+
+def test_saves_matrix_exports(dialogs, tmp_path):
+    assert save(dialogs, tmp_path / "m.rle").startswith("Run-length matrix successfully saved")
+    assert read_rle(tmp_path / "m.rle") == MATRIX
+    assert save(dialogs, tmp_path / "m.bits").startswith("Packed matrix successfully saved")
+    assert read_packed(tmp_path / "m.bits") == MATRIX
@@ -0,0 +1,103 @@
+# thresholding.py
+"""
+Threshold modes that decide which pixels count as bright ('#'):
+a global cutoff picked by Otsu's method, and local-mean / Sauvola cutoffs
+computed per pixel from summed-area tables, so unevenly lit scans (e.g. a
+printed QR code photographed under a lamp) threshold correctly in one pass.
+"""
+import math
+
+from PIL import Image
+
+from integral_image import IntegralImage
+from lazy_imports import get_numpy
+
+# --- Modes ---
+GLOBAL_THRESHOLD_MODES = ("global", "otsu") # One cutoff for the whole image
+LOCAL_THRESHOLD_MODES = ("mean", "sauvola") # A cutoff per pixel, from its surrounding window
+THRESHOLD_MODES = GLOBAL_THRESHOLD_MODES + LOCAL_THRESHOLD_MODES
+DEFAULT_THRESHOLD_MODE = "global"
+
+# --- Local Threshold Parameters ---
+MEAN_OFFSET = 10 # Local mean: bright when at least (window mean - MEAN_OFFSET)
+SAUVOLA_K = 0.2 # Sauvola: how far the cutoff drops below the mean in low-contrast windows
+SAUVOLA_R = 128 # Sauvola: dynamic range of the standard deviation (half of 8-bit range)
+
+
+def otsu_threshold(histogram, default):
+    """
+    Otsu's method on a 256-bin histogram: returns the cutoff (bright = value >= cutoff)
+    that maximizes the between-class variance, or default for a single-valued image.
+    """
+    total = sum(histogram[:256])
+    sum_all = sum(value * count for value, count in enumerate(histogram[:256]))
+
+    weight_dark = sum_dark = 0
+    best_variance, best_value = 0, None
+    for value in range(256):
+        weight_dark += histogram[value]
+        sum_dark += value * histogram[value]
+        weight_bright = total - weight_dark
+        if not weight_dark:
+            continue
+        if not weight_bright:
+            break
+        mean_difference = sum_dark / weight_dark - (sum_all - sum_dark) / weight_bright
+        variance = weight_dark * weight_bright * mean_difference * mean_difference
+        if variance > best_variance:
+            best_variance, best_value = variance, value
+
+    return default if best_value is None else best_value + 1
+
+
+def default_window(width, height):
+    """Odd window side of about an eighth of the shorter image side (at least 3 pixels)."""
+    return max(3, min(width, height) // 8) | 1
+
+
+def local_bright_mask(image, mode, window=None):
+    """
+    Thresholds each pixel of a grayscale image against its own window
+    (window x window pixels, clipped at the border):
+      - "mean":    bright when value >= mean - MEAN_OFFSET
+      - "sauvola": bright when value >= mean * (1 + SAUVOLA_K * (std / SAUVOLA_R - 1))
+    Window means and deviations come from summed-area tables, so the cost does not
+    depend on the window size. Returns an 'L' image holding 1 (bright) or 0 (dark).
+    """
+    if mode not in LOCAL_THRESHOLD_MODES:
+        raise ValueError(f"Unknown local threshold mode {mode!r}; choose from {', '.join(LOCAL_THRESHOLD_MODES)}.")
+    if image.mode != "L":
+        image = image.convert("L")
+    if window is None:
+        window = default_window(*image.size)
+    radius = window // 2
+
+    sums, counts = IntegralImage.from_image(image).window_sums(radius)
+    if mode == "sauvola":
+        squared_sums, _ = IntegralImage.from_image(image, squared=True).window_sums(radius)
+
+    np = get_numpy()
+    if np is not None:
+        mean = sums / counts
+        if mode == "mean":
+            cutoff = mean - MEAN_OFFSET
+        else:
+            std = np.sqrt(np.maximum(squared_sums / counts - mean * mean, 0))
+            cutoff = mean * (1 + SAUVOLA_K * (std / SAUVOLA_R - 1))
+        bright = np.asarray(image) >= cutoff
+        return Image.fromarray(bright.astype(np.uint8), "L")
+
+    width, height = image.size
+    pixels = image.tobytes()
+    mask = bytearray(width * height)
+    for y in range(height):
+        for x in range(width):
+            count = counts[y][x]
+            mean = sums[y][x] / count
+            if mode == "mean":
+                cutoff = mean - MEAN_OFFSET
+            else:
+                std = math.sqrt(max(squared_sums[y][x] / count - mean * mean, 0))
+                cutoff = mean * (1 + SAUVOLA_K * (std / SAUVOLA_R - 1))
+            mask[y * width + x] = pixels[y * width + x] >= cutoff
+    return Image.frombytes("L", (width, height), bytes(mask))
@@ -0,0 +1,69 @@
+# ui_actions.py
+"""
+UI-facing helpers that need Tkinter dialogs or a web browser. Kept out of
+image_logic so the compute core imports without Tk.
+"""
+import webbrowser
+from tkinter import messagebox, filedialog
+
+from image_logic import CELL_SIZE
+
+PORTFOLIO_URL = "https://github.com/peter00123/portfolio"
+# Save-dialog file name endings written straight from the matrix instead of the glyph image
+# (see matrix_export.EXPORT_FORMATS), with what the success message calls them
+MATRIX_EXPORT_SUFFIXES = {
+    "_1bit.png": ("png1", "1-bit PNG"),
+    ".pbm": ("pbm", "1-bit PBM"),
+    ".rle": ("rle", "Run-length matrix"),
+    ".bits": ("bits", "Packed matrix"),
+}
+
+
+def open_portfolio_link():
+    """Opens the portfolio URL in a web browser."""
+    # Using a complete, protocol-prefixed URL
+    url = PORTFOLIO_URL
+    try:
+        webbrowser.open_new_tab(url)
+        messagebox.showinfo("Portfolio", f"Opening link in your browser:\n{url}")
+    except Exception as e:
+        messagebox.showerror("Error", f"Could not open web browser: {e}")
+
+
+def save_image_dialog(logic, image_to_save, matrix=None):
+    """
+    Asks user for save location and saves the processed image. Given the matrix, the
+    1-bit PNG (*_1bit.png) and PBM, run-length (.rle) and packed (.bits) exports are
+    offered as well.
+    """
+    # Calculate compressed size for default filename
+    rows = image_to_save.height // CELL_SIZE
+    cols = image_to_save.width // CELL_SIZE
+    default_filename = f"compressed_matrix_inverted_{cols}x{rows}.png"
+    
+    filetypes = [("PNG files", "*.png"), ("JPEG files", "*.jpg")]
+    if matrix is not None:
+        filetypes += [
+            ("1-bit PNG, one pixel per cell", "*_1bit.png"), ("1-bit PBM", "*.pbm"),
+            ("Run-length text", "*.rle"), ("Packed bits", "*.bits"),
+        ]
+    file_path = filedialog.asksaveasfilename(
+        defaultextension=".png",
+        initialfile=default_filename,
+        filetypes=filetypes + [("All files", "*.*")]
+    )
+
+    if file_path:
+        export = next(
+            (export for suffix, export in MATRIX_EXPORT_SUFFIXES.items() if file_path.lower().endswith(suffix)), None
+        )
+        if matrix is not None and export:
+            from matrix_export import export_matrix
+            export_format, description = export
+            export_matrix(matrix, file_path, export_format, logic=logic)
+        else:
+            description = "Image"
+            logic.encode_image(image_to_save, file_path)
+        messagebox.showinfo("Success", f"{description} successfully saved to:\n{file_path}")
+        return True
+    return False